@@ -0,0 +1,289 @@
+"""
+Shared instrumentation for the loaders, the Zoho export and the firm matching.
+
+Records nested timed spans with peak memory and rows-in/rows-out counters,
+optionally captures DuckDB EXPLAIN ANALYZE plans, and exports a run as JSON
+and as a Chrome trace (open it in chrome://tracing or https://ui.perfetto.dev).
+
+Environment variables:
+    PROFILE_OUTPUT: directory where profiles are written (unset: no files)
+    PROFILE_EXPLAIN_ANALYZE: set to 1 to capture EXPLAIN ANALYZE of instrumented queries
+    PROFILE_SAMPLE_INTERVAL: memory sampling interval in seconds (default: 0.05)
+
+Usage:
+    from instrumentation import span, add_rows, report
+
+    with span("load Accounts"):
+        df = ...
+        add_rows(rows_in=len(df), rows_out=inserted)
+    report("import_zoho_tables")
+"""
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss() -> int:
+    """Return the resident set size of this process in bytes."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Return the peak resident set size of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Span:
+    """A timed section of work, with memory and row counters."""
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs: Dict[str, Any] = attrs
+        self.children: List['Span'] = []
+        self.thread = threading.current_thread().name
+        self.thread_id = threading.get_ident()
+        self.rows_in = 0
+        self.rows_out = 0
+        self.explain: List[Dict[str, str]] = []
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.rss_start = current_rss()
+        self.rss_end: Optional[int] = None
+        self.peak_rss = self.rss_start
+
+    @property
+    def duration(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'thread': self.thread,
+            'start_s': round(self.start - origin, 6),
+            'duration_s': round(self.duration, 6),
+            'rss_start_mb': round(self.rss_start / 2**20, 1),
+            'rss_end_mb': round((self.rss_end or self.rss_start) / 2**20, 1),
+            'peak_rss_mb': round(self.peak_rss / 2**20, 1),
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'attrs': self.attrs,
+            'explain': self.explain,
+            'children': [child.to_dict(origin) for child in self.children]
+        }
+
+
+class Profiler:
+    """Collects the spans of a run and samples memory while spans are open."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.started_at = datetime.now()
+        self.roots: List[Span] = []
+        self.samples: List[tuple] = []
+        self._open: List[Span] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._sampler: Optional[threading.Thread] = None
+        self._interval = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.05'))
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current(self) -> Optional[Span]:
+        """Return the innermost open span of the calling thread."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def _sample(self):
+        while True:
+            time.sleep(self._interval)
+            rss = current_rss()
+            with self._lock:
+                self.samples.append((time.perf_counter(), rss))
+                for open_span in self._open:
+                    open_span.peak_rss = max(open_span.peak_rss, rss)
+
+    def _ensure_sampler(self):
+        if self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample, name='rss-sampler', daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attrs):
+        """
+        Time a section of work.
+
+        Spans opened inside another span of the same thread are nested in it.
+        Pass parent to nest a span opened in a worker thread.
+        """
+        self._ensure_sampler()
+        stack = self._stack()
+        if parent is None and stack:
+            parent = stack[-1]
+        new_span = Span(name, parent=parent, **attrs)
+        with self._lock:
+            (parent.children if parent is not None else self.roots).append(new_span)
+            self._open.append(new_span)
+        stack.append(new_span)
+        try:
+            yield new_span
+        finally:
+            stack.pop()
+            new_span.end = time.perf_counter()
+            new_span.rss_end = current_rss()
+            with self._lock:
+                new_span.peak_rss = max(new_span.peak_rss, new_span.rss_end)
+                self._open.remove(new_span)
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return the run as a JSON-serializable tree of spans."""
+        with self._lock:
+            return {
+                'started_at': self.started_at.isoformat(),
+                'argv': sys.argv,
+                'pid': os.getpid(),
+                'peak_rss_mb': round(peak_rss() / 2**20, 1),
+                'spans': [root.to_dict(self.origin) for root in self.roots]
+            }
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Return the run in Chrome trace event format."""
+        pid = os.getpid()
+        events = []
+
+        def add(span_: Span):
+            events.append({
+                'name': span_.name,
+                'cat': 'span',
+                'ph': 'X',
+                'ts': round((span_.start - self.origin) * 1e6),
+                'dur': round(span_.duration * 1e6),
+                'pid': pid,
+                'tid': span_.thread_id,
+                'args': {
+                    'rows_in': span_.rows_in,
+                    'rows_out': span_.rows_out,
+                    'peak_rss_mb': round(span_.peak_rss / 2**20, 1),
+                    **{k: str(v) for k, v in span_.attrs.items()}
+                }
+            })
+            for child in span_.children:
+                add(child)
+
+        with self._lock:
+            for root in self.roots:
+                add(root)
+            for t, rss in self.samples:
+                events.append({
+                    'name': 'rss',
+                    'ph': 'C',
+                    'ts': round((t - self.origin) * 1e6),
+                    'pid': pid,
+                    'args': {'rss_mb': round(rss / 2**20, 1)}
+                })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, directory: str, run_name: str) -> List[str]:
+        """Write the JSON and Chrome trace files; return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = self.started_at.strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(directory, f"{run_name}-{stamp}")
+        paths = [f"{base}.json", f"{base}.trace.json"]
+        with open(paths[0], 'w') as f:
+            json.dump(self.to_json(), f, indent=2, default=str)
+        with open(paths[1], 'w') as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        return paths
+
+    def summary(self, max_depth: int = 3) -> str:
+        """Return a text summary of the span tree."""
+        lines = []
+
+        def add(span_: Span, depth: int):
+            rows = ''
+            if span_.rows_in or span_.rows_out:
+                rows = f"  rows {span_.rows_in} → {span_.rows_out}"
+            lines.append(
+                f"{'  ' * depth}{span_.name:<{max(1, 48 - 2 * depth)}} "
+                f"{span_.duration:9.2f}s  peak {span_.peak_rss / 2**20:8.1f} MB{rows}"
+            )
+            if depth + 1 < max_depth:
+                for child in span_.children:
+                    add(child, depth + 1)
+
+        with self._lock:
+            for root in self.roots:
+                add(root, 0)
+        return '\n'.join(lines)
+
+
+PROFILER = Profiler()
+
+
+def span(name: str, parent: Optional[Span] = None, **attrs):
+    """Time a section of work (see Profiler.span)."""
+    return PROFILER.span(name, parent=parent, **attrs)
+
+
+def current_span() -> Optional[Span]:
+    """Return the innermost open span of the calling thread."""
+    return PROFILER.current()
+
+
+def add_rows(rows_in: int = 0, rows_out: int = 0):
+    """Add to the row counters of the innermost open span."""
+    current = PROFILER.current()
+    if current is not None:
+        current.rows_in += int(rows_in)
+        current.rows_out += int(rows_out)
+
+
+def explain_analyze(duck, sql: str, label: str = ''):
+    """
+    Capture the EXPLAIN ANALYZE plan of a DuckDB query into the current span.
+
+    Only runs when PROFILE_EXPLAIN_ANALYZE=1, since it executes the query once more.
+    """
+    if os.getenv('PROFILE_EXPLAIN_ANALYZE', '') != '1':
+        return
+    current = PROFILER.current()
+    try:
+        plan = '\n'.join(row[-1] for row in duck.sql(f"explain analyze {sql}").fetchall())
+    except Exception as e:
+        plan = f"EXPLAIN ANALYZE failed: {e}"
+    if current is not None:
+        current.explain.append({'label': label, 'sql': sql, 'plan': plan})
+
+
+def report(run_name: str):
+    """Print the span summary and write the profile files if PROFILE_OUTPUT is set."""
+    print("\n--- Profile ---")
+    print(PROFILER.summary())
+    directory = os.getenv('PROFILE_OUTPUT')
+    if directory:
+        for path in PROFILER.write(directory, run_name):
+            print(f"✓ Profile written to {path}")
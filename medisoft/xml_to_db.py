@@ -1,16 +1,15 @@
 import os
 import xml.etree.ElementTree as ET
 import sqlite3
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import span, add_rows, report
 # === CONFIGURATION ===
 XML_DIR = "Archiv"   # répertoire des fichiers XML
 DB_FILE = "output.db"           # fichier SQLite (modifiable)
 # ======================
-# Connexion à la base de données
-conn = sqlite3.connect(DB_FILE)
-cursor = conn.cursor()
-for filename in os.listdir(XML_DIR):
-    if not filename.endswith(".xml"):
-        continue
+def load_file(conn, cursor, filename):
+    """Load one XML file into its table and return the number of rows inserted."""
     path = os.path.join(XML_DIR, filename)
     tree = ET.parse(path)
     root = tree.getroot()
@@ -40,7 +39,7 @@ for filename in os.listdir(XML_DIR):
             create_sql = f"CREATE TABLE IF NOT EXISTS {table_name} (id INTEGER PRIMARY KEY AUTOINCREMENT);"
         cursor.execute(create_sql)
         conn.commit()
-        continue  # passe au fichier suivant
+        return 0  # passe au fichier suivant
     # === CAS NORMAL (XML NON VIDE) ===
     # Colonnes à partir de la première ligne
     first_row = rows[0]
@@ -70,5 +69,21 @@ for filename in os.listdir(XML_DIR):
         cursor.execute(insert_sql, values)
     conn.commit()
     print(f"[OK] Table '{table_name}' : {len(rows)} lignes insérées.")
-conn.close()
-print("\n:white_check_mark: Base de données recréée avec succès :", DB_FILE)
\ No newline at end of file
+    return len(rows)
+
+def main():
+    # Connexion à la base de données
+    conn = sqlite3.connect(DB_FILE)
+    cursor = conn.cursor()
+    for filename in os.listdir(XML_DIR):
+        if not filename.endswith(".xml"):
+            continue
+        with span(f"load {filename}"):
+            inserted = load_file(conn, cursor, filename)
+            add_rows(rows_in=inserted, rows_out=inserted)
+    conn.close()
+    print("\n:white_check_mark: Base de données recréée avec succès :", DB_FILE)
+    report("xml_to_db")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,14 @@
 import os
 import xml.etree.ElementTree as ET
 import connection_alchemy
+from instrumentation import span, add_rows, report
 # === CONFIGURATION ===
 XML_DIR = "./medisoft/Archiv"   # répertoire des fichiers XML
 DB_FILE = "output.db"           # fichier SQLite (modifiable)
 SCHEMA_NAME = "medisoft_new"
 # ======================
-# Connexion à la base de données
-conn = connection_alchemy.connect_to_db()
-
-for filename in os.listdir(XML_DIR):
-    if not filename.endswith(".xml"):
-        continue
+def load_file(conn, filename):
+    """Load one XML file into its table and return the number of rows inserted."""
     path = os.path.join(XML_DIR, filename)
     tree = ET.parse(path)
     root = tree.getroot()
@@ -25,6 +22,8 @@ for filename in os.listdir(XML_DIR):
         if children and all(len(list(c)) > 0 for c in children):
             rows = children
     table_name = SCHEMA_NAME + '.' + table_name
+    # Recréée à chaque chargement, sinon une relance ajoute les lignes en double
+    conn.execute(f"DROP TABLE IF EXISTS {table_name}")
     # === CAS XML VIDE ===
     if not rows:
         print(f"[INFO] {filename}: aucun enregistrement trouvé. Création de la table vide '{table_name}'.")
@@ -41,7 +40,7 @@ for filename in os.listdir(XML_DIR):
             # table sans colonnes explicites
             create_sql = f"CREATE TABLE IF NOT EXISTS {table_name} (id SERIAL PRIMARY KEY);"
         conn.execute(create_sql)
-        continue  # passe au fichier suivant
+        return 0  # passe au fichier suivant
     # === CAS NORMAL (XML NON VIDE) ===
     # Colonnes à partir de la première ligne
     first_row = rows[0]
@@ -67,5 +66,21 @@ for filename in os.listdir(XML_DIR):
         insert_sql = insert_sql.replace("?","'{}'").format(*values)
         conn.execute(insert_sql)
     print(f"[OK] Table '{table_name}' : {len(rows)} lignes insérées.")
-conn.close()
-print("\n:white_check_mark: Base de données recréée avec succès :", DB_FILE)
+    return len(rows)
+
+def main():
+    # Connexion à la base de données
+    conn = connection_alchemy.connect_to_db()
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA_NAME}")
+    for filename in os.listdir(XML_DIR):
+        if not filename.endswith(".xml"):
+            continue
+        with span(f"load {filename}"):
+            inserted = load_file(conn, filename)
+            add_rows(rows_in=inserted, rows_out=inserted)
+    conn.close()
+    print("\n:white_check_mark: Base de données recréée avec succès :", DB_FILE)
+    report("xml_to_db_inefficient")
+
+if __name__ == "__main__":
+    main()
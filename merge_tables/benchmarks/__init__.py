@@ -0,0 +1 @@
+"""Benchmarks for the firm matching process."""
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Scaling and accuracy benchmark of the registered matching functions.
+
+Generates synthetic Medisoft firms and Zoho accounts with known links
+(benchmarks/synthetic.py), loads them into a local DuckDB standing in for
+PostgreSQL, and runs each registered matcher on its own, then all of them
+together, at each size. Reports runtime, candidate pairs, peak memory,
+precision and recall.
+
+Usage (from merge_tables/):
+    python -m benchmarks.bench_matchers --sizes 1000,10000,100000,1000000
+    python -m benchmarks.bench_matchers --matchers name_match --max-seconds 60 --output results.json
+"""
+
+import argparse
+import functools
+import json
+import os
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+
+from benchmarks.synthetic import generate_firms, generate_plz_centroids
+from db import (
+    create_table_firms_zoho,
+    setup_temp_tables,
+    create_clean_account_name_macro,
+    create_contact_key_macros,
+    ensure_all_firms_in_table
+)
+from instrumentation import span
+from matchers import (
+    MATCHING_FUNCTIONS,
+    setup_default_matching_functions,
+    run_matching_functions,
+    required_columns,
+    compute_candidates
+)
+from matchers.proximity_matcher import proximity_candidates
+
+TABLE_NAME = 'pg.medisoft.table_firms_zoho'
+# Centroids of the synthetic postcodes, rewritten for each size
+CENTROIDS_PATH = os.path.join(tempfile.gettempdir(), 'bench_plz_centroids.csv')
+
+
+def load_dataset(medisoft: pd.DataFrame, zoho: pd.DataFrame) -> duckdb.DuckDBPyConnection:
+    """Load the synthetic sources into an in-memory database attached as pg."""
+    duck = duckdb.connect()
+    duck.execute("""
+        attach ':memory:' as pg;
+        create schema pg.medisoft;
+        create schema pg.zoho;
+    """)
+    duck.register("medisoft_df", medisoft)
+    duck.register("zoho_df", zoho)
+    duck.execute("""
+        create table pg.medisoft.table_firmenstruktur as select * from medisoft_df;
+        create table pg.zoho.Accounts as select * from zoho_df;
+    """)
+    duck.unregister("medisoft_df")
+    duck.unregister("zoho_df")
+
+    # Columns of every registered matcher: the selection is toggled per run
+    setup_temp_tables(duck, required_columns(MATCHING_FUNCTIONS))
+    create_clean_account_name_macro(duck)
+    create_contact_key_macros(duck)
+
+    # Centroids of the synthetic postcodes for the proximity matcher
+    centroids = generate_plz_centroids(pd.concat([medisoft['plz'], zoho['Billing_Code']]))
+    centroids.to_csv(CENTROIDS_PATH, index=False)
+    return duck
+
+
+def reset_matches(duck: duckdb.DuckDBPyConnection):
+    """Start from an empty firms/zoho mapping."""
+    duck.execute(f"drop table if exists {TABLE_NAME}")
+    create_table_firms_zoho(duck, TABLE_NAME)
+    ensure_all_firms_in_table(duck, TABLE_NAME)
+
+
+def evaluate(predicted: pd.DataFrame, truth: pd.DataFrame) -> dict:
+    """Precision and recall of (rec_id, Id) predictions against the ground truth."""
+    correct = len(predicted.merge(truth, on=['rec_id', 'Id']))
+    return {
+        'matches': len(predicted),
+        'precision': correct / len(predicted) if len(predicted) else None,
+        'recall': correct / len(truth) if len(truth) else None
+    }
+
+
+def best_per_firm(candidates: pd.DataFrame) -> pd.DataFrame:
+    """Keep the best candidate per firm, as record_matches does."""
+    if len(candidates) == 0:
+        return candidates[['rec_id', 'Id']]
+    return (
+        candidates.sort_values(['rec_id', 'score', 'Id'], ascending=[True, False, True])
+        .drop_duplicates('rec_id')[['rec_id', 'Id']]
+    )
+
+
+def run_matcher(duck, match_func, truth: pd.DataFrame) -> dict:
+    """Time one matcher's candidate function (partitioned if configured) and score its output."""
+    reset_matches(duck)
+    with span(f"bench {match_func['name']}") as bench_span:
+        candidates = compute_candidates(duck, TABLE_NAME, match_func, bench_span)
+    result = {
+        'seconds': round(bench_span.duration, 3),
+        'candidate_pairs': len(candidates),
+        'peak_rss_mb': round(bench_span.peak_rss / 2**20, 1),
+        'rss_growth_mb': round((bench_span.peak_rss - bench_span.rss_start) / 2**20, 1)
+    }
+    result.update(evaluate(best_per_firm(candidates), truth))
+    return result
+
+
+def run_all(duck, truth: pd.DataFrame, skipped: set) -> dict:
+    """Run every enabled matcher but skipped through the scheduler and score the final mapping."""
+    reset_matches(duck)
+    disabled = [f for f in MATCHING_FUNCTIONS if f['enabled'] and f['name'] in skipped]
+    for match_func in disabled:
+        match_func['enabled'] = False
+    try:
+        with span("bench all") as bench_span:
+            run_matching_functions(duck, TABLE_NAME)
+    finally:
+        for match_func in disabled:
+            match_func['enabled'] = True
+    predicted = duck.sql(f"""
+        select rec_id, id_zoho as Id
+        from {TABLE_NAME}
+        where id_zoho is not null
+    """).df()
+    result = {
+        'seconds': round(bench_span.duration, 3),
+        'candidate_pairs': None,
+        'peak_rss_mb': round(bench_span.peak_rss / 2**20, 1),
+        'rss_growth_mb': round((bench_span.peak_rss - bench_span.rss_start) / 2**20, 1)
+    }
+    result.update(evaluate(predicted, truth))
+    return result
+
+
+def format_row(size: int, name: str, result: dict) -> str:
+    def fmt(value, spec):
+        return format(value, spec) if value is not None else '-'
+    return (
+        f"{size:>9} {name:<18} {result['seconds']:>9.2f}s "
+        f"{fmt(result['candidate_pairs'], '>10')} {result['peak_rss_mb']:>9.1f} "
+        f"{fmt(result['precision'], '>9.3f')} {fmt(result['recall'], '>7.3f')}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help='comma-separated numbers of Medisoft firms (Zoho accounts: same number)')
+    parser.add_argument('--matchers', default='',
+                        help='comma-separated matcher names (default: all registered)')
+    parser.add_argument('--match-rate', type=float, default=0.7)
+    parser.add_argument('--noise', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-seconds', type=float, default=600,
+                        help='skip larger sizes for a matcher once it exceeds this runtime')
+    parser.add_argument('--parse-cache', action='store_true',
+                        help='use the persistent parse cache (default: parse every address)')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    if not args.parse_cache:
+        os.environ['PARSE_CACHE_PATH'] = ''
+
+    setup_default_matching_functions()
+    selected = [m.strip() for m in args.matchers.split(',') if m.strip()]
+    for match_func in MATCHING_FUNCTIONS:
+        match_func['enabled'] = not selected or match_func['name'] in selected
+        if match_func['name'] == 'proximity_match':
+            match_func['candidates'] = functools.partial(proximity_candidates, centroids_path=CENTROIDS_PATH)
+    matchers = [f for f in MATCHING_FUNCTIONS if f['enabled'] and f['candidates'] is not None]
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    too_slow = set()
+    # Matchers whose dependencies are not installed (e.g. postal for address_match)
+    unavailable = {}
+    results = []
+
+    print(f"{'firms':>9} {'matcher':<18} {'runtime':>10} {'pairs':>10} {'peak MB':>9} {'precision':>9} {'recall':>7}")
+    for size in sizes:
+        start = time.perf_counter()
+        medisoft, zoho, truth = generate_firms(
+            size, match_rate=args.match_rate, noise=args.noise, seed=args.seed
+        )
+        duck = load_dataset(medisoft, zoho)
+        print(f"  (generated and loaded {size} firms in {time.perf_counter() - start:.1f}s)")
+
+        for match_func in matchers + [None]:
+            name = match_func['name'] if match_func else 'all'
+            if name in unavailable:
+                print(f"{size:>9} {name:<18} skipped (unavailable: {unavailable[name]})")
+                continue
+            if name in too_slow:
+                print(f"{size:>9} {name:<18} skipped (exceeded {args.max_seconds}s at a smaller size)")
+                continue
+            try:
+                if match_func:
+                    result = run_matcher(duck, match_func, truth)
+                else:
+                    if unavailable:
+                        print(f"  (all without {', '.join(unavailable)})")
+                    result = run_all(duck, truth, set(unavailable))
+            except ImportError as e:
+                print(f"{size:>9} {name:<18} skipped (unavailable: {e})")
+                unavailable[name] = str(e)
+                continue
+            if result['seconds'] > args.max_seconds:
+                too_slow.add(name)
+            results.append({'size': size, 'matcher': name, **result})
+            print(format_row(size, name, result))
+
+        duck.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
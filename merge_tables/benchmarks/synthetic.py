@@ -0,0 +1,208 @@
+"""Synthetic Medisoft firms and Zoho accounts with known ground-truth links."""
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+SURNAMES = [
+    'Müller', 'Schmidt', 'Schneider', 'Fischer', 'Weber', 'Meyer', 'Wagner',
+    'Becker', 'Schulz', 'Hoffmann', 'Schäfer', 'Koch', 'Bauer', 'Richter',
+    'Klein', 'Wolf', 'Schröder', 'Neumann', 'Schwarz', 'Zimmermann', 'Braun',
+    'Krüger', 'Hofmann', 'Hartmann', 'Lange', 'Schmitt', 'Werner', 'Krause',
+    'Meier', 'Lehmann', 'Schmid', 'Schulze', 'Maier', 'Köhler', 'Herrmann',
+    'König', 'Walter', 'Mayer', 'Huber', 'Kaiser', 'Fuchs', 'Peters', 'Lang',
+    'Scholz', 'Möller', 'Weiß', 'Jung', 'Hahn', 'Vogel', 'Friedrich'
+]
+TRADES = [
+    'Bau', 'Elektro', 'Sanitär', 'Logistik', 'Consulting', 'Maschinenbau',
+    'Pflegedienst', 'Dachdeckerei', 'Metallbau', 'Spedition', 'Autohaus',
+    'Bäckerei', 'Gebäudereinigung', 'Haustechnik', 'Immobilien', 'Druckerei',
+    'Tischlerei', 'Software', 'Medizintechnik', 'Gartenbau', 'Transporte',
+    'Steuerberatung', 'Handel', 'Kunststofftechnik', 'Sicherheitsdienst'
+]
+LEGAL_FORMS = [
+    'GmbH', 'GmbH & Co. KG', 'AG', 'KG', 'e.K.', 'UG (haftungsbeschränkt)',
+    'OHG', 'GbR', ''
+]
+STREET_NAMES = [
+    'Haupt', 'Bahnhof', 'Garten', 'Schul', 'Berliner', 'Kirch', 'Wald',
+    'Dorf', 'Berg', 'Linden', 'Friedrich', 'Industrie', 'Mühlen', 'Goethe',
+    'Schiller', 'Post', 'Feld', 'Wiesen', 'Rosen', 'Birken', 'Markt',
+    'Kaiser', 'Hamburger', 'Münchner', 'Tal', 'Sonnen', 'Eichen', 'Bismarck'
+]
+STREET_TYPES = ['straße', 'str.', 'weg', 'platz', 'allee', 'ring', 'gasse']
+TLDS = ['de', 'com', 'eu', 'de', 'de']
+
+
+def _choice(rng: np.random.Generator, values: list, size: int) -> np.ndarray:
+    """Draw size values from a list into an object array."""
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array[rng.integers(0, len(values), size)]
+
+
+def _join(*columns) -> np.ndarray:
+    """Concatenate object arrays (or scalars) element-wise."""
+    result = columns[0]
+    for column in columns[1:]:
+        result = result + column
+    return result
+
+
+def _typo(rng: np.random.Generator, names: np.ndarray) -> np.ndarray:
+    """Delete, duplicate or swap one character per name."""
+    out = names.copy()
+    kinds = rng.integers(0, 3, len(names))
+    positions = rng.random(len(names))
+    for i, name in enumerate(names):
+        if len(name) < 4:
+            continue
+        p = 1 + int(positions[i] * (len(name) - 2))
+        if kinds[i] == 0:
+            out[i] = name[:p] + name[p + 1:]
+        elif kinds[i] == 1:
+            out[i] = name[:p] + name[p] + name[p:]
+        else:
+            out[i] = name[:p - 1] + name[p] + name[p - 1] + name[p + 1:]
+    return out
+
+
+def generate_firms(
+    n_firms: int,
+    n_accounts: int = None,
+    match_rate: float = 0.7,
+    noise: float = 0.3,
+    seed: int = 0
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Generate synthetic Medisoft firms and Zoho accounts.
+
+    A share match_rate of the firms has a counterpart among the accounts,
+    the rest of the accounts are unrelated firms. Each counterpart is a
+    noisy copy: with probability noise per perturbation, its legal form
+    is changed, its name gets a typo or reordered tokens, its street type
+    is abbreviated or spelled out, its house number becomes a range and
+    it moves to a neighbouring postcode.
+
+    Args:
+        n_firms: Number of Medisoft firms
+        n_accounts: Number of Zoho accounts (default: n_firms)
+        match_rate: Share of firms that have a Zoho counterpart
+        noise: Probability of each perturbation on a counterpart
+        seed: Random seed
+
+    Returns:
+        (medisoft_firms, zoho_accounts, truth) where truth holds the
+        (rec_id, Id) ground-truth links
+    """
+    if n_accounts is None:
+        n_accounts = n_firms
+    rng = np.random.default_rng(seed)
+    n_total = n_firms + n_accounts
+
+    # A pool of distinct firms; the first n_firms are Medisoft firms
+    surnames = _choice(rng, SURNAMES, n_total)
+    trades = _choice(rng, TRADES, n_total)
+    legal_forms = _choice(rng, LEGAL_FORMS, n_total)
+    numbers = rng.integers(1, 200, n_total)
+    streets = _join(_choice(rng, STREET_NAMES, n_total), _choice(rng, STREET_TYPES, n_total))
+    house_numbers = numbers.astype(str).astype(object)
+    postcodes = np.char.zfill(rng.integers(1067, 99999, n_total).astype(str), 5).astype(object)
+    # Distinguish firms sharing surname and trade
+    branch = rng.integers(0, 10, n_total)
+    names = _join(surnames, ' ', trades, np.where(branch < 7, '', ' ' + _choice(rng, SURNAMES, n_total)))
+    full_names = np.where(legal_forms == '', names, _join(names, ' ', legal_forms))
+    area_codes = rng.integers(30, 9999, n_total).astype(str).astype(object)
+    subscribers = rng.integers(100000, 9999999, n_total).astype(str).astype(object)
+    domains = _join(
+        np.char.lower(_join(surnames, '-', trades).astype(str)).astype(object),
+        rng.integers(1, 10000, n_total).astype(str).astype(object),
+        '.', _choice(rng, TLDS, n_total)
+    )
+
+    firm_ids = np.arange(n_firms)
+    medisoft = pd.DataFrame({
+        'rec_id': [f"M{i:08d}" for i in firm_ids],
+        'name': full_names[:n_firms],
+        'kuerzel': [f"{s[:3].upper()}{i % 1000:03d}" for i, s in zip(firm_ids, surnames[:n_firms])],
+        'plz': postcodes[:n_firms],
+        'strasse': _join(streets[:n_firms], ' ', house_numbers[:n_firms]),
+        'telefon': _join('0', area_codes[:n_firms], ' ', subscribers[:n_firms]),
+        'email': _join('info@', domains[:n_firms])
+    })
+
+    # Accounts: noisy copies of matched firms, then unrelated firms
+    n_matched = min(int(n_firms * match_rate), n_accounts)
+    matched = rng.choice(n_firms, n_matched, replace=False)
+    source = np.concatenate([matched, np.arange(n_firms, n_firms + n_accounts - n_matched)])
+
+    acc_names = names[source].copy()
+    acc_legal = legal_forms[source].copy()
+    acc_streets = streets[source].copy()
+    acc_numbers = house_numbers[source].copy()
+    acc_postcodes = postcodes[source].copy()
+    is_copy = np.arange(n_accounts) < n_matched
+
+    def perturbed(p=noise):
+        return is_copy & (rng.random(n_accounts) < p)
+
+    mask = perturbed()
+    acc_legal[mask] = _choice(rng, LEGAL_FORMS, mask.sum())
+    mask = perturbed()
+    acc_names[mask] = _typo(rng, acc_names[mask])
+    mask = perturbed(noise / 3)
+    acc_names[mask] = [' '.join(reversed(n.split(' ', 1))) for n in acc_names[mask]]
+    mask = perturbed()
+    acc_streets[mask] = [
+        s.replace('straße', 'str.') if 'straße' in s else s.replace('str.', 'strasse')
+        for s in acc_streets[mask]
+    ]
+    mask = perturbed(noise / 2)
+    acc_numbers[mask] = [f"{n}-{int(n) + 2}" for n in acc_numbers[mask]]
+    mask = perturbed(noise / 5)
+    acc_postcodes[mask] = [f"{int(p) + 1:05d}" for p in acc_postcodes[mask]]
+
+    acc_full_names = np.where(acc_legal == '', acc_names, _join(acc_names, ' ', acc_legal))
+    order = rng.permutation(n_accounts)
+
+    zoho = pd.DataFrame({
+        'Id': [f"Z{i:09d}" for i in range(n_accounts)],
+        'Account_Name': acc_full_names[order],
+        'Billing_Street': _join(acc_streets, ' ', acc_numbers)[order],
+        'Billing_Code': acc_postcodes[order],
+        'Phone': np.where(
+            rng.random(n_accounts) < 0.5,
+            _join('+49 ', area_codes[source], '/', subscribers[source]),
+            None
+        )[order],
+        'Website': np.where(
+            rng.random(n_accounts) < 0.5,
+            _join('https://www.', domains[source], '/'),
+            None
+        )[order]
+    })
+
+    # Position of each original account in the shuffled frame
+    position = np.empty(n_accounts, dtype=np.int64)
+    position[order] = np.arange(n_accounts)
+    truth = pd.DataFrame({
+        'rec_id': medisoft['rec_id'].to_numpy()[matched],
+        'Id': zoho['Id'].to_numpy()[position[:n_matched]]
+    })
+    return medisoft, zoho, truth
+
+
+def generate_plz_centroids(postcodes: pd.Series, seed: int = 0) -> pd.DataFrame:
+    """
+    Generate centroids (plz, lat, lon) for a set of postcodes.
+
+    Centroids are laid out along a curve through Germany in postcode order,
+    so consecutive postcodes are a few kilometres apart, as they mostly are.
+    """
+    rng = np.random.default_rng(seed)
+    plz = pd.Series(postcodes.dropna().unique()).sort_values(ignore_index=True)
+    position = plz.astype(int).to_numpy() / 100000
+    lat = 47.3 + 7.7 * position + rng.normal(0, 0.01, len(plz))
+    lon = 6.0 + 9.0 * (0.5 + 0.5 * np.sin(position * 40)) + rng.normal(0, 0.01, len(plz))
+    return pd.DataFrame({'plz': plz, 'lat': lat, 'lon': lon})
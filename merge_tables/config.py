@@ -1,8 +1,15 @@
 """Configuration management for the firm matching process."""
 
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 
+# Repository root, for the modules shared with the loaders (instrumentation)
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
 
 def load_config():
     """Load environment variables from .env file."""
@@ -14,6 +21,16 @@ def get_table_name() -> str:
     return os.getenv('TABLE_FIRMS_ZOHO', 'pg.medisoft.table_firms_zoho')
 
 
+def get_zoho_hash_table_name() -> str:
+    """Get the table holding the Zoho account input hashes of the last run."""
+    return os.getenv('TABLE_ZOHO_HASHES', 'pg.medisoft.table_zoho_input_hashes')
+
+
+def get_match_mode() -> str:
+    """Get the matching mode: 'full' rescoring or 'incremental' (changes only)."""
+    return os.getenv('MATCH_MODE', 'full').strip().lower()
+
+
 def get_enabled_functions() -> list:
     """Get list of enabled matching functions from environment."""
     enabled_functions_env = os.getenv('ENABLED_MATCHING_FUNCTIONS', '')
@@ -22,6 +39,175 @@ def get_enabled_functions() -> list:
     return []
 
 
+def get_match_workers() -> int:
+    """Get the number of matching functions scored concurrently."""
+    return int(os.getenv('MATCH_WORKERS', '4'))
+
+
+def get_match_assignment() -> str:
+    """Get how candidates are resolved: 'priority' (per function) or 'global' (one-to-one)."""
+    return os.getenv('MATCH_ASSIGNMENT', 'priority').strip().lower()
+
+
+def get_match_assignment_optimal_max() -> int:
+    """Get the largest component (firms + accounts) assigned optimally (0: greedy only)."""
+    return int(os.getenv('MATCH_ASSIGNMENT_OPTIMAL_MAX', '50'))
+
+
+def get_parse_workers() -> int:
+    """Get the number of libpostal worker processes (default: all cores)."""
+    return int(os.getenv('ADDRESS_PARSE_WORKERS', os.cpu_count() or 1))
+
+
+def get_parse_cache_path() -> str:
+    """Get the DuckDB file used to cache parsed addresses (empty disables it)."""
+    return os.getenv('PARSE_CACHE_PATH', 'parse_cache.duckdb')
+
+
+def get_parse_cache_max_age_days() -> int:
+    """Get the number of days after which an unused cache entry is evicted (0: never)."""
+    return int(os.getenv('PARSE_CACHE_MAX_AGE_DAYS', '180'))
+
+
+def get_parse_cache_max_rows() -> int:
+    """Get the maximum number of cached addresses (0: unlimited)."""
+    return int(os.getenv('PARSE_CACHE_MAX_ROWS', '5000000'))
+
+
+def get_parse_daemon_socket() -> str:
+    """Get the Unix socket of the libpostal parsing daemon (empty disables it)."""
+    return os.getenv(
+        'PARSE_DAEMON_SOCKET',
+        os.path.join(tempfile.gettempdir(), 'merge_tables_libpostal.sock')
+    )
+
+
+def get_parse_cache_read_only() -> bool:
+    """Whether the parse cache is only read (new parses are not stored)."""
+    return os.getenv('PARSE_CACHE_READ_ONLY', '') == '1'
+
+
+def get_dedup_sources() -> bool:
+    """Whether duplicates within each source are clustered and matched through one representative."""
+    return os.getenv('DEDUP_SOURCES', '') == '1'
+
+
+def get_dedup_min_score() -> float:
+    """Minimum name similarity of two rows of one source in the same postcode to be duplicates."""
+    return float(os.getenv('DEDUP_MIN_SCORE', '0.95'))
+
+
+def get_match_partition_by() -> str:
+    """Get the blocking key of the partitioned mode: plz, name or empty (off)."""
+    return os.getenv('MATCH_PARTITION_BY', '').strip().lower()
+
+
+def get_match_partition_prefix() -> int:
+    """Get the number of leading characters of the blocking key forming a partition."""
+    return int(os.getenv('MATCH_PARTITION_PREFIX', '2'))
+
+
+def get_match_partition_workers() -> int:
+    """Get the number of worker processes of the partitioned mode."""
+    return int(os.getenv('MATCH_PARTITION_WORKERS', os.cpu_count() or 1))
+
+
+def get_match_partition_memory_limit() -> str:
+    """Get the DuckDB memory limit of each partition worker."""
+    return os.getenv('MATCH_PARTITION_MEMORY_LIMIT', '2GB')
+
+
+def get_libpostal_version() -> str:
+    """Get the libpostal version the parse cache is keyed on."""
+    version = os.getenv('LIBPOSTAL_VERSION')
+    if version:
+        return version
+    try:
+        from importlib.metadata import version as package_version
+        return package_version('postal')
+    except Exception:
+        return 'unknown'
+
+
+def get_tfidf_min_score() -> float:
+    """Get the minimum cosine similarity of the TF-IDF name matcher."""
+    return float(os.getenv('TFIDF_MIN_SCORE', '0.85'))
+
+
+def get_tfidf_top_k() -> int:
+    """Get the number of candidates kept per firm by the TF-IDF name matcher."""
+    return int(os.getenv('TFIDF_TOP_K', '3'))
+
+
+def get_tfidf_ngram_size() -> int:
+    """Get the character n-gram size of the TF-IDF name matcher."""
+    return int(os.getenv('TFIDF_NGRAM_SIZE', '3'))
+
+
+def get_tfidf_max_df() -> float:
+    """Get the document frequency share above which n-grams are ignored."""
+    return float(os.getenv('TFIDF_MAX_DF', '0.05'))
+
+
+def get_tfidf_max_df_min_count() -> int:
+    """Get the number of names an n-gram may always occur in before TFIDF_MAX_DF applies."""
+    return int(os.getenv('TFIDF_MAX_DF_MIN_COUNT', '1000'))
+
+
+def get_tfidf_chunk_size() -> int:
+    """Get the number of firms multiplied per sparse matrix chunk."""
+    return int(os.getenv('TFIDF_CHUNK_SIZE', '500'))
+
+
+def get_tfidf_workers() -> int:
+    """Get the number of threads multiplying TF-IDF chunks."""
+    return int(os.getenv('TFIDF_WORKERS', os.cpu_count() or 1))
+
+
+def get_phonetic_min_score() -> float:
+    """Get the minimum name similarity of the phonetic key matcher."""
+    return float(os.getenv('PHONETIC_MIN_SCORE', '0.85'))
+
+
+def _column_list(env_var: str, default: str) -> list:
+    return [c.strip() for c in os.getenv(env_var, default).split(',') if c.strip()]
+
+
+def get_contact_phone_columns() -> list:
+    """Get the medisoft_firms columns holding phone numbers."""
+    return _column_list('CONTACT_PHONE_COLUMNS', 'telefon')
+
+
+def get_contact_domain_columns() -> list:
+    """Get the medisoft_firms columns holding websites or e-mail addresses."""
+    return _column_list('CONTACT_DOMAIN_COLUMNS', 'email,homepage')
+
+
+def get_contact_country_code() -> str:
+    """Get the country calling code of national phone numbers (default: Germany)."""
+    return os.getenv('CONTACT_COUNTRY_CODE', '49').lstrip('+')
+
+
+def get_contact_ignored_domains() -> list:
+    """Get domains shared by unrelated firms, in addition to the free mail providers."""
+    return [d.lower() for d in _column_list('CONTACT_IGNORED_DOMAINS', '')]
+
+
+def get_plz_centroids_path() -> str:
+    """Get the path of the postcode centroid CSV (plz, lat, lon)."""
+    return os.getenv('PLZ_CENTROIDS_PATH', 'plz_centroids.csv')
+
+
+def get_proximity_radius_km() -> float:
+    """Get the radius within which the proximity matcher compares names."""
+    return float(os.getenv('PROXIMITY_RADIUS_KM', '5'))
+
+
+def get_proximity_min_score() -> float:
+    """Get the minimum name similarity of the proximity matcher."""
+    return float(os.getenv('PROXIMITY_MIN_SCORE', '0.9'))
+
+
 def get_db_config() -> dict:
     """Get database configuration from environment variables."""
     return {
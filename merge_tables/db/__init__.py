@@ -3,17 +3,40 @@
 from .connection import connect_to_postgres_via_duckdb
 from .tables import (
     create_table_firms_zoho,
+    create_table_zoho_hashes,
+    SOURCES,
+    projected_columns,
     setup_temp_tables,
     create_clean_account_name_macro,
+    create_contact_key_macros,
+    record_matches,
     ensure_all_firms_in_table,
     print_summary
 )
+from .publish import load_local_copy, publish_local_copy
+from .incremental import (
+    invalidate_changed_matches,
+    find_changed_inputs,
+    scoped_sources,
+    record_input_hashes
+)
 
 __all__ = [
     'connect_to_postgres_via_duckdb',
     'create_table_firms_zoho',
+    'create_table_zoho_hashes',
+    'SOURCES',
+    'projected_columns',
     'setup_temp_tables',
     'create_clean_account_name_macro',
+    'create_contact_key_macros',
+    'record_matches',
     'ensure_all_firms_in_table',
-    'print_summary'
+    'print_summary',
+    'load_local_copy',
+    'publish_local_copy',
+    'invalidate_changed_matches',
+    'find_changed_inputs',
+    'scoped_sources',
+    'record_input_hashes'
 ]
@@ -0,0 +1,162 @@
+"""Incremental matching: change detection and scoping of the source tables."""
+
+from contextlib import contextmanager
+
+import duckdb
+
+
+def invalidate_changed_matches(duck: duckdb.DuckDBPyConnection, table_name: str):
+    """
+    Clear matches whose Medisoft firm or Zoho account changed since they were made.
+
+    Matches made before input hashes were recorded get the current hashes
+    as their baseline instead.
+    """
+    duck.execute(f"""
+        update {table_name}
+        set medisoft_hash = mh.input_hash,
+            zoho_hash = zh.input_hash
+        from medisoft_input_hashes as mh, zoho_input_hashes as zh
+        where {table_name}.rec_id = mh.rec_id
+        and {table_name}.id_zoho = zh.Id
+        and {table_name}.id_zoho is not null
+        and {table_name}.zoho_hash is null
+    """)
+
+    duck.execute(f"""
+        create or replace temp table invalidated_matches as
+        select t.rec_id
+        from {table_name} as t
+        left join medisoft_input_hashes as mh on mh.rec_id = t.rec_id
+        left join zoho_input_hashes as zh on zh.Id = t.id_zoho
+        where t.id_zoho is not null
+        and (
+            t.medisoft_hash is distinct from mh.input_hash
+            or t.zoho_hash is distinct from zh.input_hash
+        )
+    """)
+
+    duck.execute(f"""
+        update {table_name}
+        set id_zoho = null,
+            match_source = null,
+            match_score = null,
+            matched_at = null,
+            zoho_hash = null
+        where rec_id in (select rec_id from invalidated_matches)
+    """)
+
+    count = duck.sql("select count(*) from invalidated_matches").fetchone()[0]
+    print(f"✓ Invalidated {count} matches whose inputs changed")
+
+
+def find_changed_inputs(
+    duck: duckdb.DuckDBPyConnection,
+    table_name: str,
+    hash_table_name: str
+):
+    """
+    Collect the Medisoft firms and Zoho accounts added or changed since the last run.
+
+    Creates the temp tables changed_medisoft (new, changed or invalidated
+    firms) and changed_zoho (new or changed accounts).
+    """
+    duck.execute(f"""
+        create or replace temp table changed_medisoft as
+        select mh.rec_id
+        from medisoft_input_hashes as mh
+        left join {table_name} as t on t.rec_id = mh.rec_id
+        where t.rec_id is null
+        or t.medisoft_hash is distinct from mh.input_hash
+        union
+        select rec_id from invalidated_matches;
+
+        create or replace temp table changed_zoho as
+        select zh.Id
+        from zoho_input_hashes as zh
+        left join {hash_table_name} as h on h.Id = zh.Id
+        where h.Id is null
+        or h.input_hash is distinct from zh.input_hash;
+    """)
+
+    medisoft_count = duck.sql("select count(*) from changed_medisoft").fetchone()[0]
+    zoho_count = duck.sql("select count(*) from changed_zoho").fetchone()[0]
+    print(f"✓ Found {medisoft_count} new/changed medisoft firms and {zoho_count} new/changed zoho accounts")
+
+
+@contextmanager
+def scoped_sources(
+    duck: duckdb.DuckDBPyConnection,
+    medisoft_filter: str = "true",
+    zoho_filter: str = "true"
+):
+    """
+    Temporarily restrict medisoft_firms and zoho_accounts to the given filters.
+
+    Matchers only read these two tables, so running them inside this
+    context only scores the pairs between the filtered rows.
+    """
+    duck.execute(f"""
+        alter table medisoft_firms rename to medisoft_firms_full;
+        alter table zoho_accounts rename to zoho_accounts_full;
+
+        create table medisoft_firms as
+        select * from medisoft_firms_full where {medisoft_filter};
+
+        create table zoho_accounts as
+        select * from zoho_accounts_full where {zoho_filter};
+    """)
+    try:
+        yield
+    finally:
+        duck.execute("""
+            drop table medisoft_firms;
+            drop table zoho_accounts;
+
+            alter table medisoft_firms_full rename to medisoft_firms;
+            alter table zoho_accounts_full rename to zoho_accounts;
+        """)
+
+
+def record_input_hashes(
+    duck: duckdb.DuckDBPyConnection,
+    table_name: str,
+    hash_table_name: str
+):
+    """
+    Store the current input hashes so that the next run only sees changes.
+
+    Only unmatched firms, which were all scored in this run, take their
+    current hash. Matched firms keep the hash their match was made with,
+    so that a match on a firm changed since then is invalidated by the
+    next incremental run, as for changed Zoho accounts.
+    """
+    duck.execute(f"""
+        update {table_name}
+        set medisoft_hash = mh.input_hash
+        from medisoft_input_hashes as mh
+        where {table_name}.rec_id = mh.rec_id
+        and {table_name}.id_zoho is null
+        and {table_name}.medisoft_hash is distinct from mh.input_hash
+    """)
+
+    duck.execute(f"""
+        create or replace temp table stale_zoho_hashes as
+        select h.Id
+        from {hash_table_name} as h
+        left join zoho_input_hashes as zh on zh.Id = h.Id
+        where zh.Id is null
+        or h.input_hash is distinct from zh.input_hash
+    """)
+    duck.execute(f"""
+        delete from {hash_table_name}
+        where Id in (select Id from stale_zoho_hashes)
+    """)
+    duck.execute(f"""
+        insert into {hash_table_name} (Id, input_hash)
+        select zh.Id, zh.input_hash
+        from zoho_input_hashes as zh
+        left join {hash_table_name} as h on h.Id = zh.Id
+        where h.Id is null
+    """)
+    print("✓ Recorded input hashes for the next incremental run")
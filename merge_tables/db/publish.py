@@ -0,0 +1,161 @@
+"""Local working copies of remote tables and their bulk publication."""
+
+from typing import List, Tuple
+
+import duckdb
+
+
+def split_table_name(table_name: str) -> Tuple[str, str, str]:
+    """Split 'catalog.schema.table' into its three parts."""
+    parts = table_name.split('.')
+    if len(parts) != 3:
+        raise ValueError(f"Expected catalog.schema.table, got '{table_name}'")
+    return parts[0], parts[1], parts[2]
+
+
+def catalog_type(duck: duckdb.DuckDBPyConnection, catalog: str) -> str:
+    """Return the type of an attached database ('postgres', 'duckdb', ...)."""
+    row = duck.execute(
+        "select type from duckdb_databases() where database_name = ?", [catalog]
+    ).fetchone()
+    return row[0] if row else 'duckdb'
+
+
+def load_local_copy(duck: duckdb.DuckDBPyConnection, remote_table: str, local_table: str) -> str:
+    """
+    Copy a remote table into the in-memory database with a single scan.
+
+    A second copy (<local_table>_published) remembers the remote state, so
+    that publish_local_copy only sends the rows that changed.
+    """
+    duck.execute(f"""
+        create or replace table {local_table} as
+        select * from {remote_table};
+
+        create or replace table {local_table}_published as
+        select * from {local_table};
+    """)
+    count = duck.sql(f"select count(*) from {local_table}").fetchone()[0]
+    print(f"✓ Loaded {count} rows of {remote_table} into {local_table}")
+    return local_table
+
+
+def _columns(duck: duckdb.DuckDBPyConnection, local_table: str) -> List[str]:
+    return [row[0] for row in duck.sql(f"describe {local_table}").fetchall()]
+
+
+def _postgres_execute(duck: duckdb.DuckDBPyConnection, catalog: str, sql: str):
+    """Run a statement on the PostgreSQL server itself."""
+    escaped = sql.replace("'", "''")
+    duck.execute(f"call postgres_execute('{catalog}', '{escaped}')")
+
+
+def publish_local_copy(
+    duck: duckdb.DuckDBPyConnection,
+    local_table: str,
+    remote_table: str,
+    key: str
+):
+    """
+    Publish the rows of a local copy that changed since load_local_copy.
+
+    Rows added or changed locally are upserted by key, rows deleted locally
+    are deleted. On PostgreSQL, the changed rows and the deleted keys are
+    copied into staging tables in one COPY each, then merged with a single
+    server-side INSERT ... ON CONFLICT and DELETE, so the number of round
+    trips does not depend on the number of rows.
+    """
+    columns = _columns(duck, local_table)
+    column_list = ', '.join(columns)
+    duck.execute(f"""
+        create or replace temp table {local_table}_changes as
+        select {column_list} from {local_table}
+        except
+        select {column_list} from {local_table}_published;
+
+        create or replace temp table {local_table}_deletes as
+        select {key} from {local_table}_published
+        except
+        select {key} from {local_table};
+    """)
+    changed = duck.sql(f"select count(*) from {local_table}_changes").fetchone()[0]
+    deleted = duck.sql(f"select count(*) from {local_table}_deletes").fetchone()[0]
+    if changed == 0 and deleted == 0:
+        print(f"✓ No changes to publish to {remote_table}")
+        return
+
+    catalog, schema, table = split_table_name(remote_table)
+
+    if catalog_type(duck, catalog) == 'postgres':
+        quoted = ', '.join(f'"{c}"' for c in columns)
+        updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns if c != key)
+        target = f'"{schema}"."{table}"'
+        staging = f'"{schema}"."{table}_staging"'
+        deletes = f'"{schema}"."{table}_deletes"'
+        unique_index = f'"{schema}"."{table}_{key}_key"'
+
+        # The conflict target needs a primary key or a unique index on the key,
+        # which cannot be built on a table that already has duplicate keys
+        _postgres_execute(duck, catalog, f"""
+            do $$ begin
+                if not exists (
+                    select 1 from pg_constraint
+                    where conrelid = '{target}'::regclass and contype = 'p'
+                ) and to_regclass('{unique_index}') is null then
+                    if exists (
+                        select 1 from {target}
+                        where "{key}" is not null
+                        group by "{key}"
+                        having count(*) > 1
+                    ) then
+                        raise exception '% has duplicate values of %, remove them before publishing',
+                            '{target}', '{key}';
+                    end if;
+                    create unique index if not exists "{table}_{key}_key" on {target} ("{key}");
+                end if;
+            end $$;
+            drop table if exists {staging};
+            create unlogged table {staging} (like {target} including defaults);
+            drop table if exists {deletes};
+            create unlogged table {deletes} as select "{key}" from {target} with no data;
+        """)
+        duck.execute("call pg_clear_cache()")
+
+        # One COPY of all changed rows, one of all deleted keys
+        duck.execute(f"""
+            insert into {catalog}.{schema}.{table}_staging ({column_list})
+            select {column_list} from {local_table}_changes;
+
+            insert into {catalog}.{schema}.{table}_deletes ({key})
+            select {key} from {local_table}_deletes;
+        """)
+
+        # One server-side merge
+        _postgres_execute(duck, catalog, f"""
+            insert into {target} ({quoted})
+            select {quoted} from {staging}
+            on conflict ("{key}") do update set {updates};
+            delete from {target}
+            where "{key}" in (select "{key}" from {deletes});
+            drop table {staging};
+            drop table {deletes};
+        """)
+    else:
+        duck.execute(f"""
+            begin transaction;
+
+            delete from {remote_table}
+            where {key} in (select {key} from {local_table}_changes)
+            or {key} in (select {key} from {local_table}_deletes);
+
+            insert into {remote_table} ({column_list})
+            select {column_list} from {local_table}_changes;
+
+            commit;
+        """)
+
+    duck.execute(f"""
+        create or replace table {local_table}_published as
+        select * from {local_table}
+    """)
+    print(f"✓ Published {changed} changed and {deleted} deleted rows to {remote_table}")
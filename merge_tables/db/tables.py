@@ -1,39 +1,155 @@
 """Table management and setup functions."""
 
+from typing import Dict, List, Optional, Sequence
+
 import duckdb
+from config import get_contact_domain_columns, get_contact_phone_columns
+
+
+# Columns recording how and from which inputs a match was made
+MATCH_METADATA_COLUMNS = {
+    'match_source': 'varchar',
+    'match_score': 'double',
+    'matched_at': 'timestamp',
+    'medisoft_hash': 'varchar',
+    'zoho_hash': 'varchar'
+}
+
+# Per source: remote table, local snapshot, key, table of the input hashes
+# and columns trimmed on the way in
+SOURCES = {
+    'medisoft': {
+        'remote': 'pg.medisoft.table_firmenstruktur',
+        'table': 'medisoft_firms',
+        'key': 'rec_id',
+        'hashes': 'medisoft_input_hashes',
+        'trimmed': ['name', 'kuerzel']
+    },
+    'zoho': {
+        'remote': 'pg.zoho.Accounts',
+        'table': 'zoho_accounts',
+        'key': 'Id',
+        'hashes': 'zoho_input_hashes',
+        'trimmed': ['Account_Name']
+    }
+}
+
+
+def input_hash_columns(source: str) -> List[str]:
+    """
+    Return the columns of a source covered by its input hash.
+
+    These are the columns the matchers read, including the contact columns
+    of matchers.contact_matcher, so that a change to any of them invalidates
+    the matches of the row in the incremental mode.
+    """
+    if source == 'medisoft':
+        return ['name', 'kuerzel', 'plz', 'strasse'] + get_contact_phone_columns() + get_contact_domain_columns()
+    return ['Account_Name', 'Billing_Street', 'Billing_Code', 'Phone', 'Website']
+
+
+def input_hash_sql(source: str, available: Sequence[str]) -> str:
+    """Return the input hash expression of a source over its hash columns in available."""
+    names = {c.lower(): c for c in available}
+    hashed = [names[c.lower()] for c in input_hash_columns(source) if c.lower() in names]
+    values = ', '.join(f'cast("{c}" as varchar)' for c in hashed)
+    return f"md5(to_json([{values}]))"
 
 
 def create_table_firms_zoho(duck: duckdb.DuckDBPyConnection, table_name: str):
     """Create the table_firms_zoho table if it doesn't exist."""
     duck.execute(f"""
         create table if not exists {table_name} (
-            rec_id varchar,
+            rec_id varchar primary key,
             id_zoho varchar
         )
     """)
+    # Tables created before match metadata was recorded
+    for column, column_type in MATCH_METADATA_COLUMNS.items():
+        duck.execute(f"alter table {table_name} add column if not exists {column} {column_type}")
     print(f"✓ Created/verified {table_name}")
 
 
-def setup_temp_tables(duck: duckdb.DuckDBPyConnection):
-    """Create temporary tables for medisoft_firms and zoho_accounts."""
-    duck.execute("""
-        begin transaction;
+def create_table_zoho_hashes(duck: duckdb.DuckDBPyConnection, hash_table_name: str):
+    """Create the table holding the Zoho account input hashes of the last run."""
+    duck.execute(f"""
+        create table if not exists {hash_table_name} (
+            Id varchar primary key,
+            input_hash varchar
+        )
+    """)
+    print(f"✓ Created/verified {hash_table_name}")
 
-        create or replace temp table medisoft_firms as
-        select * replace (trim(name) as name, trim(kuerzel) as kuerzel) 
-        from pg.medisoft.table_firmenstruktur;
 
-        create or replace temp table zoho_accounts as
-        select Id, trim(Account_Name) as Account_Name 
-        from pg.zoho.Accounts;
+def projected_columns(source: str, available: Sequence[str], columns: Optional[Sequence[str]]) -> List[str]:
+    """
+    Return the columns of a source snapshot, in the order of available.
 
-        commit;
-    """)
-    print("✓ Created temporary tables for medisoft_firms and zoho_accounts")
+    Args:
+        source: 'medisoft' or 'zoho'
+        available: Columns of the table the snapshot is taken from
+        columns: Columns needed in addition to the key and input hash
+                 columns of the source (None: every column); those not in
+                 available are left out
+
+    Returns:
+        List of column names (compared case-insensitively, as in DuckDB)
+    """
+    if columns is None:
+        return list(available)
+    wanted = {c.lower() for c in [SOURCES[source]['key']] + input_hash_columns(source) + list(columns)}
+    return [c for c in available if c.lower() in wanted]
+
+
+def setup_temp_tables(duck: duckdb.DuckDBPyConnection, columns: Optional[Dict[str, Sequence[str]]] = None):
+    """
+    Take one snapshot of each source as medisoft_firms and zoho_accounts.
+
+    Each source is read once, projected to its key and input hash columns
+    plus the columns the matching functions need, so that only those are
+    transferred from PostgreSQL. The snapshots live in the in-memory
+    database rather than the connection's temp schema, so that every cursor
+    of the connection can read them.
+
+    Args:
+        duck: DuckDB connection with PostgreSQL attached as pg
+        columns: Columns needed per source ('medisoft', 'zoho'), e.g. from
+                 matchers.required_columns; a source missing or None keeps
+                 every column
+    """
+    columns = columns or {}
+    selects = []
+    hashes = []
+    counts = {}
+    for source, spec in SOURCES.items():
+        # Binding the query reads the catalog only, not the rows
+        available = duck.sql(f"select * from {spec['remote']}").columns
+        names = projected_columns(source, available, columns.get(source))
+        select_list = ', '.join(
+            f'trim("{c}") as "{c}"' if c.lower() in {t.lower() for t in spec['trimmed']} else f'"{c}"'
+            for c in names
+        )
+        selects.append(f"""
+            create or replace table {spec['table']} as
+            select {select_list}
+            from {spec['remote']};
+        """)
+        hashes.append(f"""
+            create or replace table {spec['hashes']} as
+            select {spec['key']}, {input_hash_sql(source, names)} as input_hash
+            from {spec['table']};
+        """)
+        counts[spec['table']] = len(names)
+
+    # One transaction, so that both snapshots are taken at the same point
+    duck.execute("begin transaction;" + ''.join(selects) + "commit;")
+    duck.execute(''.join(hashes))
+    summary = ' and '.join(f"{table} ({count} columns)" for table, count in counts.items())
+    print(f"✓ Created temporary tables for {summary}")
 
 
 def create_clean_account_name_macro(duck: duckdb.DuckDBPyConnection):
-    """Create the clean_account_name macro for name cleaning."""
+    """Create the clean_account_name and account_name_tokens macros for name cleaning."""
     duck.execute("""
         CREATE OR REPLACE MACRO clean_account_name(str) AS (
             regexp_replace(
@@ -46,8 +162,115 @@ def create_clean_account_name_macro(duck: duckdb.DuckDBPyConnection):
                 '', 'g'
             )
         );
+
+        -- Lowercase word tokens without accents and common legal forms
+        CREATE OR REPLACE MACRO account_name_tokens(str) AS (
+            trim(regexp_replace(
+                regexp_replace(
+                    lower(strip_accents(replace(str, '&#38;', ' '))),
+                    '\\b(gmbh|llc|inc|ltd|corp|corporation|plc)\\b|[^a-z0-9]+',
+                    ' ', 'g'
+                ),
+                ' +', ' ', 'g'
+            ))
+        );
+    """)
+    print("✓ Created clean_account_name and account_name_tokens macros")
+
+
+def create_contact_key_macros(duck: duckdb.DuckDBPyConnection):
+    """Create the normalize_phone and registrable_domain macros for contact keys."""
+    duck.execute("""
+        -- Digits of the first number of a list, with international numbers as 00<country
+        -- code> ('+49 (0)30 / 123 45-6' -> '004930123456'); national numbers get country_code
+        -- and a trunk 0 after the country code ('+49 030') is dropped
+        CREATE OR REPLACE MACRO phone_digits(str, country_code) AS (
+            regexp_replace(
+                regexp_replace(
+                    regexp_replace(
+                        regexp_replace(
+                            replace(regexp_split_to_array(lower(trim(str)), '[,;]| oder ')[1], '(0)', ''),
+                            '[^0-9+]', '', 'g'
+                        ),
+                        '^\\+', '00'
+                    ),
+                    '^0([1-9])', '00' || country_code || '\\1'
+                ),
+                '^00' || country_code || '0', '00' || country_code
+            )
+        );
+
+        -- E.164 number ('030 / 123 45-6' -> '+4930123456'), null without area code
+        -- or with more than 15 digits
+        CREATE OR REPLACE MACRO normalize_phone(str, country_code) AS (
+            '+' || nullif(regexp_extract(phone_digits(str, country_code), '^00([1-9][0-9]{7,14})$', 1), '')
+        );
+
+        -- Host name of a website or e-mail address, without scheme, path, port and www
+        CREATE OR REPLACE MACRO contact_host(str) AS (
+            regexp_replace(
+                trim(regexp_split_to_array(
+                    regexp_replace(
+                        regexp_replace(regexp_split_to_array(lower(trim(str)), '[,;\\s]+')[1], '^.*@', ''),
+                        '^[a-z][a-z0-9+.-]*://', ''
+                    ),
+                    '[/?#:]'
+                )[1], '.'),
+                '^www[0-9]*\\.', ''
+            )
+        );
+
+        -- Registrable domain ('https://www.praxis-mueller.de/kontakt', 'info@praxis-mueller.de'
+        -- -> 'praxis-mueller.de'): the last two labels, three under public suffixes such as
+        -- co.uk (a bare suffix is kept as is); null if not a host name
+        CREATE OR REPLACE MACRO registrable_domain(str) AS (
+            nullif(regexp_extract(
+                contact_host(str),
+                '^(?:[a-z0-9äöüß-]+\\.)*?([a-z0-9äöüß-]+\\.(?:'
+                    || 'ac\\.at|co\\.at|gv\\.at|or\\.at|co\\.uk|org\\.uk|ac\\.uk|com\\.au|net\\.au|org\\.au|'
+                    || 'co\\.nz|com\\.br|com\\.tr|com\\.pl|co\\.jp|com\\.cn|co\\.za|[a-z0-9äöüß-]+))$',
+                1
+            ), '')
+        );
+    """)
+    print("✓ Created normalize_phone and registrable_domain macros")
+
+
+def record_matches(
+    duck: duckdb.DuckDBPyConnection,
+    table_name: str,
+    matches_table: str,
+    source: str,
+    score_column: str
+):
+    """
+    Write matches (rec_id, Id, score) to firms that are still unmatched.
+
+    The best scoring match per firm is kept (ties broken by Id). The match
+    source, score, timestamp and the input hashes of both firms are stored
+    alongside id_zoho.
+    """
+    duck.execute(f"""
+        update {table_name}
+        set id_zoho = m.Id,
+            match_source = '{source}',
+            match_score = m.{score_column},
+            matched_at = current_timestamp,
+            medisoft_hash = mh.input_hash,
+            zoho_hash = zh.input_hash
+        from (
+            select rec_id, Id, {score_column}
+            from {matches_table}
+            qualify row_number() over (
+                partition by rec_id
+                order by {score_column} desc nulls last, Id
+            ) = 1
+        ) as m
+        left join medisoft_input_hashes as mh on mh.rec_id = m.rec_id
+        left join zoho_input_hashes as zh on zh.Id = m.Id
+        where {table_name}.rec_id = m.rec_id
+        and {table_name}.id_zoho is null
     """)
-    print("✓ Created clean_account_name macro")
 
 
 def ensure_all_firms_in_table(duck: duckdb.DuckDBPyConnection, table_name: str):
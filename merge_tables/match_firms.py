@@ -4,26 +4,90 @@ Match firms from Medisoft and Zoho based on names and addresses.
 
 This script:
 1. Creates the table_firms_zoho table if it doesn't exist
-2. Matches firms using a series of configurable matching functions
-3. Updates table_firms_zoho with all matches
+2. Copies it into a local working table with a single scan
+3. Matches firms using a series of configurable matching functions
+4. Publishes the changed rows of the mapping to table_firms_zoho in one step
 
 Matching functions can be dynamically added to the process.
+
+With MATCH_MODE=incremental, only firms and accounts that were added or
+changed since the last run are rescored.
+
+With DEDUP_SOURCES=1, duplicates within each source are clustered first and
+only one representative per cluster is matched; the other firms of a
+cluster then get the match of their representative.
 """
 
-from config import load_config, get_table_name, get_enabled_functions
+from config import (
+    load_config,
+    get_table_name,
+    get_zoho_hash_table_name,
+    get_match_mode,
+    get_enabled_functions,
+    get_dedup_sources
+)
 from db import (
     connect_to_postgres_via_duckdb,
     create_table_firms_zoho,
+    create_table_zoho_hashes,
     setup_temp_tables,
     create_clean_account_name_macro,
+    create_contact_key_macros,
     ensure_all_firms_in_table,
-    print_summary
+    print_summary,
+    load_local_copy,
+    publish_local_copy,
+    invalidate_changed_matches,
+    find_changed_inputs,
+    scoped_sources,
+    record_input_hashes
 )
+from instrumentation import span, report
 from matchers import (
     setup_default_matching_functions,
     run_matching_functions,
+    required_columns,
     MATCHING_FUNCTIONS
 )
+from matchers.dedup import cluster_sources, propagate_cluster_matches, REPRESENTATIVE_FILTERS
+
+
+def run_incremental_matching(
+    duck,
+    table_name: str,
+    hash_table_name: str,
+    medisoft_filter: str = "true",
+    zoho_filter: str = "true"
+):
+    """
+    Run the matching functions on the pairs affected by changed inputs only.
+
+    medisoft_filter and zoho_filter further restrict the rows of each source.
+    """
+    invalidate_changed_matches(duck, table_name)
+    find_changed_inputs(duck, table_name, hash_table_name)
+    
+    # New or changed firms against all accounts
+    print("\n--- Incremental pass 1: new/changed medisoft firms ---")
+    with scoped_sources(
+        duck,
+        medisoft_filter=f"rec_id in (select rec_id from changed_medisoft) and {medisoft_filter}",
+        zoho_filter=zoho_filter
+    ):
+        run_matching_functions(duck, table_name)
+    
+    # Unchanged unmatched firms against new or changed accounts only
+    print("\n--- Incremental pass 2: new/changed zoho accounts ---")
+    with scoped_sources(
+        duck,
+        medisoft_filter=(
+            f"rec_id not in (select rec_id from changed_medisoft) "
+            f"and rec_id in (select rec_id from {table_name} where id_zoho is null) "
+            f"and {medisoft_filter}"
+        ),
+        zoho_filter=f"Id in (select Id from changed_zoho) and {zoho_filter}"
+    ):
+        run_matching_functions(duck, table_name)
 
 
 def main():
@@ -31,49 +95,89 @@ def main():
     # Load configuration
     load_config()
     table_name = get_table_name()
+    hash_table_name = get_zoho_hash_table_name()
+    match_mode = get_match_mode()
     enabled_functions_list = get_enabled_functions()
+    dedup = get_dedup_sources()
     
     print("Starting firm matching process...")
-    print(f"Using table: {table_name}\n")
+    print(f"Using table: {table_name} (mode: {match_mode})\n")
     
     try:
-        # Setup default matching functions
-        setup_default_matching_functions()
-        
-        # Optionally filter by enabled functions from environment
-        if enabled_functions_list:
-            for match_func in MATCHING_FUNCTIONS:
-                if match_func['name'] not in enabled_functions_list:
-                    match_func['enabled'] = False
-            print(f"Enabled matching functions: {', '.join(enabled_functions_list)}\n")
-        
-        # Connect to database
-        duck = connect_to_postgres_via_duckdb()
-        
-        # Create table if needed
-        create_table_firms_zoho(duck, table_name)
-        
-        # Setup temporary tables
-        setup_temp_tables(duck)
-        
-        # Create cleaning macro
-        create_clean_account_name_macro(duck)
-        
-        # Run all matching functions
-        run_matching_functions(duck, table_name)
-        
-        # Ensure all firms are in the table
-        ensure_all_firms_in_table(duck, table_name)
-        
-        # Print summary
-        print_summary(duck, table_name)
+        with span("match_firms", mode=match_mode):
+            # Setup default matching functions
+            setup_default_matching_functions()
+            
+            # Optionally select the enabled functions from environment,
+            # including those disabled by default
+            if enabled_functions_list:
+                for match_func in MATCHING_FUNCTIONS:
+                    match_func['enabled'] = match_func['name'] in enabled_functions_list
+                print(f"Enabled matching functions: {', '.join(enabled_functions_list)}\n")
+            
+            with span("setup"):
+                # Connect to database
+                duck = connect_to_postgres_via_duckdb()
+                
+                # Create tables if needed
+                create_table_firms_zoho(duck, table_name)
+                create_table_zoho_hashes(duck, hash_table_name)
+                
+                # Snapshot each source once, with the columns of the enabled functions
+                setup_temp_tables(
+                    duck,
+                    required_columns([f for f in MATCHING_FUNCTIONS if f['enabled']])
+                )
+                
+                # Create cleaning macros
+                create_clean_account_name_macro(duck)
+                create_contact_key_macros(duck)
+                
+                # Matching works on local copies, published at the end
+                local_table = load_local_copy(duck, table_name, 'firm_matches')
+                local_hash_table = load_local_copy(duck, hash_table_name, 'zoho_hashes')
+            
+            # Cluster duplicates so that one representative per cluster is matched
+            filters = {}
+            if dedup:
+                with span("dedup"):
+                    cluster_sources(duck)
+                filters = REPRESENTATIVE_FILTERS
+            
+            # Run all matching functions
+            with span("matching"):
+                if match_mode == 'incremental':
+                    run_incremental_matching(duck, local_table, local_hash_table, **filters)
+                elif dedup:
+                    with scoped_sources(duck, **filters):
+                        run_matching_functions(duck, local_table)
+                else:
+                    run_matching_functions(duck, local_table)
+                if dedup:
+                    propagate_cluster_matches(duck, local_table)
+            
+            with span("finalize"):
+                # Ensure all firms are in the table
+                ensure_all_firms_in_table(duck, local_table)
+                
+                # Remember the inputs of this run for the next incremental run
+                record_input_hashes(duck, local_table, local_hash_table)
+            
+            with span("publish"):
+                publish_local_copy(duck, local_table, table_name, key='rec_id')
+                publish_local_copy(duck, local_hash_table, hash_table_name, key='Id')
+            
+            # Print summary
+            print_summary(duck, local_table)
         
         print("\n✓ Firm matching process completed successfully!")
         
     except Exception as e:
         print(f"\n✗ Error during firm matching: {e}")
         raise
-
+    
+    finally:
+        report("match_firms")
 
 if __name__ == "__main__":
     main()
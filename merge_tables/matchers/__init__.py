@@ -1,75 +1,379 @@
 """Matching function registry and base functionality."""
 
-from typing import Callable, List, Dict, Any
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Optional, Sequence, Union
+
+from config import (
+    get_match_workers,
+    get_match_partition_by,
+    get_match_assignment,
+    get_match_assignment_optimal_max
+)
+from db import SOURCES, record_matches, ensure_all_firms_in_table
+from instrumentation import span, add_rows
 
 # Registry for matching functions
 MATCHING_FUNCTIONS: List[Dict[str, Any]] = []
 
 
+def resolve_callable(ref: Union[Callable, str]) -> Callable:
+    """Return a callable, importing it first if given as 'module:function'."""
+    if callable(ref):
+        return ref
+    module_name, _, attr = ref.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
 def register_matching_function(
     name: str,
-    func: Callable,
+    func: Optional[Union[Callable, str]] = None,
     description: str = "",
-    enabled: bool = True
+    enabled: bool = True,
+    candidates: Optional[Union[Callable, str]] = None,
+    depends_on: Sequence[str] = (),
+    priority: int = 100,
+    partitionable: bool = False,
+    columns: Optional[Union[Dict[str, Sequence[str]], Callable, str]] = None
 ):
     """
     Register a matching function to be executed during the matching process.
-    
+
+    func and candidates can be given as import paths ('module:function'); the
+    module is then only imported when the function is enabled and about to
+    run. Registering a name again replaces the earlier registration.
+
     Args:
         name: Unique name for the matching function
         func: Function that takes (duck, table_name) and performs matching
         description: Optional description of what the function does
         enabled: Whether this function is enabled (default: True)
+        candidates: Function that takes (duck, table_name) and returns a
+                    DataFrame of (rec_id, Id, score) candidates without
+                    writing them. Matchers providing it are scored in parallel.
+        depends_on: Names of matching functions whose matches must be
+                    written before this one is scored
+        priority: Order in which matches are written (lowest first)
+        partitionable: Whether candidates may be computed per partition of the
+                       blocking key (MATCH_PARTITION_BY); pairs across
+                       partitions are then not considered
+        columns: Columns the function reads per source ('medisoft' from
+                 medisoft_firms, 'zoho' from zoho_accounts), or a function
+                 (or import path) returning them, for columns that depend
+                 on the configuration. The source snapshots only hold the
+                 columns of the enabled functions; without columns, they
+                 keep every column.
     """
-    MATCHING_FUNCTIONS.append({
+    if func is None and candidates is None:
+        raise ValueError(f"Matching function '{name}' needs func or candidates")
+    entry = {
         'name': name,
         'func': func,
         'description': description,
-        'enabled': enabled
-    })
+        'enabled': enabled,
+        'candidates': candidates,
+        'depends_on': list(depends_on),
+        'priority': priority,
+        'partitionable': partitionable,
+        'columns': columns
+    }
+    for i, existing in enumerate(MATCHING_FUNCTIONS):
+        if existing['name'] == name:
+            MATCHING_FUNCTIONS[i] = entry
+            return
+    MATCHING_FUNCTIONS.append(entry)
+
+
+def required_columns(match_funcs: List[Dict[str, Any]]) -> Dict[str, Optional[List[str]]]:
+    """
+    Return the union of the columns declared by match_funcs, per source.
+
+    A source is None (every column) if one of the functions does not declare
+    its columns.
+    """
+    required: Dict[str, Optional[List[str]]] = {source: [] for source in SOURCES}
+    for match_func in match_funcs:
+        declared = match_func['columns']
+        if declared is None:
+            print(f"⚠ {match_func['name']} declares no columns: source snapshots keep every column")
+            return {source: None for source in SOURCES}
+        if not isinstance(declared, dict):
+            declared = resolve_callable(declared)()
+        for source, names in declared.items():
+            if source not in required:
+                raise ValueError(
+                    f"Matching function '{match_func['name']}' declares columns of unknown source '{source}'"
+                )
+            required[source] += [c for c in names if c not in required[source]]
+    return required
+
+
+def schedule_matching_functions(match_funcs: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Group matching functions into levels that can be scored concurrently.
+
+    A function is placed in the level after the last of its dependencies.
+    Dependencies on functions that are not in match_funcs are ignored.
+    Within a level, functions are ordered by priority, then registration order.
+    """
+    names = {f['name'] for f in match_funcs}
+    level_of: Dict[str, int] = {}
+    remaining = list(match_funcs)
+
+    while remaining:
+        progressed = False
+        for match_func in list(remaining):
+            deps = [d for d in match_func['depends_on'] if d in names]
+            if all(d in level_of for d in deps):
+                level_of[match_func['name']] = max((level_of[d] + 1 for d in deps), default=0)
+                remaining.remove(match_func)
+                progressed = True
+        if not progressed:
+            cycle = ', '.join(f['name'] for f in remaining)
+            raise ValueError(f"Circular dependencies between matching functions: {cycle}")
+
+    levels = [[] for _ in range(max(level_of.values()) + 1)] if level_of else []
+    for match_func in match_funcs:
+        levels[level_of[match_func['name']]].append(match_func)
+    return [sorted(level, key=lambda f: f['priority']) for level in levels]
+
+
+def compute_candidates(duck, table_name, match_func, parent_span=None):
+    """
+    Score the candidates of one matching function on its own cursor, without writing them.
+
+    Partitionable functions are scored per partition when MATCH_PARTITION_BY
+    is set, as in run_matching_functions.
+
+    Args:
+        duck: DuckDB connection holding the source snapshots
+        table_name: Table of matches (firms already matched are skipped)
+        match_func: Registry entry of a function with candidates
+        parent_span: Span to nest the timing in, when called from a worker thread
+
+    Returns:
+        pd.DataFrame: Candidates (rec_id, Id, score)
+    """
+    cursor = duck.cursor()
+    try:
+        with span(f"candidates {match_func['name']}", parent=parent_span):
+            if match_func['partitionable'] and get_match_partition_by():
+                from .partitioned import partitioned_candidates
+                candidates_df = partitioned_candidates(cursor, table_name, match_func)
+            else:
+                candidates_df = resolve_callable(match_func['candidates'])(cursor, table_name)
+            add_rows(rows_out=len(candidates_df))
+            return candidates_df
+    finally:
+        cursor.close()
+
+
+def _resolve(duck, table_name, match_func, candidates_df):
+    """Write the candidates of one matching function to firms still unmatched."""
+    if candidates_df is None:
+        with span(match_func['name']):
+            resolve_callable(match_func['func'])(duck, table_name)
+        return
+    with span(f"write {match_func['name']}"):
+        view_name = f"{match_func['name']}_candidates"
+        duck.register(view_name, candidates_df)
+        record_matches(duck, table_name, view_name, match_func['name'], 'score')
+        duck.unregister(view_name)
+
+        matched = duck.sql(f"""
+            select count(*)
+            from {table_name}
+            where match_source = '{match_func['name']}'
+        """).fetchone()[0]
+        add_rows(rows_in=len(candidates_df), rows_out=matched)
+    print(f"  ✓ {match_func['name']}: {len(candidates_df)} candidates, {matched} firms matched")
+
+
+def _assign_globally(duck, table_name, level, candidates_by_name):
+    """
+    Write the candidates of all functions of a level as one one-to-one assignment.
+
+    Firms that are already matched and accounts already linked to a firm are
+    left out, then every remaining firm and account gets at most one match
+    (see matchers.assignment). Each match keeps the function that found it
+    as its match_source.
+    """
+    import pandas as pd
+    from .assignment import assign_one_to_one
+
+    priorities = {f['name']: f['priority'] for f in level}
+    frames = [
+        df[['rec_id', 'Id', 'score']].assign(source=name, priority=priorities[name])
+        for name, df in candidates_by_name.items()
+        if len(df)
+    ]
+    if not frames:
+        return
+    with span("global assignment"):
+        duck.register("all_candidates", pd.concat(frames, ignore_index=True))
+        open_candidates = duck.sql(f"""
+            select c.*
+            from all_candidates as c
+                inner join {table_name} as t on t.rec_id = c.rec_id
+            where t.id_zoho is null
+            and c.Id not in (
+                select id_zoho from {table_name} where id_zoho is not null
+            )
+        """).df()
+        duck.unregister("all_candidates")
+        assigned = assign_one_to_one(open_candidates, get_match_assignment_optimal_max())
+
+        for match_func in level:
+            name = match_func['name']
+            if name not in candidates_by_name:
+                continue
+            matches = assigned[assigned['source'] == name]
+            if len(matches):
+                view_name = f"{name}_assigned"
+                duck.register(view_name, matches)
+                record_matches(duck, table_name, view_name, name, 'score')
+                duck.unregister(view_name)
+            print(f"  ✓ {name}: {len(candidates_by_name[name])} candidates, {len(matches)} firms matched")
 
 
 def run_matching_functions(duck, table_name):
-    """Execute all registered and enabled matching functions."""
+    """
+    Execute all registered and enabled matching functions.
+
+    Candidate sets of independent functions are computed concurrently on
+    separate DuckDB cursors. They are then written one function at a time,
+    in priority order, each only to firms that are still unmatched, so the
+    result does not depend on which function finished first. With
+    MATCH_ASSIGNMENT=global, the candidates of a stage are instead resolved
+    together as a one-to-one assignment of firms to accounts.
+    """
     enabled_functions = [f for f in MATCHING_FUNCTIONS if f['enabled']]
-    
+
     if not enabled_functions:
         print("⚠ No matching functions registered or enabled")
         return
-    
-    print(f"\n--- Running {len(enabled_functions)} matching function(s) ---")
-    for i, match_func in enumerate(enabled_functions, 1):
-        print(f"\n[{i}/{len(enabled_functions)}] {match_func['name']}")
-        if match_func['description']:
-            print(f"  Description: {match_func['description']}")
-        try:
-            match_func['func'](duck, table_name)
-        except Exception as e:
-            print(f"  ✗ Error in {match_func['name']}: {e}")
-            raise
+
+    levels = schedule_matching_functions(enabled_functions)
+    assignment = get_match_assignment()
+    if assignment not in ('priority', 'global'):
+        raise ValueError(f"MATCH_ASSIGNMENT must be 'priority' or 'global', not '{assignment}'")
+
+    # Candidates can only be written to firms present in the table
+    ensure_all_firms_in_table(duck, table_name)
+
+    print(f"\n--- Running {len(enabled_functions)} matching function(s) in {len(levels)} stage(s) ---")
+    i = 0
+    for stage, level in enumerate(levels, 1):
+        for match_func in level:
+            i += 1
+            print(f"\n[{i}/{len(enabled_functions)}] {match_func['name']}")
+            if match_func['description']:
+                print(f"  Description: {match_func['description']}")
+
+        parallel = [f for f in level if f['candidates'] is not None]
+        with span(f"matching stage {stage}") as stage_span, \
+                ThreadPoolExecutor(max_workers=max(1, min(get_match_workers(), len(parallel)))) as pool:
+            futures = {
+                f['name']: pool.submit(compute_candidates, duck, table_name, f, stage_span)
+                for f in parallel
+            }
+
+            # Deterministic resolution in priority order
+            candidates_by_name = {}
+            for match_func in level:
+                try:
+                    candidates_df = None
+                    if match_func['name'] in futures:
+                        candidates_df = futures[match_func['name']].result()
+                    if candidates_df is not None and assignment == 'global':
+                        candidates_by_name[match_func['name']] = candidates_df
+                        continue
+                    _resolve(duck, table_name, match_func, candidates_df)
+                except Exception as e:
+                    print(f"  ✗ Error in {match_func['name']}: {e}")
+                    raise
+
+            if candidates_by_name:
+                _assign_globally(duck, table_name, level, candidates_by_name)
 
 
 def setup_default_matching_functions():
-    """Register the default matching functions."""
-    from .name_matcher import match_by_name
-    from .address_matcher import match_by_address
-    
+    """
+    Register the default matching functions.
+
+    They are registered by import path, so that e.g. the address parsing
+    stack is only loaded when address_match is enabled. contact_match,
+    phonetic_match, proximity_match and tfidf_match are disabled by default
+    and enabled by listing them in ENABLED_MATCHING_FUNCTIONS.
+    """
+    register_matching_function(
+        name="contact_match",
+        candidates="matchers.contact_matcher:contact_candidates",
+        description="Match firms sharing a normalized phone number or website / e-mail domain with one account",
+        enabled=False,
+        columns="matchers.contact_matcher:contact_columns",
+        priority=5
+    )
+
     register_matching_function(
         name="name_match",
-        func=match_by_name,
-        description="Match firms by name using cleaned names and Jaro-Winkler similarity"
+        candidates="matchers.name_matcher:name_candidates",
+        description="Match firms by name using cleaned names and Jaro-Winkler similarity",
+        columns={'medisoft': ['name', 'kuerzel'], 'zoho': ['Account_Name']},
+        priority=10,
+        partitionable=True
     )
-    
+
+    register_matching_function(
+        name="phonetic_match",
+        candidates="matchers.phonetic_matcher:phonetic_candidates",
+        description="Match firms by Kölner Phonetik codes of their name tokens, verified by Jaro-Winkler similarity",
+        enabled=False,
+        depends_on=["contact_match"],
+        columns={'medisoft': ['name', 'kuerzel'], 'zoho': ['Account_Name']},
+        priority=15,
+        partitionable=True
+    )
+
     register_matching_function(
         name="address_match",
-        func=match_by_address,
-        description="Match firms by address (road, postcode, house number)"
+        candidates="matchers.address_matcher:address_candidates",
+        description="Match firms by address (road, postcode, house number)",
+        depends_on=["contact_match"],
+        columns={'medisoft': ['name', 'plz', 'strasse'], 'zoho': ['Account_Name', 'Billing_Street', 'Billing_Code']},
+        priority=20,
+        partitionable=True
+    )
+
+    register_matching_function(
+        name="proximity_match",
+        candidates="matchers.proximity_matcher:proximity_candidates",
+        description="Match firms by name similarity within a radius of their postcode centroid",
+        enabled=False,
+        depends_on=["contact_match"],
+        columns={'medisoft': ['name', 'kuerzel', 'plz'], 'zoho': ['Account_Name', 'Billing_Code']},
+        priority=25
+    )
+
+    register_matching_function(
+        name="tfidf_match",
+        candidates="matchers.tfidf_matcher:tfidf_candidates",
+        description="Match firms by TF-IDF cosine similarity of character n-grams of their names",
+        enabled=False,
+        depends_on=["contact_match"],
+        columns={'medisoft': ['name', 'kuerzel'], 'zoho': ['Account_Name']},
+        priority=30,
+        partitionable=True
     )
 
 
 __all__ = [
     'MATCHING_FUNCTIONS',
     'register_matching_function',
+    'resolve_callable',
+    'compute_candidates',
+    'required_columns',
+    'schedule_matching_functions',
     'run_matching_functions',
     'setup_default_matching_functions'
 ]
@@ -2,12 +2,56 @@
 
 import duckdb
 import pandas as pd
-from postal.parser import parse_address
-from utils.address_utils import clean_german_road, split_and_clean_house_number
+from db import record_matches
+from instrumentation import span, add_rows, explain_analyze
+from utils.parse_cache import parse_addresses_cached
+from utils.address_utils import clean_german_road_column, split_and_clean_house_number_column
 
 
-def match_by_address(duck: duckdb.DuckDBPyConnection, table_name: str):
-    """Match remaining firms by address."""
+def prepare_addresses(df: pd.DataFrame, street_col: str, code_col: str) -> pd.DataFrame:
+    """Parse and clean the street/postcode columns of a DataFrame."""
+    df = df.dropna(ignore_index=True).copy()
+    df['raw_address'] = (
+        df[street_col] + ", " + 
+        df[code_col] + ", Deutschland"
+    )
+    
+    # Extract address components
+    parsed = parse_addresses_cached(df['raw_address'].tolist())
+    for component, values in parsed.items():
+        df[component] = values
+    
+    df['road_cleaned'] = clean_german_road_column(df['road'])
+    df[['house_num_1', 'house_num_2']] = (
+        split_and_clean_house_number_column(df['house_number'])
+    )
+    return df
+
+
+def address_keys(df: pd.DataFrame, postcode_col: str) -> pd.DataFrame:
+    """
+    Explode parsed addresses into one row per (road, postcode, house number) key.
+
+    Each address yields a key for its house number as parsed and for each
+    number of a range, so "62-64" can be found under 62 and under 64.
+
+    Returns:
+        DataFrame with columns row_id, road_cleaned, postcode, house_key
+    """
+    keys = pd.concat([
+        pd.DataFrame({
+            'row_id': df['row_id'],
+            'road_cleaned': df['road_cleaned'],
+            'postcode': df[postcode_col],
+            'house_key': df[column]
+        })
+        for column in ['house_number', 'house_num_1', 'house_num_2']
+    ], ignore_index=True)
+    return keys.dropna().drop_duplicates(ignore_index=True)
+
+
+def address_candidates(duck: duckdb.DuckDBPyConnection, table_name: str) -> pd.DataFrame:
+    """Score the best zoho account at the same address per unmatched medisoft firm."""
     print("\n--- Matching firms by address ---")
     
     # Get unmatched medisoft firms
@@ -23,88 +67,63 @@ def match_by_address(duck: duckdb.DuckDBPyConnection, table_name: str):
     
     if len(med_df) == 0:
         print("✓ No unmatched firms to match by address")
-        return
+        return pd.DataFrame(columns=['rec_id', 'Id', 'score'])
     
     print(f"  Processing {len(med_df)} unmatched medisoft firms")
     
     # Clean medisoft data
-    med_clean_df = med_df.dropna(ignore_index=True).copy()
-    med_clean_df['raw_address'] = (
-        med_clean_df['strasse'] + ", " + 
-        med_clean_df['plz'] + ", Deutschland"
-    )
-    med_clean_df['parsed_address'] = (
-        med_clean_df['raw_address']
-        .dropna()
-        .apply(parse_address)
-    )
-    
-    # Extract address components
-    med_clean_df = pd.concat([
-        med_clean_df, 
-        med_clean_df['parsed_address']
-        .apply(lambda x: {k: v for v, k in x})
-        .apply(pd.Series)[['road', 'house_number', 'postcode']]
-    ], axis=1)
-    
-    med_clean_df['road_cleaned'] = med_clean_df['road'].apply(clean_german_road)
-    med_clean_df[['house_num_1', 'house_num_2']] = (
-        med_clean_df['house_number'].apply(split_and_clean_house_number)
-    )
+    with span("parse medisoft addresses"):
+        med_clean_df = prepare_addresses(med_df, 'strasse', 'plz')
+        med_clean_df['row_id'] = range(len(med_clean_df))
+        med_keys = address_keys(med_clean_df, 'plz')
+        add_rows(rows_in=len(med_df), rows_out=len(med_clean_df))
     
     # Get zoho accounts
     zoho_df = duck.sql("""
         select Id, Account_Name, Billing_Code, Billing_Street 
-        from pg.zoho.Accounts
+        from zoho_accounts
     """).df()
     
     # Clean zoho data
-    zoho_df = zoho_df.dropna(ignore_index=True).copy()
-    zoho_df['raw_address'] = (
-        zoho_df['Billing_Street'] + ", " + 
-        zoho_df['Billing_Code'] + ", Deutschland"
-    )
-    zoho_df['parsed_address'] = zoho_df['raw_address'].apply(parse_address)
-    
-    # Extract address components
-    zoho_df = pd.concat([
-        zoho_df, 
-        zoho_df['parsed_address']
-        .apply(lambda x: {k: v for v, k in x})
-        .apply(pd.Series)[['road', 'house_number', 'postcode']]
-    ], axis=1)
-    
-    zoho_df['road_cleaned'] = zoho_df['road'].apply(clean_german_road)
-    zoho_df[['house_num_1', 'house_num_2']] = (
-        zoho_df['house_number'].apply(split_and_clean_house_number)
-    )
+    with span("parse zoho addresses"):
+        rows_in = len(zoho_df)
+        zoho_df = prepare_addresses(zoho_df, 'Billing_Street', 'Billing_Code')
+        zoho_df['row_id'] = range(len(zoho_df))
+        zoho_keys = address_keys(zoho_df, 'postcode')
+        add_rows(rows_in=rows_in, rows_out=len(zoho_df))
     
     # Register DataFrames with DuckDB
     duck.register("med_clean_df", med_clean_df)
     duck.register("zoho_df", zoho_df)
-    
-    # Match by address
-    address_match_df = duck.sql("""
+    duck.register("med_keys", med_keys)
+    duck.register("zoho_keys", zoho_keys)
+    
+    # Match by address: a hash equi-join on the exploded keys, one pair per shared key set
+    sql = """
+        with address_pairs as (
+            select distinct
+                med_keys.row_id as med_row_id,
+                zoho_keys.row_id as zoho_row_id
+            from med_keys
+            join zoho_keys
+            on med_keys.road_cleaned = zoho_keys.road_cleaned
+            and med_keys.postcode = zoho_keys.postcode
+            and med_keys.house_key = zoho_keys.house_key
+        )
         select 
             name,
             Account_Name,
             jaro_winkler_similarity(
                 clean_account_name(name), 
                 clean_account_name(Account_Name)
-            ) as similarity, 
-            med_clean_df.* exclude (name),
-            zoho_df.* exclude (Account_Name)
-        from med_clean_df
-        join zoho_df
-        on med_clean_df.road_cleaned = zoho_df.road_cleaned
-        and med_clean_df.plz = zoho_df.postcode
-        and (
-            med_clean_df.house_number = zoho_df.house_number
-            or med_clean_df.house_num_1 = zoho_df.house_num_1
-            or med_clean_df.house_num_2 = zoho_df.house_num_2
-        )
+            ) as score, 
+            med_clean_df.* exclude (name, row_id),
+            zoho_df.* exclude (Account_Name, row_id)
+        from address_pairs
+        join med_clean_df on med_clean_df.row_id = address_pairs.med_row_id
+        join zoho_df on zoho_df.row_id = address_pairs.zoho_row_id
         where (
-            similarity > 0.7 
+            score > 0.7 
             or (
                 clean_account_name(name) in clean_account_name(Account_Name) 
                 or clean_account_name(Account_Name) in clean_account_name(name)
@@ -112,26 +131,34 @@ def match_by_address(duck: duckdb.DuckDBPyConnection, table_name: str):
         )
         QUALIFY row_number() OVER (
             PARTITION BY med_clean_df.rec_id
-            ORDER BY similarity DESC
+            ORDER BY score DESC
         ) = 1
-        order by similarity desc
-    """).df()
+        order by score desc
+    """
+    with span("address join"):
+        explain_analyze(duck, sql, "address_candidates")
+        address_match_df = duck.sql(sql).df()
+        add_rows(rows_in=len(med_keys) + len(zoho_keys), rows_out=len(address_match_df))
+    for view in ["med_clean_df", "zoho_df", "med_keys", "zoho_keys"]:
+        duck.unregister(view)
     
     if len(address_match_df) == 0:
         print("✓ No address matches found")
+    else:
+        print(f"✓ Found {len(address_match_df)} address matches")
+    return address_match_df
+
+
+def match_by_address(duck: duckdb.DuckDBPyConnection, table_name: str):
+    """Match remaining firms by address."""
+    address_match_df = address_candidates(duck, table_name)
+    if len(address_match_df) == 0:
         return
     
-    print(f"✓ Found {len(address_match_df)} address matches")
-    
     # Register address_match_df and update table
     duck.register("address_match_df", address_match_df)
     
-    duck.execute(f"""
-        update {table_name}
-        set id_zoho = address_match_df.Id
-        from address_match_df
-        where {table_name}.rec_id = address_match_df.rec_id
-        and {table_name}.id_zoho is null
-    """)
+    record_matches(duck, table_name, "address_match_df", "address_match", "score")
+    duck.unregister("address_match_df")
     
     print(f"✓ Updated {table_name} with address matches")
@@ -0,0 +1,173 @@
+"""Global one-to-one assignment of scored candidate edges."""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span, add_rows
+from utils.clustering import union_find_roots
+
+
+def candidate_edges(candidates: pd.DataFrame) -> pd.DataFrame:
+    """
+    Keep one edge per (rec_id, Id): the highest score, then the lowest priority.
+
+    Firms and accounts are numbered in sorted id order (columns firm and
+    account), so that ties are broken the same way whatever order the
+    matchers returned their candidates in.
+
+    Args:
+        candidates: Columns rec_id, Id, score, source, priority
+
+    Returns:
+        pd.DataFrame: Edges sorted by score (desc), priority, rec_id, Id
+    """
+    edges = candidates.dropna(subset=['rec_id', 'Id', 'score']).reset_index(drop=True)
+    firm = pd.factorize(edges['rec_id'], sort=True)[0]
+    account = pd.factorize(edges['Id'], sort=True)[0]
+    order = np.lexsort((
+        account,
+        firm,
+        edges['priority'].to_numpy(),
+        -edges['score'].to_numpy(dtype=float)
+    ))
+    edges = edges.iloc[order].assign(firm=firm[order], account=account[order])
+    # First occurrence of each pair in the sorted order is its best edge
+    pair = edges['firm'].to_numpy(dtype=np.int64) * (int(account.max()) + 1) + edges['account'].to_numpy()
+    first = np.sort(np.unique(pair, return_index=True)[1])
+    return edges.iloc[first].reset_index(drop=True)
+
+
+def edge_components(firm: np.ndarray, account: np.ndarray) -> np.ndarray:
+    """Return the connected component of each edge of the bipartite firm/account graph."""
+    n_firms = int(firm.max()) + 1
+    roots = union_find_roots(firm, account + n_firms, n_firms + int(account.max()) + 1)
+    return roots[firm]
+
+
+def greedy_assignment(firm: np.ndarray, account: np.ndarray) -> np.ndarray:
+    """
+    Accept edges in their order (best first) when both ends are still free.
+
+    Returns:
+        np.ndarray: Boolean mask of the accepted edges
+    """
+    accepted = np.zeros(len(firm), dtype=bool)
+    if not len(firm):
+        return accepted
+    used_firms = np.zeros(int(firm.max()) + 1, dtype=bool)
+    used_accounts = np.zeros(int(account.max()) + 1, dtype=bool)
+    for i, (f, a) in enumerate(zip(firm.tolist(), account.tolist())):
+        if used_firms[f] or used_accounts[a]:
+            continue
+        used_firms[f] = True
+        used_accounts[a] = True
+        accepted[i] = True
+    return accepted
+
+
+def optimal_assignment(firm: np.ndarray, account: np.ndarray, scores: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Accept the edges of a maximum total score matching, in one sparse solve.
+
+    Firms and accounts may stay unmatched, which a full bipartite matching
+    does not allow: every firm gets a private dummy account and every
+    account a private dummy firm, and each edge (f, a) gets a twin between
+    the dummy firm of a and the dummy account of f. All edges cost 2 minus
+    their score (dummies: 2), so that a minimum cost full matching is a
+    maximum score matching on the real edges.
+
+    Args:
+        firm: Firm number of each edge
+        account: Account number of each edge
+        scores: Score of each edge
+
+    Returns:
+        np.ndarray: Boolean mask of the accepted edges, or None without scipy
+    """
+    try:
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+    except ImportError:
+        return None
+    firms, firm_index = np.unique(firm, return_inverse=True)
+    accounts, account_index = np.unique(account, return_inverse=True)
+    n_firms, n_accounts = len(firms), len(accounts)
+    # Rows: firms, then dummy firms; columns: accounts, then dummy accounts
+    rows = np.concatenate([firm_index, np.arange(n_firms), n_firms + account_index, n_firms + np.arange(n_accounts)])
+    cols = np.concatenate([account_index, n_accounts + np.arange(n_firms), n_accounts + firm_index, np.arange(n_accounts)])
+    costs = np.concatenate([2.0 - scores, np.full(n_firms + len(scores) + n_accounts, 2.0)])
+    size = n_firms + n_accounts
+    graph = csr_matrix((costs, (rows, cols)), shape=(size, size))
+    matched_column = min_weight_full_bipartite_matching(graph)[1]
+    return matched_column[firm_index] == account_index
+
+
+def assign_one_to_one(candidates: pd.DataFrame, optimal_max_nodes: int = 50) -> pd.DataFrame:
+    """
+    Choose at most one account per firm and one firm per account.
+
+    The candidate edges of all matchers form a sparse bipartite graph that
+    is split into connected components. Components with a single edge are
+    accepted as they are; components of up to optimal_max_nodes firms and
+    accounts get the assignment with the highest total score (with scipy,
+    all in one sparse solve); the others are assigned greedily by score,
+    then matcher priority. Only the candidate edges are handled, never a
+    dense firms x accounts matrix.
+
+    Args:
+        candidates: Columns rec_id, Id, score, source, priority
+        optimal_max_nodes: Largest component solved optimally (0: greedy only)
+
+    Returns:
+        pd.DataFrame: The accepted edges, with the candidates' columns
+    """
+    edges = candidate_edges(candidates)
+    if edges.empty:
+        return edges
+
+    with span("assignment"):
+        firms = edges['firm'].to_numpy()
+        accounts = edges['account'].to_numpy()
+        component_codes = np.unique(edge_components(firms, accounts), return_inverse=True)[1]
+        edge_counts = np.bincount(component_codes)
+        accepted = edge_counts[component_codes] == 1
+
+        contested = np.flatnonzero(~accepted)
+        greedy_positions = [contested]
+        if len(contested) and optimal_max_nodes:
+            # Nodes per component: distinct firms plus distinct accounts
+            contested_components = component_codes[contested].astype(np.int64)
+            n_components = len(edge_counts)
+            firm_pairs = np.unique(firms[contested].astype(np.int64) * n_components + contested_components)
+            account_pairs = np.unique(accounts[contested].astype(np.int64) * n_components + contested_components)
+            nodes = (
+                np.bincount(firm_pairs % n_components, minlength=n_components)
+                + np.bincount(account_pairs % n_components, minlength=n_components)
+            )
+            small = nodes[contested_components] <= optimal_max_nodes
+            greedy_positions = [contested[~small]]
+
+            # All small components in one solve: they do not share nodes
+            positions = contested[small]
+            if len(positions):
+                scores = edges['score'].to_numpy(dtype=float)
+                mask = optimal_assignment(firms[positions], accounts[positions], scores[positions])
+                if mask is None:
+                    greedy_positions.append(positions)
+                else:
+                    accepted[positions] = mask
+
+        # Greedy on the remaining components at once: each is independent
+        greedy = np.sort(np.concatenate(greedy_positions))
+        accepted[greedy] = greedy_assignment(firms[greedy], accounts[greedy])
+
+        assigned = edges[accepted].drop(columns=['firm', 'account']).reset_index(drop=True)
+        add_rows(rows_in=len(edges), rows_out=len(assigned))
+
+    print(
+        f"  ✓ Assignment: {len(edges)} candidate edges in {len(edge_counts)} components, "
+        f"{len(assigned)} one-to-one matches"
+    )
+    return assigned
@@ -0,0 +1,135 @@
+"""Exact matching on normalized phone numbers and website / e-mail domains."""
+
+from typing import Dict, List
+
+import duckdb
+import pandas as pd
+
+from config import (
+    get_contact_phone_columns,
+    get_contact_domain_columns,
+    get_contact_country_code,
+    get_contact_ignored_domains
+)
+from instrumentation import span, add_rows, explain_analyze
+
+# Zoho account columns per key kind
+ZOHO_CONTACT_COLUMNS = {'phone': ['Phone'], 'domain': ['Website']}
+# Score of a match per key kind: a shared phone number is the stronger evidence
+KEY_SCORES = {'phone': 1.0, 'domain': 0.97}
+# Mail providers shared by unrelated firms: their domains identify nobody
+FREE_MAIL_DOMAINS = [
+    'aol.com', 'aol.de', 'arcor.de', 'email.de', 'ewe.net', 'freenet.de', 'gmail.com',
+    'gmx.at', 'gmx.ch', 'gmx.de', 'gmx.net', 'googlemail.com', 'hotmail.com', 'hotmail.de',
+    'icloud.com', 'kabelmail.de', 'live.com', 'live.de', 'mail.de', 'mailbox.org', 'me.com',
+    'online.de', 'outlook.com', 'outlook.de', 'posteo.de', 'proton.me', 'protonmail.com',
+    't-online.de', 'vodafone.de', 'web.de', 'yahoo.com', 'yahoo.de'
+]
+
+
+def _sql_list(values: List[str]) -> str:
+    return ', '.join("'" + v.replace("'", "''") + "'" for v in values)
+
+
+def contact_keys_sql(table: str, id_column: str, columns: Dict[str, List[str]]) -> str:
+    """
+    Select the distinct (id, key, score) contact keys of one source.
+
+    Keys are prefixed with their kind ('phone:+4930123456', 'domain:praxis.de'),
+    so that a phone number never equals a domain.
+    """
+    country_code = get_contact_country_code().replace("'", "")
+    ignored = _sql_list(FREE_MAIL_DOMAINS + get_contact_ignored_domains())
+    selects = []
+    for kind, kind_columns in columns.items():
+        for column in kind_columns:
+            if kind == 'phone':
+                key = f"""normalize_phone("{column}", '{country_code}')"""
+            else:
+                key = f'registrable_domain("{column}")'
+            selects.append(f"""
+                select {id_column} as id, '{kind}:' || {key} as key, {KEY_SCORES[kind]} as score
+                from {table}
+            """)
+    return f"""
+        select distinct id, key, score
+        from ({' union all '.join(selects)})
+        where key is not null
+            and key not in (select 'domain:' || unnest([{ignored}]))
+    """
+
+
+def contact_columns() -> Dict[str, List[str]]:
+    """Return the source columns read by the contact matcher, per source."""
+    return {
+        'medisoft': get_contact_phone_columns() + get_contact_domain_columns(),
+        'zoho': [c for kind_columns in ZOHO_CONTACT_COLUMNS.values() for c in kind_columns]
+    }
+
+
+def medisoft_contact_columns(duck: duckdb.DuckDBPyConnection) -> Dict[str, List[str]]:
+    """Return the configured phone and domain columns that exist in medisoft_firms."""
+    available = set(duck.sql("select * from medisoft_firms limit 0").columns)
+    configured = {'phone': get_contact_phone_columns(), 'domain': get_contact_domain_columns()}
+    columns = {}
+    for kind, kind_columns in configured.items():
+        missing = [c for c in kind_columns if c not in available]
+        if missing:
+            print(f"⚠ medisoft_firms has no column {', '.join(missing)} (CONTACT_{kind.upper()}_COLUMNS)")
+        columns[kind] = [c for c in kind_columns if c in available]
+    return columns
+
+
+def contact_candidates(duck: duckdb.DuckDBPyConnection, table_name: str) -> pd.DataFrame:
+    """
+    Match unmatched medisoft firms to zoho accounts sharing a phone number or domain.
+
+    Only keys held by a single zoho account are used, so that a switchboard
+    number or a group's website does not link a firm to an arbitrary account.
+    """
+    print("\n--- Matching firms by phone number and domain ---")
+
+    columns = medisoft_contact_columns(duck)
+    if not any(columns.values()):
+        print("✓ Found 0 contact matches")
+        return pd.DataFrame(columns=['rec_id', 'Id', 'score'])
+
+    unmatched_firms = f"""(
+        select m.*
+        from medisoft_firms as m
+            inner join {table_name} as t on m.rec_id = t.rec_id
+        where t.id_zoho is null
+    )"""
+
+    # Hash join on the keys; the strongest shared key wins, then the most keys
+    sql = f"""
+        with medisoft_keys as (
+            {contact_keys_sql(unmatched_firms, 'rec_id', columns)}
+        ), zoho_keys as (
+            {contact_keys_sql('zoho_accounts', 'Id', ZOHO_CONTACT_COLUMNS)}
+        ), unique_zoho_keys as (
+            select key, min(id) as Id
+            from zoho_keys
+            group by key
+            having count(*) = 1
+        )
+        select
+            m.id as rec_id,
+            z.Id,
+            max(m.score) as score
+        from medisoft_keys as m
+            inner join unique_zoho_keys as z
+            on m.key = z.key
+        group by m.id, z.Id
+        qualify row_number() over (
+            partition by m.id
+            order by max(m.score) desc, count(*) desc, z.Id
+        ) = 1
+    """
+    with span("contact join"):
+        explain_analyze(duck, sql, "contact_candidates")
+        candidates = duck.sql(sql).df()
+        add_rows(rows_out=len(candidates))
+
+    print(f"✓ Found {len(candidates)} contact matches")
+    return candidates
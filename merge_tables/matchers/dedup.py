@@ -0,0 +1,132 @@
+"""Duplicate clustering within Medisoft firms and Zoho accounts."""
+
+import duckdb
+import pandas as pd
+
+from config import get_dedup_min_score
+from db import ensure_all_firms_in_table
+from instrumentation import span, add_rows, explain_analyze
+from utils.clustering import cluster_ids
+
+# Per source: table, id column, name expression, blocking key and cluster table
+DEDUP_SOURCES = {
+    'medisoft': {
+        'table': 'medisoft_firms',
+        'id': 'rec_id',
+        'name': 'coalesce(name, kuerzel)',
+        'block': "regexp_replace(plz, '[^0-9]', '', 'g')",
+        'clusters': 'medisoft_clusters'
+    },
+    'zoho': {
+        'table': 'zoho_accounts',
+        'id': 'Id',
+        'name': 'Account_Name',
+        'block': "regexp_replace(Billing_Code, '[^0-9]', '', 'g')",
+        'clusters': 'zoho_clusters'
+    }
+}
+
+# Filters keeping the representative (smallest id) of each cluster
+REPRESENTATIVE_FILTERS = {
+    'medisoft_filter': "rec_id in (select cluster_id from medisoft_clusters)",
+    'zoho_filter': "Id in (select cluster_id from zoho_clusters)"
+}
+
+
+def duplicate_pairs(duck: duckdb.DuckDBPyConnection, source: dict, min_score: float) -> pd.DataFrame:
+    """
+    Find pairs of rows of one source with a similar cleaned name in the same postcode.
+
+    Returns:
+        pd.DataFrame: Columns left_id and right_id (left_id < right_id)
+    """
+    sql = f"""
+        with cleaned as (
+            select
+                {source['id']} as id,
+                clean_account_name({source['name']}) as clean_name,
+                {source['block']} as block
+            from {source['table']}
+        )
+        select a.id as left_id, b.id as right_id
+        from cleaned as a
+            inner join cleaned as b
+            on a.block = b.block and a.id < b.id
+        where a.block <> ''
+            and a.clean_name <> ''
+            and (a.clean_name = b.clean_name
+                or jaro_winkler_similarity(a.clean_name, b.clean_name) >= {min_score})
+    """
+    explain_analyze(duck, sql, f"duplicate_pairs_{source['table']}")
+    return duck.sql(sql).df()
+
+
+def cluster_source(duck: duckdb.DuckDBPyConnection, source: dict, min_score: float) -> int:
+    """
+    Write the cluster table of one source: (<id>, cluster_id) for every row.
+
+    Returns:
+        int: Number of rows that are duplicates of their cluster's representative
+    """
+    with span(f"dedup {source['table']}"):
+        pairs = duplicate_pairs(duck, source, min_score)
+        ids = duck.sql(f"select distinct {source['id']} as id from {source['table']}").df()['id']
+        clusters = cluster_ids(ids, pairs['left_id'], pairs['right_id'])
+        clusters = clusters.rename(columns={'id': source['id']})
+        duck.register("clusters_df", clusters)
+        duck.execute(f"""
+            create or replace table {source['clusters']} as
+            select
+                cast({source['id']} as varchar) as {source['id']},
+                cast(cluster_id as varchar) as cluster_id
+            from clusters_df
+        """)
+        duck.unregister("clusters_df")
+        duplicates = int((clusters[source['id']] != clusters['cluster_id']).sum())
+        add_rows(rows_in=len(pairs), rows_out=duplicates)
+    return duplicates
+
+
+def cluster_sources(duck: duckdb.DuckDBPyConnection):
+    """Cluster the duplicates within medisoft_firms and within zoho_accounts."""
+    print("\n--- Clustering duplicates within each source ---")
+    min_score = get_dedup_min_score()
+    for source in DEDUP_SOURCES.values():
+        duplicates = cluster_source(duck, source, min_score)
+        print(f"✓ {duplicates} duplicate rows in {source['table']} ({source['clusters']})")
+
+
+def propagate_cluster_matches(duck: duckdb.DuckDBPyConnection, table_name: str):
+    """
+    Give every duplicate the current match of its cluster's representative.
+
+    Only representatives are matched, so a duplicate's link is overwritten
+    (or cleared) whenever it differs from its representative's, e.g. after
+    the representative was invalidated or rematched by an incremental run.
+    """
+    # Firms outside the matched representatives may not have a row yet
+    ensure_all_firms_in_table(duck, table_name)
+    duck.execute(f"""
+        update {table_name}
+        set id_zoho = r.id_zoho,
+            match_source = r.match_source,
+            match_score = r.match_score,
+            matched_at = case when r.id_zoho is null then null else current_timestamp end,
+            medisoft_hash = mh.input_hash,
+            zoho_hash = r.zoho_hash
+        from medisoft_clusters as c
+            inner join {table_name} as r on r.rec_id = c.cluster_id
+            left join medisoft_input_hashes as mh on mh.rec_id = c.rec_id
+        where {table_name}.rec_id = c.rec_id
+        and c.rec_id <> c.cluster_id
+        and ({table_name}.id_zoho is distinct from r.id_zoho
+            or {table_name}.match_source is distinct from r.match_source
+            or {table_name}.zoho_hash is distinct from r.zoho_hash)
+    """)
+    propagated = duck.sql(f"""
+        select count(*)
+        from {table_name} as t
+            inner join medisoft_clusters as c on c.rec_id = t.rec_id
+        where c.rec_id <> c.cluster_id and t.id_zoho is not null
+    """).fetchone()[0]
+    print(f"✓ {propagated} duplicate firms matched through their cluster")
@@ -1,25 +1,18 @@
 """Name-based matching functions."""
 
 import duckdb
+import pandas as pd
+from db import record_matches, ensure_all_firms_in_table
+from instrumentation import explain_analyze
 
 
-def match_by_name(duck: duckdb.DuckDBPyConnection, table_name: str):
-    """Match firms by name using cleaned names and Jaro-Winkler similarity."""
+def name_candidates(duck: duckdb.DuckDBPyConnection, table_name: str) -> pd.DataFrame:
+    """Score the best zoho account per medisoft firm by cleaned name similarity."""
     print("\n--- Matching firms by name ---")
-    
-    # Ensure all firms have entries in the table first
-    duck.execute(f"""
-        insert into {table_name} (rec_id, id_zoho)
-        select rec_id, null
-        from medisoft_firms
-        where rec_id not in (select rec_id from {table_name})
-    """)
-    
-    # Create text_matched table
-    duck.execute("""
-        create or replace temp table text_matched as
+
+    sql = """
         with medisoft_cleaned as (
-            select 
+            select
                 rec_id,
                 clean_account_name(coalesce(name, kuerzel)) as clean_name
             from medisoft_firms
@@ -27,38 +20,43 @@ def match_by_name(duck: duckdb.DuckDBPyConnection, table_name: str):
             select
                 Id,
                 clean_account_name(Account_Name) as clean_name
-            from pg.zoho.Accounts
+            from zoho_accounts
         )
-        select 
-            m.clean_name as mc, 
-            z.clean_name as zc, 
-            jaro_winkler_similarity(m.clean_name, z.clean_name) as sim, 
-            rec_id, 
+        select
+            m.clean_name as mc,
+            z.clean_name as zc,
+            jaro_winkler_similarity(m.clean_name, z.clean_name) as score,
+            rec_id,
             Id
         from medisoft_cleaned as m
             inner join zoho_cleaned as z
-            on (m.clean_name = z.clean_name 
+            on (m.clean_name = z.clean_name
                 or jaro_winkler_similarity(m.clean_name, z.clean_name) > 0.95)
-        QUALIFY row_number() OVER (PARTITION BY m.rec_id ORDER BY sim DESC) = 1
-        order by sim
-    """)
-    
-    # Count matches
-    match_count = duck.sql("select count(*) from text_matched").fetchone()[0]
-    print(f"✓ Found {match_count} name matches")
-    
+        QUALIFY row_number() OVER (PARTITION BY m.rec_id ORDER BY score DESC) = 1
+        order by score
+    """
+    explain_analyze(duck, sql, "name_candidates")
+    text_matched = duck.sql(sql).df()
+
+    print(f"✓ Found {len(text_matched)} name matches")
+    return text_matched
+
+
+def match_by_name(duck: duckdb.DuckDBPyConnection, table_name: str):
+    """Match firms by name using cleaned names and Jaro-Winkler similarity."""
+    # Ensure all firms have entries in the table first
+    ensure_all_firms_in_table(duck, table_name)
+
+    text_matched = name_candidates(duck, table_name)
+
     # Update only unmatched firms
-    duck.execute(f"""
-        update {table_name}
-        set id_zoho = text_matched.Id
-        from text_matched
-        where {table_name}.rec_id = text_matched.rec_id
-        and {table_name}.id_zoho is null
-    """)
-    
+    duck.register("text_matched", text_matched)
+    record_matches(duck, table_name, "text_matched", "name_match", "score")
+    duck.unregister("text_matched")
+
     updated_count = duck.sql(f"""
-        select count(*) 
-        from {table_name} 
+        select count(*)
+        from {table_name}
         where id_zoho is not null
     """).fetchone()[0]
-    print(f"✓ Updated {match_count} name matches in {table_name} (total matched: {updated_count})")
+    print(f"✓ Updated {len(text_matched)} name matches in {table_name} (total matched: {updated_count})")
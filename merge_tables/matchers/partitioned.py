@@ -0,0 +1,175 @@
+"""Partitioned execution of matching functions with bounded memory."""
+
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import duckdb
+import pandas as pd
+
+from config import (
+    get_match_partition_by,
+    get_match_partition_prefix,
+    get_match_partition_workers,
+    get_match_partition_memory_limit
+)
+from db import create_clean_account_name_macro, projected_columns
+from instrumentation import add_rows
+from matchers import resolve_callable, required_columns
+
+# Blocking key expressions on medisoft_firms and zoho_accounts
+BLOCKING_KEYS = {
+    'plz': (
+        "left(regexp_replace(plz, '[^0-9]', '', 'g'), {prefix})",
+        "left(regexp_replace(Billing_Code, '[^0-9]', '', 'g'), {prefix})"
+    ),
+    'name': (
+        "left(clean_account_name(coalesce(name, kuerzel)), {prefix})",
+        "left(clean_account_name(Account_Name), {prefix})"
+    )
+}
+
+
+def blocking_key_sql(partition_by: str, prefix: int) -> Tuple[str, str]:
+    """Return the medisoft and zoho blocking key expressions."""
+    if partition_by not in BLOCKING_KEYS:
+        raise ValueError(
+            f"Unknown MATCH_PARTITION_BY '{partition_by}' (expected one of: {', '.join(BLOCKING_KEYS)})"
+        )
+    medisoft_key, zoho_key = BLOCKING_KEYS[partition_by]
+    return medisoft_key.format(prefix=prefix), zoho_key.format(prefix=prefix)
+
+
+def export_partitions(
+    duck: duckdb.DuckDBPyConnection,
+    table_name: str,
+    directory: str,
+    medisoft_key: str,
+    zoho_key: str,
+    columns: Optional[Dict[str, Optional[List[str]]]] = None
+) -> List[str]:
+    """
+    Write medisoft_firms (with their current id_zoho) and zoho_accounts as
+    Parquet files partitioned by blocking key.
+
+    Args:
+        columns: Columns to write per source besides the base columns
+                 (see db.projected_columns); None writes every column
+
+    Returns:
+        Sorted blocks that have unmatched firms and accounts on both sides
+    """
+    columns = columns or {}
+    medisoft_columns = ', '.join(
+        f'm."{c}"' for c in projected_columns(
+            'medisoft', duck.sql("select * from medisoft_firms").columns, columns.get('medisoft')
+        )
+    )
+    zoho_columns = ', '.join(
+        f'"{c}"' for c in projected_columns(
+            'zoho', duck.sql("select * from zoho_accounts").columns, columns.get('zoho')
+        )
+    )
+    duck.execute(f"""
+        copy (
+            select {medisoft_columns}, t.id_zoho as partition_id_zoho, {medisoft_key} as block
+            from medisoft_firms as m
+                inner join {table_name} as t on m.rec_id = t.rec_id
+            where block is not null and block <> ''
+        ) to '{directory}/medisoft' (format parquet, partition_by (block));
+
+        copy (
+            select {zoho_columns}, {zoho_key} as block
+            from zoho_accounts
+            where block is not null and block <> ''
+        ) to '{directory}/zoho' (format parquet, partition_by (block));
+    """)
+    return [row[0] for row in duck.sql(f"""
+        select distinct {medisoft_key} as block
+        from medisoft_firms as m
+            inner join {table_name} as t on m.rec_id = t.rec_id
+        where t.id_zoho is null
+        intersect
+        select distinct {zoho_key} as block
+        from zoho_accounts
+        order by block
+    """).fetchall() if row[0]]
+
+
+def _score_partition(candidates: Union[Callable, str], directory: str, block: str, memory_limit: str) -> pd.DataFrame:
+    """Run a candidate function on one partition in a fresh, memory-limited DuckDB."""
+    # Workers share the parse cache read-only, and parallelize over partitions only
+    os.environ['PARSE_CACHE_READ_ONLY'] = '1'
+    os.environ['ADDRESS_PARSE_WORKERS'] = '1'
+
+    duck = duckdb.connect()
+    try:
+        duck.execute(f"set memory_limit = '{memory_limit}'; set threads = 1")
+        medisoft_files = f"read_parquet('{directory}/medisoft/block={block}/*.parquet', hive_partitioning = false)"
+        zoho_files = f"read_parquet('{directory}/zoho/block={block}/*.parquet', hive_partitioning = false)"
+        with contextlib.redirect_stdout(io.StringIO()):
+            duck.execute(f"""
+                create table medisoft_firms as
+                select * exclude (partition_id_zoho) from {medisoft_files};
+
+                create table firm_matches as
+                select rec_id, partition_id_zoho as id_zoho from {medisoft_files};
+
+                create table zoho_accounts as
+                select * from {zoho_files};
+            """)
+            create_clean_account_name_macro(duck)
+            candidates_df = resolve_callable(candidates)(duck, 'firm_matches')
+    finally:
+        duck.close()
+    return candidates_df[['rec_id', 'Id', 'score']].reset_index(drop=True)
+
+
+def partitioned_candidates(
+    duck: duckdb.DuckDBPyConnection,
+    table_name: str,
+    match_func: dict
+) -> pd.DataFrame:
+    """
+    Compute the candidates of a matching function partition by partition.
+
+    Both sides are split by the blocking key (MATCH_PARTITION_BY, first
+    MATCH_PARTITION_PREFIX characters), and each partition is scored in a
+    worker process with its own DuckDB limited to MATCH_PARTITION_MEMORY_LIMIT.
+    Pairs across partitions are never compared. Results are concatenated in
+    block order, so the merge does not depend on which worker finished first.
+    """
+    medisoft_key, zoho_key = blocking_key_sql(get_match_partition_by(), get_match_partition_prefix())
+    directory = tempfile.mkdtemp(prefix=f"{match_func['name']}_partitions_")
+    try:
+        # Workers only get the columns this function reads
+        blocks = export_partitions(
+            duck, table_name, directory, medisoft_key, zoho_key, required_columns([match_func])
+        )
+        print(f"  {match_func['name']}: {len(blocks)} partitions by {get_match_partition_by()}")
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=max(1, get_match_partition_workers()), mp_context=context) as pool:
+            results = list(pool.map(
+                _score_partition,
+                repeat(match_func['candidates']),
+                repeat(directory),
+                blocks,
+                repeat(get_match_partition_memory_limit())
+            ))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    frames = [result for result in results if len(result)]
+    candidates_df = (
+        pd.concat(frames, ignore_index=True) if frames
+        else pd.DataFrame(columns=['rec_id', 'Id', 'score'])
+    )
+    add_rows(rows_in=len(blocks), rows_out=len(candidates_df))
+    return candidates_df
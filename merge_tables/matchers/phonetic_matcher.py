@@ -0,0 +1,69 @@
+"""Name matching on Kölner Phonetik keys."""
+
+import duckdb
+import pandas as pd
+
+from config import get_phonetic_min_score
+from instrumentation import span, add_rows, explain_analyze
+from utils.phonetics import phonetic_key_column
+
+
+def phonetic_candidates(duck: duckdb.DuckDBPyConnection, table_name: str) -> pd.DataFrame:
+    """Score zoho accounts whose name sounds like the name of each unmatched medisoft firm."""
+    print("\n--- Matching firms by phonetic name keys ---")
+
+    medisoft = duck.sql(f"""
+        select
+            m.rec_id,
+            account_name_tokens(coalesce(m.name, m.kuerzel)) as tokens,
+            clean_account_name(coalesce(m.name, m.kuerzel)) as mc
+        from medisoft_firms as m
+            inner join {table_name} as t on m.rec_id = t.rec_id
+        where t.id_zoho is null
+    """).df()
+    zoho = duck.sql("""
+        select
+            Id,
+            account_name_tokens(Account_Name) as tokens,
+            clean_account_name(Account_Name) as zc
+        from zoho_accounts
+    """).df()
+
+    with span("phonetic keys"):
+        medisoft['phonetic_key'] = phonetic_key_column(medisoft['tokens'])
+        zoho['phonetic_key'] = phonetic_key_column(zoho['tokens'])
+        medisoft = medisoft.dropna(subset=['phonetic_key'])
+        zoho = zoho.dropna(subset=['phonetic_key'])
+        add_rows(rows_in=len(medisoft) + len(zoho), rows_out=len(medisoft) + len(zoho))
+
+    # Empty frames would be registered with inferred (non-text) column types
+    if medisoft.empty or zoho.empty:
+        print("✓ Found 0 phonetic matches")
+        return pd.DataFrame(columns=['rec_id', 'Id', 'score'])
+
+    duck.register("medisoft_phonetic", medisoft[['rec_id', 'mc', 'phonetic_key']])
+    duck.register("zoho_phonetic", zoho[['Id', 'zc', 'phonetic_key']])
+
+    # Hash join on the phonetic key, verified by name similarity
+    sql = f"""
+        select
+            m.mc,
+            z.zc,
+            jaro_winkler_similarity(m.mc, z.zc) as score,
+            m.rec_id,
+            z.Id
+        from medisoft_phonetic as m
+            inner join zoho_phonetic as z
+            on m.phonetic_key = z.phonetic_key
+        where score >= {get_phonetic_min_score()}
+        qualify row_number() over (partition by m.rec_id order by score desc, z.Id) = 1
+    """
+    with span("phonetic join"):
+        explain_analyze(duck, sql, "phonetic_candidates")
+        candidates = duck.sql(sql).df()
+        add_rows(rows_in=len(medisoft), rows_out=len(candidates))
+    duck.unregister("medisoft_phonetic")
+    duck.unregister("zoho_phonetic")
+
+    print(f"✓ Found {len(candidates)} phonetic matches")
+    return candidates
@@ -0,0 +1,120 @@
+"""Name matching between firms in nearby postcodes."""
+
+import os
+from typing import Optional
+
+import duckdb
+import pandas as pd
+
+from config import get_plz_centroids_path, get_proximity_radius_km, get_proximity_min_score
+from instrumentation import span, add_rows, explain_analyze
+
+# Kilometres per degree of latitude; longitude degrees are scaled by cos(latitude)
+KM_PER_DEGREE = 111.2
+
+
+def load_plz_grid(duck: duckdb.DuckDBPyConnection, path: str, cell_km: float) -> Optional[pd.DataFrame]:
+    """
+    Load a postcode centroid file into a uniform grid.
+
+    The file is a CSV with the columns plz, lat, lon. Centroids are projected
+    to kilometres around the centre of Germany and assigned to square cells
+    of cell_km, so that all postcodes within cell_km of each other are in the
+    same or adjacent cells.
+
+    Returns:
+        DataFrame (plz, x_km, y_km, cell_x, cell_y), or None if the file does not exist
+    """
+    if not path or not os.path.exists(path):
+        return None
+    return duck.sql(f"""
+        with centroids as (
+            select
+                lpad(trim(cast(plz as varchar)), 5, '0') as plz,
+                cast(lat as double) * {KM_PER_DEGREE} as y_km,
+                cast(lon as double) * {KM_PER_DEGREE} * cos(radians(51.0)) as x_km
+            from read_csv('{path}', header = true)
+        )
+        select
+            plz,
+            x_km,
+            y_km,
+            cast(floor(x_km / {cell_km}) as integer) as cell_x,
+            cast(floor(y_km / {cell_km}) as integer) as cell_y
+        from centroids
+        qualify row_number() over (partition by plz) = 1
+    """).df()
+
+
+def proximity_candidates(
+    duck: duckdb.DuckDBPyConnection,
+    table_name: str,
+    centroids_path: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Score zoho accounts with a similar name within the proximity radius of each unmatched medisoft firm.
+
+    The postcode grid is registered on duck only (the matcher's own cursor),
+    so that the database is only read. centroids_path defaults to
+    PLZ_CENTROIDS_PATH.
+    """
+    print("\n--- Matching firms by name within nearby postcodes ---")
+    path = centroids_path or get_plz_centroids_path()
+    radius_km = get_proximity_radius_km()
+    min_score = get_proximity_min_score()
+
+    grid = load_plz_grid(duck, path, radius_km)
+    if grid is None:
+        print(f"⚠ Postcode centroid file '{path}' not found, skipping proximity matching")
+        return pd.DataFrame(columns=['rec_id', 'Id', 'score'])
+    duck.register("plz_grid", grid)
+
+    sql = f"""
+        with medisoft_located as (
+            select
+                m.rec_id,
+                clean_account_name(coalesce(m.name, m.kuerzel)) as mc,
+                g.x_km, g.y_km, g.cell_x, g.cell_y
+            from medisoft_firms as m
+                inner join {table_name} as t on m.rec_id = t.rec_id
+                inner join plz_grid as g on g.plz = left(trim(m.plz), 5)
+            where t.id_zoho is null
+        ), zoho_located as (
+            select
+                z.Id,
+                clean_account_name(z.Account_Name) as zc,
+                g.x_km, g.y_km, g.cell_x, g.cell_y
+            from zoho_accounts as z
+                inner join plz_grid as g on g.plz = left(trim(z.Billing_Code), 5)
+        ), medisoft_neighbourhood as (
+            -- Each firm looks up its own cell and the 8 adjacent ones
+            select m.*, m.cell_x + dx as probe_x, m.cell_y + dy as probe_y
+            from medisoft_located as m,
+                range(-1, 2) as rx(dx),
+                range(-1, 2) as ry(dy)
+        )
+        select
+            m.mc,
+            z.zc,
+            jaro_winkler_similarity(m.mc, z.zc) as score,
+            sqrt(pow(m.x_km - z.x_km, 2) + pow(m.y_km - z.y_km, 2)) as distance_km,
+            m.rec_id,
+            z.Id
+        from medisoft_neighbourhood as m
+            inner join zoho_located as z
+            on z.cell_x = m.probe_x and z.cell_y = m.probe_y
+        where distance_km <= {radius_km}
+            and m.mc <> ''
+            and score >= {min_score}
+        qualify row_number() over (partition by m.rec_id order by score desc, distance_km, z.Id) = 1
+    """
+    try:
+        with span("proximity join"):
+            explain_analyze(duck, sql, "proximity_candidates")
+            candidates = duck.sql(sql).df()
+            add_rows(rows_out=len(candidates))
+    finally:
+        duck.unregister("plz_grid")
+
+    print(f"✓ Found {len(candidates)} proximity matches within {radius_km} km")
+    return candidates
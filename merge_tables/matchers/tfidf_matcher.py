@@ -0,0 +1,193 @@
+"""Name matching with sparse TF-IDF character n-gram vectors."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import duckdb
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from config import (
+    get_tfidf_min_score,
+    get_tfidf_top_k,
+    get_tfidf_ngram_size,
+    get_tfidf_max_df,
+    get_tfidf_max_df_min_count,
+    get_tfidf_chunk_size,
+    get_tfidf_workers
+)
+from instrumentation import span, add_rows
+
+def char_ngrams(name: str, n: int) -> List[str]:
+    """
+    Return the character n-grams of each token of a name, padded with spaces.
+
+    N-grams are built per token so that reordered tokens still match.
+    """
+    grams = []
+    for token in name.split():
+        padded = f" {token} "
+        grams += [padded[i:i + n] for i in range(len(padded) - n + 1)] or [padded]
+    return grams
+
+
+def build_tfidf_vectors(
+    names_a: np.ndarray,
+    names_b: np.ndarray,
+    n: int,
+    max_df: float,
+    max_df_min_count: int = 0
+) -> Tuple[sp.csr_matrix, sp.csr_matrix]:
+    """
+    Vectorize two arrays of names over a shared n-gram vocabulary.
+
+    The inverse document frequency is taken from names_b (the side being
+    searched). N-grams occurring in more than a share max_df of names_b are
+    dropped, since they add little to the score and most of the work. They
+    are kept while they occur in at most max_df_min_count names, so that a
+    small names_b (e.g. a partition) does not lose the n-grams its names share.
+
+    Returns:
+        L2-normalized CSR matrices (len(names_a) x vocabulary) and
+        (len(names_b) x vocabulary)
+    """
+    grams_a = [char_ngrams(name, n) for name in names_a]
+    grams_b = [char_ngrams(name, n) for name in names_b]
+    flat = pd.Series([g for grams in grams_b for g in grams] + [g for grams in grams_a for g in grams])
+    codes, vocabulary = pd.factorize(flat)
+    n_b_grams = sum(len(grams) for grams in grams_b)
+
+    def to_matrix(gram_codes, grams_per_name, n_rows):
+        rows = np.repeat(np.arange(n_rows), [len(g) for g in grams_per_name])
+        matrix = sp.csr_matrix(
+            (np.ones(len(gram_codes), dtype=np.float32), (rows, gram_codes)),
+            shape=(n_rows, len(vocabulary))
+        )
+        matrix.sum_duplicates()
+        return matrix
+
+    matrix_b = to_matrix(codes[:n_b_grams], grams_b, len(names_b))
+    matrix_a = to_matrix(codes[n_b_grams:], grams_a, len(names_a))
+
+    # Smoothed IDF over names_b; grams unknown to names_b cannot contribute
+    df = np.bincount(matrix_b.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(names_b)) / (1 + df)).astype(np.float32) + 1
+    idf[df == 0] = 0
+    idf[df > max(1, max_df_min_count, max_df * len(names_b))] = 0
+    weights = sp.diags(idf)
+
+    def normalize(matrix):
+        matrix = (matrix @ weights).tocsr()
+        matrix.eliminate_zeros()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return (sp.diags(1 / norms) @ matrix).astype(np.float32).tocsr()
+
+    return normalize(matrix_a), normalize(matrix_b)
+
+
+def top_k_cosine(
+    matrix_a: sp.csr_matrix,
+    matrix_b: sp.csr_matrix,
+    top_k: int,
+    min_score: float,
+    chunk_size: int,
+    workers: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find the top_k rows of matrix_b with the highest cosine similarity to each row of matrix_a.
+
+    matrix_a is multiplied in row chunks on a thread pool (SciPy's sparse
+    product releases the GIL); each chunk keeps only scores >= min_score and
+    the top_k per row, so memory is bounded by the chunk size.
+
+    Returns:
+        (row indices into matrix_a, row indices into matrix_b, scores)
+    """
+    matrix_b_t = matrix_b.T.tocsr()
+
+    def chunk_top_k(start):
+        product = matrix_a[start:start + chunk_size] @ matrix_b_t
+        keep = product.data >= min_score
+        # Row of each kept score, without expanding the whole product
+        kept_before = np.concatenate([[0], np.cumsum(keep)])
+        kept_per_row = kept_before[product.indptr[1:]] - kept_before[product.indptr[:-1]]
+        rows = np.repeat(np.arange(product.shape[0]), kept_per_row)
+        cols, scores = product.indices[keep], product.data[keep]
+        # Rank within each row by descending score, ties by column
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+        keep = rank < top_k
+        return rows[keep] + start, cols[keep], scores[keep]
+
+    starts = range(0, matrix_a.shape[0], chunk_size)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        results = list(pool.map(chunk_top_k, starts))
+
+    if not results:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=np.float32)
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+
+def tfidf_candidates(duck: duckdb.DuckDBPyConnection, table_name: str) -> pd.DataFrame:
+    """Score the top-k zoho accounts per unmatched medisoft firm by TF-IDF cosine similarity of names."""
+    print("\n--- Matching firms by TF-IDF name similarity ---")
+    min_score = get_tfidf_min_score()
+    top_k = get_tfidf_top_k()
+
+    medisoft = duck.sql(f"""
+        select m.rec_id, account_name_tokens(coalesce(m.name, m.kuerzel)) as mc
+        from medisoft_firms as m
+            inner join {table_name} as t on m.rec_id = t.rec_id
+        where t.id_zoho is null
+    """).df()
+    zoho = duck.sql("""
+        select Id, account_name_tokens(Account_Name) as zc
+        from zoho_accounts
+    """).df()
+    medisoft = medisoft[medisoft['mc'].fillna('') != '']
+    zoho = zoho[zoho['zc'].fillna('') != '']
+
+    if len(medisoft) == 0 or len(zoho) == 0:
+        print("✓ Found 0 TF-IDF matches")
+        return pd.DataFrame(columns=['mc', 'zc', 'score', 'rec_id', 'Id'])
+
+    # Vectorize and compare each distinct name once
+    m_names = pd.Series(medisoft['mc'].unique())
+    z_names = pd.Series(zoho['zc'].unique())
+
+    with span("tfidf vectorize"):
+        matrix_m, matrix_z = build_tfidf_vectors(
+            m_names.to_numpy(), z_names.to_numpy(), get_tfidf_ngram_size(),
+            get_tfidf_max_df(), get_tfidf_max_df_min_count()
+        )
+        add_rows(rows_in=len(m_names) + len(z_names), rows_out=matrix_m.nnz + matrix_z.nnz)
+
+    with span("tfidf top-k"):
+        m_idx, z_idx, scores = top_k_cosine(
+            matrix_m, matrix_z, top_k, min_score, get_tfidf_chunk_size(), get_tfidf_workers()
+        )
+        add_rows(rows_in=len(m_names), rows_out=len(scores))
+
+    pairs = pd.DataFrame({
+        'mc': m_names.to_numpy()[m_idx],
+        'zc': z_names.to_numpy()[z_idx],
+        'score': scores.astype(float)
+    })
+    candidates = (
+        pairs
+        .merge(pd.DataFrame({'mc': medisoft['mc'].to_numpy(), 'rec_id': medisoft['rec_id'].to_numpy()}), on='mc')
+        .merge(pd.DataFrame({'zc': zoho['zc'].to_numpy(), 'Id': zoho['Id'].to_numpy()}), on='zc')
+    )
+    # Several accounts can share a name; keep the top k per firm
+    candidates = (
+        candidates.sort_values(['rec_id', 'score', 'Id'], ascending=[True, False, True])
+        .groupby('rec_id', sort=False).head(top_k)
+        .reset_index(drop=True)
+    )
+
+    print(f"✓ Found {len(candidates)} TF-IDF candidates for {candidates['rec_id'].nunique()} firms")
+    return candidates
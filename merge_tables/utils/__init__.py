@@ -1,8 +1,21 @@
 """Utility functions for address processing and other helpers."""
 
-from .address_utils import clean_german_road, split_and_clean_house_number
+from .address_utils import (
+    clean_german_road,
+    split_and_clean_house_number,
+    clean_german_road_column,
+    split_and_clean_house_number_column
+)
+from .phonetics import koelner_phonetik, phonetic_key_column
+from .clustering import union_find_roots, cluster_ids
 
 __all__ = [
     'clean_german_road',
-    'split_and_clean_house_number'
+    'split_and_clean_house_number',
+    'clean_german_road_column',
+    'split_and_clean_house_number_column',
+    'koelner_phonetik',
+    'phonetic_key_column',
+    'union_find_roots',
+    'cluster_ids'
 ]
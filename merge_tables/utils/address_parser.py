@@ -0,0 +1,92 @@
+"""Parallel libpostal address parsing."""
+
+import multiprocessing as mp
+from typing import Dict, List, Optional
+
+import numpy as np
+from postal.parser import parse_address
+
+# Components extracted from the libpostal output
+ADDRESS_COMPONENTS = ('road', 'house_number', 'postcode')
+
+
+def _parse_batch(addresses: List[str]) -> Dict[str, List[Optional[str]]]:
+    """Parse a batch of addresses into one list per address component."""
+    columns = {component: [] for component in ADDRESS_COMPONENTS}
+    for address in addresses:
+        parsed = {label: value for value, label in parse_address(address)}
+        for component in ADDRESS_COMPONENTS:
+            columns[component].append(parsed.get(component))
+    return columns
+
+
+def _warm_up():
+    """Load the libpostal model in this process (for in-process parsing)."""
+    parse_address("Hauptstraße 1, 10115, Deutschland")
+
+
+def _worker_context():
+    """
+    Return the multiprocessing context of the parsing workers.
+
+    Matchers run on threads, and forking a threaded process can copy locks
+    held by other threads. Workers are forked from a forkserver instead, a
+    single-threaded process started once, which has imported this module and
+    thus loaded the libpostal model: workers still share it copy-on-write.
+    """
+    context = mp.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def parse_addresses(
+    addresses: List[str],
+    workers: int = 1,
+    batch_size: int = 2000
+) -> Dict[str, np.ndarray]:
+    """
+    Parse addresses with libpostal, spread over forked worker processes.
+
+    The libpostal model is loaded once in the forkserver (see
+    _worker_context); workers are forked from it and share it copy-on-write.
+    Safe to call from any thread. Duplicate addresses are parsed only once.
+
+    Args:
+        addresses: Raw address strings
+        workers: Number of worker processes (1 parses in-process)
+        batch_size: Number of distinct addresses sent to a worker at once
+
+    Returns:
+        dict: One object array per component in ADDRESS_COMPONENTS,
+              aligned with the input addresses
+    """
+    if len(addresses) == 0:
+        return {c: np.empty(0, dtype=object) for c in ADDRESS_COMPONENTS}
+
+    unique_addresses, inverse = np.unique(
+        np.asarray(addresses, dtype=object), return_inverse=True
+    )
+    unique_list = unique_addresses.tolist()
+    batches = [
+        unique_list[i:i + batch_size]
+        for i in range(0, len(unique_list), batch_size)
+    ]
+
+    workers = min(workers, len(batches))
+    if workers > 1 and 'forkserver' in mp.get_all_start_methods():
+        print(f"  Parsing {len(unique_list)} distinct addresses with {workers} workers")
+        with _worker_context().Pool(workers) as pool:
+            results = pool.map(_parse_batch, batches)
+    else:
+        _warm_up()
+        results = [_parse_batch(batch) for batch in batches]
+
+    parsed = {}
+    for component in ADDRESS_COMPONENTS:
+        values = np.empty(len(unique_list), dtype=object)
+        offset = 0
+        for result in results:
+            values[offset:offset + len(result[component])] = result[component]
+            offset += len(result[component])
+        parsed[component] = values[inverse]
+    return parsed
@@ -1,9 +1,13 @@
 """Address processing utilities."""
 
 import re
+import numpy as np
 import pandas as pd
 from unidecode import unidecode
 
+# Road type suffixes removed by clean_german_road
+ROAD_SUFFIX_PATTERN = r'(str\.|str$|str\s|straße|strasse)'
+
 
 def clean_german_road(text):
     """Clean German road names for matching."""
@@ -11,7 +15,7 @@ def clean_german_road(text):
         return None
     text = text.lower().strip()
     text = text.replace('ß', 'ss')
-    text = re.sub(r'(str\.|str$|str\s|straße|strasse)', '', text)
+    text = re.sub(ROAD_SUFFIX_PATTERN, '', text)
     text = unidecode(text)
     text = re.sub(r'[^a-z0-9]', '', text)
     return text
@@ -39,3 +43,62 @@ def split_and_clean_house_number(val):
         num_2 = keep_only_digits(parts[1])
         
     return pd.Series([num_1, num_2])
+
+
+def _distinct_text(values: pd.Series):
+    """Factorize a column into its distinct non-empty strings and row codes."""
+    values = values.astype(object)
+    values = values.where(values.notna() & (values != ''), None)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return codes, pd.Series(uniques, dtype=object).astype(str)
+
+
+def _expand_distinct(codes, distinct: pd.Series, index: pd.Index) -> pd.Series:
+    """Map per-distinct-value results back onto the rows (missing rows: None)."""
+    result = np.empty(len(codes), dtype=object)
+    present = codes >= 0
+    result[present] = distinct.to_numpy(dtype=object)[codes[present]]
+    return pd.Series(result, index=index, dtype=object)
+
+
+def clean_german_road_column(roads: pd.Series) -> pd.Series:
+    """
+    Vectorized clean_german_road over a whole column.
+
+    Each distinct value is cleaned once with pandas string methods;
+    unidecode is only applied to the values that are not plain ASCII.
+    """
+    codes, text = _distinct_text(roads)
+
+    text = text.str.lower().str.strip()
+    text = text.str.replace('ß', 'ss', regex=False)
+    text = text.str.replace(ROAD_SUFFIX_PATTERN, '', regex=True)
+
+    non_ascii = text.str.contains(r'[^\x00-\x7f]', regex=True)
+    if non_ascii.any():
+        text[non_ascii] = text[non_ascii].map(unidecode)
+    text = text.str.replace(r'[^a-z0-9]', '', regex=True)
+
+    return _expand_distinct(codes, text, roads.index)
+
+
+def split_and_clean_house_number_column(values: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized split_and_clean_house_number over a whole column.
+
+    Returns:
+        DataFrame with columns house_num_1 and house_num_2
+    """
+    codes, text = _distinct_text(values)
+
+    parts = {
+        'house_num_1': text.str.extract(r'^([^-/]*)', expand=False),
+        'house_num_2': text.str.extract(r'^[^-/]*[-/]([^-/]*)', expand=False)
+    }
+
+    house_numbers = {}
+    for column, part in parts.items():
+        digits = part.str.replace(r'\D', '', regex=True)
+        digits = digits.where(digits.notna() & (digits != ''), None)
+        house_numbers[column] = _expand_distinct(codes, digits, values.index)
+    return pd.DataFrame(house_numbers)
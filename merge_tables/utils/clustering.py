@@ -0,0 +1,72 @@
+"""Connected components of duplicate pairs with vectorized union-find."""
+
+import numpy as np
+import pandas as pd
+
+
+def union_find_roots(left: np.ndarray, right: np.ndarray, size: int) -> np.ndarray:
+    """
+    Return the root of every node after joining each left/right pair.
+
+    Vectorized union-find: every round links the root of each pair with the
+    larger number to the smaller root (hooking), then compresses all paths
+    by pointer jumping. Each round is a few linear passes over the pairs,
+    and the number of rounds grows with the logarithm of the cluster sizes,
+    so millions of pairs take seconds.
+
+    Args:
+        left: Node numbers (0 <= n < size) of the first member of each pair
+        right: Node numbers of the second member of each pair
+        size: Number of nodes
+
+    Returns:
+        np.ndarray: Root node of each node (the smallest node of its cluster)
+    """
+    roots = np.arange(size, dtype=np.int64)
+    left = np.asarray(left, dtype=np.int64)
+    right = np.asarray(right, dtype=np.int64)
+    while len(left):
+        root_left, root_right = roots[left], roots[right]
+        linked = root_left != root_right
+        left, right = left[linked], right[linked]
+        if not len(left):
+            break
+        low = np.minimum(root_left[linked], root_right[linked])
+        high = np.maximum(root_left[linked], root_right[linked])
+        # Hooking: each root keeps the smallest root it is paired with
+        np.minimum.at(roots, high, low)
+        # Pointer jumping until every node points to its root
+        while True:
+            jumped = roots[roots]
+            if np.array_equal(jumped, roots):
+                break
+            roots = jumped
+    return roots
+
+
+def cluster_ids(ids: pd.Series, left: pd.Series, right: pd.Series) -> pd.DataFrame:
+    """
+    Cluster ids connected by duplicate pairs.
+
+    Every id gets the smallest id of its cluster as cluster_id, so ids
+    without duplicates are their own cluster and the cluster ids do not
+    depend on the order of the pairs.
+
+    Args:
+        ids: All ids of the source
+        left: First id of each duplicate pair
+        right: Second id of each duplicate pair
+
+    Returns:
+        pd.DataFrame: Columns id and cluster_id, one row per distinct id
+    """
+    # Sorted codes: the root of a cluster, its smallest node, is its smallest id
+    codes, uniques = pd.factorize(pd.concat([ids, left, right], ignore_index=True), sort=True)
+    n_ids = len(ids)
+    roots = union_find_roots(
+        codes[n_ids:n_ids + len(left)],
+        codes[n_ids + len(left):],
+        len(uniques)
+    )
+    node_ids = np.asarray(uniques, dtype=object)
+    return pd.DataFrame({'id': node_ids, 'cluster_id': node_ids[roots]})
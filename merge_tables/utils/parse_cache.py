@@ -0,0 +1,171 @@
+"""Persistent cross-run cache of libpostal parse results."""
+
+import os
+from typing import Callable, Dict, List, Optional
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from config import (
+    get_parse_cache_path,
+    get_parse_cache_max_age_days,
+    get_parse_cache_max_rows,
+    get_libpostal_version,
+    get_parse_workers,
+    get_parse_cache_read_only
+)
+
+ADDRESS_COMPONENTS = ('road', 'house_number', 'postcode')
+
+
+def normalize_address(address: str) -> str:
+    """Normalize a raw address string into its cache key."""
+    return ' '.join(address.lower().split())
+
+
+def open_parse_cache(path: str, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+    """Open (and create if needed) the DuckDB file holding the parse cache."""
+    if read_only:
+        # Several processes can share a cache opened read-only
+        return duckdb.connect(path, read_only=True)
+    cache = duckdb.connect(path)
+    cache.execute("""
+        create table if not exists parsed_addresses (
+            address_key varchar,
+            libpostal_version varchar,
+            road varchar,
+            house_number varchar,
+            postcode varchar,
+            created_at timestamp default current_timestamp,
+            last_used_at timestamp default current_timestamp,
+            primary key (address_key, libpostal_version)
+        )
+    """)
+    return cache
+
+
+def evict_parse_cache(
+    cache: duckdb.DuckDBPyConnection,
+    max_age_days: int,
+    max_rows: int
+):
+    """Drop entries unused for max_age_days, then the least recently used beyond max_rows."""
+    if max_age_days > 0:
+        cache.execute(f"""
+            delete from parsed_addresses
+            where last_used_at < current_timestamp - interval {int(max_age_days)} day
+        """)
+    if max_rows > 0:
+        cache.execute(f"""
+            delete from parsed_addresses
+            where (address_key, libpostal_version) in (
+                select (address_key, libpostal_version)
+                from parsed_addresses
+                order by last_used_at desc, address_key
+                offset {int(max_rows)}
+            )
+        """)
+
+
+def parse_addresses_cached(
+    addresses: List[str],
+    cache_path: Optional[str] = None,
+    parse_func: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Parse addresses, sending only those missing from the cache to libpostal.
+
+    Lookups and inserts are done in bulk against the cache table, keyed by
+    the normalized address and the libpostal version. With
+    PARSE_CACHE_READ_ONLY=1 (set in the workers of the partitioned mode),
+    the cache is only read: misses are parsed but not stored.
+
+    Args:
+        addresses: Raw address strings
+        cache_path: DuckDB cache file (default: PARSE_CACHE_PATH, empty disables the cache)
+        parse_func: Parser for cache misses (default: the parsing daemon if
+                    it is running, else parallel libpostal parsing)
+
+    Returns:
+        dict: One object array per component in ADDRESS_COMPONENTS,
+              aligned with the input addresses
+    """
+    if parse_func is None:
+        def parse_func(misses):
+            # A running parsing daemon saves loading the libpostal model
+            from utils.parse_daemon import parse_addresses_remote
+            parsed = parse_addresses_remote(misses)
+            if parsed is not None:
+                return parsed
+            # Imported here so that a fully cached run never loads libpostal
+            from utils.address_parser import parse_addresses
+            return parse_addresses(misses, workers=get_parse_workers())
+
+    if cache_path is None:
+        cache_path = get_parse_cache_path()
+
+    keys = pd.Series([normalize_address(a) for a in addresses], dtype=object)
+    if not cache_path or len(keys) == 0:
+        return parse_func(keys.tolist())
+
+    read_only = get_parse_cache_read_only()
+    if read_only and not os.path.exists(cache_path):
+        return parse_func(keys.tolist())
+
+    version = get_libpostal_version()
+    cache = open_parse_cache(cache_path, read_only=read_only)
+    try:
+        wanted_df = pd.DataFrame({'address_key': keys.drop_duplicates()})
+        cache.register("wanted_df", wanted_df)
+
+        # Bulk lookup
+        hits_df = cache.execute("""
+            select p.address_key, p.road, p.house_number, p.postcode
+            from wanted_df w
+            join parsed_addresses p
+            on p.address_key = w.address_key
+            and p.libpostal_version = ?
+        """, [version]).df()
+        if not read_only:
+            cache.execute("""
+                update parsed_addresses
+                set last_used_at = current_timestamp
+                from wanted_df
+                where parsed_addresses.address_key = wanted_df.address_key
+                and parsed_addresses.libpostal_version = ?
+            """, [version])
+
+        misses = wanted_df.loc[
+            ~wanted_df['address_key'].isin(hits_df['address_key']), 'address_key'
+        ].tolist()
+        print(f"  Parse cache: {len(hits_df)} hits, {len(misses)} misses")
+
+        if misses and read_only:
+            new_df = pd.DataFrame({'address_key': misses, **parse_func(misses)})
+            hits_df = pd.concat([hits_df, new_df], ignore_index=True)
+        elif misses:
+            # Bulk insert of freshly parsed addresses
+            new_df = pd.DataFrame({'address_key': misses, **parse_func(misses)})
+            cache.register("new_df", new_df)
+            cache.execute("""
+                insert into parsed_addresses
+                    (address_key, libpostal_version, road, house_number, postcode)
+                select address_key, ?, road, house_number, postcode
+                from new_df
+            """, [version])
+            hits_df = pd.concat([hits_df, new_df], ignore_index=True)
+
+        if not read_only:
+            evict_parse_cache(
+                cache, get_parse_cache_max_age_days(), get_parse_cache_max_rows()
+            )
+    finally:
+        cache.close()
+
+    lookup = hits_df.set_index('address_key')
+    positions = lookup.index.get_indexer(keys)
+    return {
+        component: lookup[component].to_numpy(dtype=object)[positions]
+        for component in ADDRESS_COMPONENTS
+    }
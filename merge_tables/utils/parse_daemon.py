@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Long-lived libpostal parsing service on a Unix socket.
+
+The daemon loads the libpostal model once and keeps it resident, with a
+pool of forked workers sharing it. Clients send batches of addresses and get
+back the parsed components, so they never load the model themselves.
+
+Wire format: every message is a frame of a 4-byte big-endian length followed
+by UTF-8 text. A request frame holds the addresses separated by RS (0x1e);
+the response frame holds one record per address, separated by RS, with its
+road, house_number and postcode separated by US (0x1f); an empty field
+means the component is missing. A connection can carry any number of
+requests.
+
+Usage (from merge_tables/):
+    python -m utils.parse_daemon --socket /tmp/merge_tables_libpostal.sock --workers 8
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import signal
+import socket
+import socketserver
+import struct
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import get_parse_daemon_socket, get_parse_workers
+
+ADDRESS_COMPONENTS = ('road', 'house_number', 'postcode')
+RECORD_SEPARATOR = '\x1e'
+FIELD_SEPARATOR = '\x1f'
+HEADER = struct.Struct('>I')
+
+
+def _clean(text: str) -> str:
+    """Remove separator characters from a value."""
+    return text.replace(RECORD_SEPARATOR, ' ').replace(FIELD_SEPARATOR, ' ')
+
+
+def write_frame(stream, text: str):
+    payload = text.encode('utf-8')
+    stream.write(HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def read_frame(stream) -> Optional[str]:
+    """Read one frame; None at the end of the stream."""
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    (length,) = HEADER.unpack(header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise ConnectionError("Truncated frame from parsing daemon")
+    return payload.decode('utf-8')
+
+
+def encode_addresses(addresses: List[str]) -> str:
+    return RECORD_SEPARATOR.join(_clean(a) for a in addresses)
+
+
+def decode_addresses(text: str) -> List[str]:
+    return text.split(RECORD_SEPARATOR)
+
+
+def encode_parsed(columns: Dict[str, List[Optional[str]]]) -> str:
+    records = zip(*(columns[c] for c in ADDRESS_COMPONENTS))
+    return RECORD_SEPARATOR.join(
+        FIELD_SEPARATOR.join(_clean(value) if value else '' for value in record)
+        for record in records
+    )
+
+
+def decode_parsed(text: str, count: int) -> Dict[str, List[Optional[str]]]:
+    columns = {component: [] for component in ADDRESS_COMPONENTS}
+    records = text.split(RECORD_SEPARATOR) if count else []
+    if len(records) != count:
+        raise ConnectionError(f"Parsing daemon returned {len(records)} records for {count} addresses")
+    for record in records:
+        for component, value in zip(ADDRESS_COMPONENTS, record.split(FIELD_SEPARATOR)):
+            columns[component].append(value or None)
+    return columns
+
+
+def parse_addresses_remote(
+    addresses: List[str],
+    socket_path: Optional[str] = None,
+    batch_size: int = 5000
+) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Parse addresses with the parsing daemon.
+
+    Distinct addresses are sent in batches over one connection.
+
+    Returns:
+        dict: One object array per component in ADDRESS_COMPONENTS, aligned
+              with the input addresses, or None if no daemon is listening or
+              the connection failed during a request (the caller then parses
+              in-process)
+    """
+    if socket_path is None:
+        socket_path = get_parse_daemon_socket()
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        client.close()
+        return None
+
+    unique_addresses, inverse = np.unique(
+        np.asarray(addresses, dtype=object), return_inverse=True
+    )
+    unique_list = unique_addresses.tolist()
+    parsed = {component: [] for component in ADDRESS_COMPONENTS}
+    try:
+        with client, client.makefile('rwb') as stream:
+            for i in range(0, len(unique_list), batch_size):
+                batch = unique_list[i:i + batch_size]
+                write_frame(stream, encode_addresses(batch))
+                response = read_frame(stream)
+                if response is None:
+                    raise ConnectionError("Parsing daemon closed the connection")
+                for component, values in decode_parsed(response, len(batch)).items():
+                    parsed[component].extend(values)
+    except (OSError, EOFError) as e:
+        # e.g. the daemon was stopped or crashed while parsing
+        print(f"  ⚠ Parsing daemon failed ({e}), parsing in-process")
+        return None
+
+    print(f"  Parsed {len(unique_list)} distinct addresses with the parsing daemon")
+    result = {}
+    for component in ADDRESS_COMPONENTS:
+        values = np.empty(len(unique_list), dtype=object)
+        values[:] = parsed[component]
+        result[component] = values[inverse]
+    return result
+
+
+class ParseServer(socketserver.ThreadingUnixStreamServer):
+    """Serves parse requests with a resident libpostal model and worker pool."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, workers: int, batch_size: int = 2000):
+        # Imported here so that clients never load libpostal
+        from utils.address_parser import _parse_batch, _warm_up
+        self.parse_batch = _parse_batch
+        self.batch_size = batch_size
+        _warm_up()
+        self.pool = mp.get_context('fork').Pool(workers) if workers > 1 else None
+        # In-process parsing is serialized across connections
+        self.lock = threading.Lock()
+        super().__init__(socket_path, ParseHandler)
+
+    def parse(self, addresses: List[str]) -> Dict[str, List[Optional[str]]]:
+        batches = [
+            addresses[i:i + self.batch_size]
+            for i in range(0, len(addresses), self.batch_size)
+        ]
+        if self.pool is not None and len(batches) > 1:
+            results = self.pool.map(self.parse_batch, batches)
+        else:
+            with self.lock:
+                results = [self.parse_batch(batch) for batch in batches]
+        return {
+            component: [value for result in results for value in result[component]]
+            for component in ADDRESS_COMPONENTS
+        }
+
+    def server_close(self):
+        super().server_close()
+        if self.pool is not None:
+            self.pool.terminate()
+
+
+class ParseHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            request = read_frame(self.rfile)
+            if request is None:
+                return
+            write_frame(self.wfile, encode_parsed(self.server.parse(decode_addresses(request))))
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(socket_path: str, workers: int):
+    """Run the parsing daemon until SIGTERM or Ctrl-C."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = ParseServer(socket_path, workers)
+    signal.signal(signal.SIGTERM, _stop)
+    print(f"✓ Parsing daemon listening on {socket_path} with {workers} worker(s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        print("✓ Parsing daemon stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--socket', default=get_parse_daemon_socket(),
+                        help='Unix socket path (default: PARSE_DAEMON_SOCKET)')
+    parser.add_argument('--workers', type=int, default=get_parse_workers(),
+                        help='parsing worker processes (default: ADDRESS_PARSE_WORKERS)')
+    args = parser.parse_args()
+    serve(args.socket, args.workers)
+
+
+if __name__ == "__main__":
+    main()
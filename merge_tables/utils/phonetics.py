@@ -0,0 +1,77 @@
+"""Kölner Phonetik (Cologne phonetics) codes for German names."""
+
+import pandas as pd
+
+VOWELS = set('AEIJOUYÄÖÜ')
+# Letters after which C is pronounced K, at the start of a word and elsewhere
+C_HARD_INITIAL = set('AHKLOQRUX')
+C_HARD = set('AHKOQUX')
+CODES = {
+    **{c: '3' for c in 'FVW'},
+    **{c: '4' for c in 'GKQ'},
+    'B': '1', 'L': '5', 'M': '6', 'N': '6', 'R': '7',
+    'S': '8', 'Z': '8', 'ß': '8'
+}
+
+
+def koelner_phonetik(word: str) -> str:
+    """
+    Return the Kölner Phonetik code of a word ('Meier', 'Mayer', 'Maier' -> '67').
+
+    Characters other than letters are ignored; a word without letters yields ''.
+    """
+    letters = [c for c in word.upper() if c.isalpha()]
+    codes = []
+    for i, c in enumerate(letters):
+        prev = letters[i - 1] if i > 0 else ''
+        nxt = letters[i + 1] if i + 1 < len(letters) else ''
+        if c in VOWELS:
+            code = '0'
+        elif c == 'H':
+            code = ''
+        elif c == 'P':
+            code = '3' if nxt == 'H' else '1'
+        elif c in 'DT':
+            code = '8' if nxt in {'C', 'S', 'Z'} else '2'
+        elif c == 'C':
+            if i == 0:
+                code = '4' if nxt in C_HARD_INITIAL else '8'
+            else:
+                code = '4' if nxt in C_HARD and prev not in {'S', 'Z'} else '8'
+        elif c == 'X':
+            code = '8' if prev in {'C', 'K', 'Q'} else '48'
+        else:
+            code = CODES.get(c, '')
+        codes.append(code)
+
+    # Collapse repeated codes, then drop vowels except at the start
+    collapsed = []
+    for code in ''.join(codes):
+        if not collapsed or collapsed[-1] != code:
+            collapsed.append(code)
+    return ''.join(
+        code for i, code in enumerate(collapsed) if code != '0' or i == 0
+    )
+
+
+def phonetic_key_column(names: pd.Series) -> pd.Series:
+    """
+    Vectorized phonetic key of a column of cleaned names.
+
+    The key is the sorted Kölner Phonetik codes of the name's tokens, so it
+    does not depend on token order; numeric tokens are kept as they are.
+    Each distinct token is encoded once. Names without any code get None.
+    """
+    tokens = names.astype(object).where(names.notna(), '').str.split().explode().dropna()
+    tokens = tokens[tokens != '']
+    distinct = pd.Series(tokens.unique())
+    codes = pd.Series(
+        [t if t.isdigit() else koelner_phonetik(t) for t in distinct],
+        index=distinct.to_numpy(),
+        dtype=object
+    )
+    token_codes = tokens.map(codes)
+    token_codes = token_codes[token_codes != '']
+    keys = token_codes.groupby(level=0).agg(lambda c: ' '.join(sorted(c)))
+    keys = keys.astype(object).reindex(names.index)
+    return keys.where(keys.notna(), None)
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+End-to-end sync pipeline: Zoho export and import, Medisoft load, indexes, firm matching, push to Zoho.
+
+The scripts of the repository are modelled as stages of a dependency graph.
+Each stage is fingerprinted from its input files, its own code and, per
+dependency, the content of the files that dependency writes (its outputs)
+or, for stages writing to the database, the dependency's fingerprint; a
+stage whose fingerprint matches its last successful run is skipped. So a
+new Zoho export whose CSVs are identical stops after the unzip. Independent
+branches (Zoho and Medisoft ingestion) run in parallel. After a failure, the
+next run resumes at the failed stage, since everything before it is up to
+date.
+
+Full loads write into zoho_new and medisoft_new; the promote stage then
+moves their tables into zoho and medisoft, which the later stages read.
+
+State is kept in PIPELINE_STATE (default: .pipeline_state.json).
+
+Usage (from the repository root):
+    python pipeline.py                         # run what changed
+    python pipeline.py --dry-run               # show which stages would run
+    python pipeline.py --skip zoho_export      # work from the last export
+    python pipeline.py --force match_firms     # rerun a stage and what depends on it
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from instrumentation import span, report
+
+load_dotenv()
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_PATH = os.getenv('PIPELINE_STATE', os.path.join(REPO_ROOT, '.pipeline_state.json'))
+ZOHO_DATA = 'zoho/data'
+# Schemas written by full loads, promoted into the live schemas read downstream
+LOAD_SCHEMAS = {'zoho_new': 'zoho', 'medisoft_new': 'medisoft'}
+# Delta imports merge into the live schema directly (see zoho/import_zoho_tables.py)
+ZOHO_IMPORT_SCHEMA = 'zoho' if os.getenv('ZOHO_SYNC_MODE', 'full') == 'delta' else 'zoho_new'
+# Tables written by match_firms, indexed once it has run
+MATCH_TABLES = ['medisoft.table_firms_zoho', 'medisoft.table_zoho_input_hashes']
+
+
+def unzip_exports():
+    """Extract the Zoho export archives into zoho/data, as <MODULE>.csv."""
+    archives = sorted(glob.glob(os.path.join(REPO_ROOT, '*_exportZoho.zip')))
+    for archive in archives:
+        module = os.path.basename(archive)[:-len('_exportZoho.zip')]
+        with zipfile.ZipFile(archive) as zf:
+            members = [name for name in zf.namelist() if name.endswith('.csv')]
+            if len(members) != 1:
+                raise ValueError(f"Expected one CSV in {archive}, found {len(members)}")
+            with zf.open(members[0]) as src, open(os.path.join(REPO_ROOT, ZOHO_DATA, f'{module}.csv'), 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+        print(f"✓ Extracted {os.path.basename(archive)}")
+
+
+def promote_loaded_tables():
+    """
+    Move the tables of the freshly loaded schemas into the live ones.
+
+    Each table of zoho_new / medisoft_new replaces the table of the same name
+    in zoho / medisoft, in one transaction, with its keys and indexes. The
+    replaced tables are kept in <schema>_previous until the next promotion.
+    Tables only present in the live schema (e.g. the matching results in
+    medisoft) are left as they are. Once the Zoho tables are live, the
+    delta sync of their modules starts from their export.
+    """
+    import psycopg2
+    import connection_alchemy
+    from zoho.sync_state import SYNC_STATE_PATH, mark_loaded
+
+    promoted = {}
+    conn = psycopg2.connect(**connection_alchemy.DB_CONFIG)
+    try:
+        with conn, conn.cursor() as cur:
+            for loaded, live in LOAD_SCHEMAS.items():
+                cur.execute("select tablename from pg_tables where schemaname = %s order by tablename", [loaded])
+                tables = [row[0] for row in cur.fetchall()]
+                if not tables:
+                    print(f"✓ {loaded}: nothing to promote")
+                    continue
+                previous = f"{live}_previous"
+                cur.execute(f"create schema if not exists {live}; create schema if not exists {previous}")
+                for table in tables:
+                    quoted = '"' + table.replace('"', '""') + '"'
+                    cur.execute(f"drop table if exists {previous}.{quoted}")
+                    cur.execute(f"alter table if exists {live}.{quoted} set schema {previous}")
+                    cur.execute(f"alter table {loaded}.{quoted} set schema {live}")
+                promoted[live] = tables
+                print(f"✓ Promoted {len(tables)} tables from {loaded} to {live} (replaced ones in {previous})")
+    finally:
+        conn.close()
+    if promoted.get('zoho'):
+        mark_loaded(promoted['zoho'], path=os.path.join(REPO_ROOT, SYNC_STATE_PATH))
+
+
+# Stages, in registration order. Paths are relative to the repository root.
+#   command/func: subprocess command (run in cwd) or in-process function
+#   inputs: globs of the files the stage reads (data and code)
+#   outputs: globs of the files the stage writes; dependent stages are
+#            fingerprinted on their content instead of on this stage's fingerprint
+#   depends_on: stages that must have run first
+#   volatile: always run (the input is remote)
+#   optional: skip instead of failing when no input file exists
+STAGES: List[Dict[str, Any]] = [
+    {
+        'name': 'zoho_export',
+        'command': [sys.executable, '-m', 'zoho.zohoCRM'],
+        'cwd': '.',
+        'inputs': ['zoho/zohoCRM.py'],
+        'outputs': ['*_exportZoho.zip'],
+        'depends_on': [],
+        'volatile': True
+    },
+    {
+        'name': 'zoho_unzip',
+        'func': unzip_exports,
+        'inputs': ['*_exportZoho.zip'],
+        'outputs': [f'{ZOHO_DATA}/*.csv'],
+        'depends_on': ['zoho_export']
+    },
+    {
+        'name': 'zoho_import',
+        'command': [sys.executable, '-m', 'zoho.import_zoho_tables'],
+        'cwd': '.',
+        'inputs': [f'{ZOHO_DATA}/*.csv', 'zoho/import_zoho_tables.py', 'connection_alchemy.py'],
+        'depends_on': ['zoho_unzip']
+    },
+    {
+        'name': 'post_load',
+        # Indexes the tables where the loaders wrote them, before they are promoted
+        # (the matching tables are not in medisoft_new and are skipped)
+        'command': [
+            sys.executable, 'post_load.py',
+            '--schema', f'zoho={ZOHO_IMPORT_SCHEMA}',
+            '--schema', 'medisoft=medisoft_new'
+        ],
+        'cwd': '.',
+        'inputs': ['post_load.py'],
+        'depends_on': ['zoho_import', 'medisoft_load']
+    },
+    {
+        'name': 'promote',
+        'func': promote_loaded_tables,
+        'inputs': [],
+        'depends_on': ['post_load']
+    },
+    {
+        'name': 'zoho_deals',
+        # The CSVs extracted by zoho_unzip, relative to cwd
+        'command': [sys.executable, 'import_deals.py', 'data/Deals.csv'],
+        'cwd': 'zoho',
+        'inputs': [f'{ZOHO_DATA}/Deals.csv', 'zoho/import_deals.py'],
+        'depends_on': ['promote'],
+        'optional': True
+    },
+    {
+        'name': 'zoho_tasks',
+        'command': [sys.executable, 'update_tasks.py', 'data/Tasks.csv'],
+        'cwd': 'zoho',
+        'inputs': [f'{ZOHO_DATA}/Tasks.csv', 'zoho/update_tasks.py'],
+        'depends_on': ['promote'],
+        'optional': True
+    },
+    {
+        'name': 'medisoft_load',
+        'command': [sys.executable, '-m', 'medisoft.xml_to_db_inefficient'],
+        'cwd': '.',
+        'inputs': ['medisoft/Archiv/*.xml', 'medisoft/xml_to_db_inefficient.py', 'connection_alchemy.py'],
+        'depends_on': []
+    },
+    {
+        'name': 'match_firms',
+        'command': [sys.executable, 'match_firms.py'],
+        'cwd': 'merge_tables',
+        'inputs': ['merge_tables/**/*.py'],
+        'depends_on': ['promote']
+    },
+    {
+        'name': 'post_match',
+        'command': [sys.executable, 'post_load.py', '--tables', ','.join(MATCH_TABLES)],
+        'cwd': '.',
+        'inputs': ['post_load.py'],
+        'depends_on': ['match_firms']
+    },
+    {
+        'name': 'zoho_push',
+        'command': [sys.executable, 'push_links.py'],
+        'cwd': 'zoho',
+        'inputs': ['zoho/push_links.py', 'zoho/zohoCRM.py'],
+        'depends_on': ['post_match']
+    }
+]
+
+
+def load_state() -> Dict[str, Any]:
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    return {'stages': {}, 'files': {}}
+
+
+def save_state(state: Dict[str, Any]):
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def file_digest(path: str, file_cache: Dict[str, list]) -> str:
+    """
+    Return the SHA-256 of a file's content.
+
+    Digests are cached by (size, mtime), so unchanged files are not read again.
+    """
+    stat = os.stat(path)
+    cached = file_cache.get(path)
+    if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    file_cache[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+    return digest.hexdigest()
+
+
+def input_files(stage: Dict[str, Any], key: str = 'inputs') -> List[str]:
+    files = set()
+    for pattern in stage.get(key, []):
+        files.update(
+            os.path.relpath(path, REPO_ROOT)
+            for path in glob.glob(os.path.join(REPO_ROOT, pattern), recursive=True)
+            if os.path.isfile(path)
+        )
+    return sorted(files)
+
+
+def output_digest(stage: Dict[str, Any], file_cache: Dict[str, list]) -> str:
+    """Digest of the content of the files a stage writes (its outputs)."""
+    digest = hashlib.sha256()
+    for path in input_files(stage, 'outputs'):
+        digest.update(f"{path}\0{file_digest(os.path.join(REPO_ROOT, path), file_cache)}\0".encode())
+    return digest.hexdigest()
+
+
+def fingerprint(stage: Dict[str, Any], files: List[str], upstream: Dict[str, str], file_cache: Dict[str, list]) -> str:
+    """
+    Fingerprint of a stage: its command, its input files and what its dependencies produced.
+
+    upstream holds, per dependency, the digest of its outputs (stages writing
+    files) or its fingerprint (stages writing to the database).
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(stage.get('command') or stage['func'].__name__).encode())
+    for path in files:
+        digest.update(f"{path}\0{file_digest(os.path.join(REPO_ROOT, path), file_cache)}\0".encode())
+    for dep in stage['depends_on']:
+        digest.update(f"{dep}\0{upstream.get(dep, '')}\0".encode())
+    return digest.hexdigest()
+
+
+def run_stage(stage: Dict[str, Any]):
+    """Run one stage; raises on failure."""
+    with span(stage['name']):
+        if 'func' in stage:
+            stage['func']()
+            return
+        result = subprocess.run(stage['command'], cwd=os.path.join(REPO_ROOT, stage['cwd']))
+        if result.returncode != 0:
+            raise RuntimeError(f"exited with code {result.returncode}")
+
+
+def downstream_of(names: Set[str]) -> Set[str]:
+    """Return the given stages and every stage depending on them."""
+    result = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for stage in STAGES:
+            if stage['name'] not in result and result.intersection(stage['depends_on']):
+                result.add(stage['name'])
+                changed = True
+    return result
+
+
+def run_pipeline(
+    skip: Set[str] = frozenset(),
+    force: Set[str] = frozenset(),
+    dry_run: bool = False,
+    workers: int = 2
+) -> bool:
+    """
+    Run the stages that are out of date, independent ones in parallel.
+
+    Args:
+        skip: Stages not to run (their last fingerprint is used downstream)
+        force: Stages to run even if up to date, with everything downstream
+        dry_run: Only print the plan
+        workers: Maximum number of stages running at once
+
+    Returns:
+        True if every stage succeeded or was up to date
+    """
+    unknown = (set(skip) | set(force)) - {s['name'] for s in STAGES}
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    state = load_state()
+    forced = downstream_of(set(force))
+    fingerprints: Dict[str, str] = {}
+    # What each finished stage produced, as seen by the stages depending on it
+    produced: Dict[str, str] = {}
+    done: Set[str] = set()
+    failed: Set[str] = set()
+    pending = list(STAGES)
+
+    def plan(stage) -> Optional[str]:
+        """Return the stage's fingerprint if it must run, None if it is skipped."""
+        name = stage['name']
+        last = state['stages'].get(name, {})
+        if name in skip:
+            fingerprints[name] = last.get('fingerprint', '')
+            produced[name] = produced_by(stage)
+            print(f"- {name}: skipped (--skip)")
+            return None
+        files = input_files(stage)
+        if stage.get('optional') and not any(not f.endswith('.py') for f in files):
+            fingerprints[name] = ''
+            produced[name] = ''
+            print(f"- {name}: skipped (no input files)")
+            return None
+        fp = fingerprint(stage, files, produced, state['files'])
+        fingerprints[name] = fp
+        up_to_date = last.get('status') == 'done' and last.get('fingerprint') == fp
+        if up_to_date and not stage.get('volatile') and name not in forced:
+            produced[name] = produced_by(stage)
+            print(f"✓ {name}: up to date")
+            return None
+        # A dry run cannot know the outputs yet: assume they change
+        produced[name] = fp
+        return fp
+
+    def produced_by(stage) -> str:
+        if stage.get('outputs'):
+            return output_digest(stage, state['files'])
+        return fingerprints[stage['name']]
+
+    print(f"\n--- Pipeline ({len(STAGES)} stages) ---")
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        running = {}
+        while pending or running:
+            # Start every stage whose dependencies are done
+            for stage in list(pending):
+                deps = stage['depends_on']
+                if any(d in failed for d in deps):
+                    pending.remove(stage)
+                    failed.add(stage['name'])
+                    print(f"✗ {stage['name']}: not run (a dependency failed)")
+                elif all(d in done for d in deps):
+                    pending.remove(stage)
+                    fp = plan(stage)
+                    if fp is None or dry_run:
+                        if fp is not None:
+                            print(f"→ {stage['name']}: would run")
+                        done.add(stage['name'])
+                        continue
+                    print(f"→ {stage['name']}: running")
+                    running[pool.submit(run_stage, stage)] = (stage, fp)
+            if not running:
+                if pending and not any(all(d in done for d in s['depends_on']) for s in pending):
+                    raise ValueError(f"Unresolvable dependencies: {', '.join(s['name'] for s in pending)}")
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fp = running.pop(future)
+                entry = {'fingerprint': fp, 'finished_at': datetime.now().isoformat()}
+                try:
+                    future.result()
+                    entry['status'] = 'done'
+                    produced[stage['name']] = produced_by(stage)
+                    done.add(stage['name'])
+                    print(f"✓ {stage['name']}: done")
+                except Exception as e:
+                    entry['status'] = 'failed'
+                    entry['error'] = str(e)
+                    failed.add(stage['name'])
+                    print(f"✗ {stage['name']}: {e}")
+                state['stages'][stage['name']] = entry
+                save_state(state)
+
+    if failed:
+        print(f"\n✗ Pipeline failed at: {', '.join(sorted(failed))}; rerun to resume")
+    else:
+        print("\n✓ Pipeline complete")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--skip', default='', help='comma-separated stages not to run')
+    parser.add_argument('--force', default='', help='comma-separated stages to rerun with everything downstream')
+    parser.add_argument('--dry-run', action='store_true', help='only show which stages would run')
+    parser.add_argument('--workers', type=int, default=2, help='stages running at once (default: 2)')
+    args = parser.parse_args()
+
+    def names(value):
+        return {n.strip() for n in value.split(',') if n.strip()}
+
+    try:
+        ok = run_pipeline(names(args.skip), names(args.force), args.dry_run, args.workers)
+    finally:
+        report("pipeline")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Post-load index and statistics builder for the ingested tables.
+
+The loaders create their tables without keys or indexes, so that rows are
+inserted as fast as possible. This stage then builds the primary keys and
+secondary indexes declared in TABLE_SPECS in bulk, one table per database
+session and several tables at once, and refreshes the planner statistics
+with ANALYZE. Updates and joins on Id, What_Id and rec_id then use indexes
+instead of sequential scans.
+
+Every step is idempotent: existing keys and indexes are kept, missing
+tables are skipped.
+
+Usage (from the repository root):
+    python post_load.py                              # all tables in TABLE_SPECS
+    python post_load.py --schema zoho=zoho_new       # index a freshly loaded schema
+    python post_load.py --tables zoho.Tasks,zoho.Accounts
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+import connection_alchemy
+from instrumentation import span, report
+
+# Keys and indexes per schema and table. Column names are case sensitive.
+#   primary_key: columns of the primary key
+#   indexes: column lists of the secondary indexes
+TABLE_SPECS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    'zoho': {
+        'Accounts': {'primary_key': ['Id'], 'indexes': [['Billing_Code']]},
+        'Tasks': {'primary_key': ['Id'], 'indexes': [['What_Id'], ['Who_id']]},
+        'Deals': {'primary_key': ['Id'], 'indexes': []}
+    },
+    'medisoft': {
+        'table_firmenstruktur': {'primary_key': ['rec_id'], 'indexes': [['plz']]},
+        'table_firms_zoho': {'primary_key': ['rec_id'], 'indexes': [['id_zoho']]},
+        'table_zoho_input_hashes': {'primary_key': ['Id'], 'indexes': []}
+    }
+}
+
+WORKERS = int(os.getenv('POST_LOAD_WORKERS', '4'))
+MAINTENANCE_WORK_MEM = os.getenv('POST_LOAD_MAINTENANCE_WORK_MEM', '512MB')
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _index_name(table: str, columns: List[str], suffix: str) -> str:
+    # PostgreSQL truncates identifiers to 63 bytes
+    return f"{table}_{'_'.join(columns)}_{suffix}"[:63]
+
+
+def build_table(schema: str, table: str, spec: Dict[str, Any]) -> str:
+    """
+    Build the primary key and indexes of one table, then ANALYZE it.
+
+    Args:
+        schema: Schema of the table
+        table: Table name
+        spec: Entry of TABLE_SPECS
+
+    Returns:
+        str: Summary of what was built
+    """
+    target = f"{_quote(schema)}.{_quote(table)}"
+    conn = psycopg2.connect(**connection_alchemy.DB_CONFIG)
+    conn.autocommit = True
+    built = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("select to_regclass(%s)", [target])
+            if cur.fetchone()[0] is None:
+                return "table not found, skipped"
+            cur.execute(f"set maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'")
+
+            primary_key = spec.get('primary_key')
+            if primary_key:
+                cur.execute(
+                    "select 1 from pg_constraint where conrelid = %s::regclass and contype = 'p'",
+                    [target]
+                )
+                if cur.fetchone() is None:
+                    # A unique index on the key columns (e.g. created by a publish) is
+                    # promoted instead of building a second one
+                    cur.execute("""
+                        select i.indexrelid::regclass::text
+                        from pg_index as i
+                        where i.indrelid = %s::regclass and i.indisunique and i.indpred is null
+                            and array(
+                                select a.attname::text
+                                from unnest(i.indkey::int2[]) with ordinality as k(attnum, position)
+                                    inner join pg_attribute as a
+                                    on a.attrelid = i.indrelid and a.attnum = k.attnum
+                                order by k.position
+                            ) = %s::text[]
+                        limit 1
+                    """, [target, primary_key])
+                    unique_index = cur.fetchone()
+                    if unique_index:
+                        cur.execute(f"alter table {target} add primary key using index {unique_index[0]}")
+                    else:
+                        columns = ', '.join(_quote(c) for c in primary_key)
+                        cur.execute(
+                            f"alter table {target} add constraint "
+                            f"{_quote(_index_name(table, primary_key, 'pkey'))} primary key ({columns})"
+                        )
+                    built.append(f"primary key ({', '.join(primary_key)})")
+
+            for index_columns in spec.get('indexes', []):
+                name = _index_name(table, index_columns, 'idx')
+                cur.execute("select to_regclass(%s)", [f"{_quote(schema)}.{_quote(name)}"])
+                if cur.fetchone()[0] is None:
+                    columns = ', '.join(_quote(c) for c in index_columns)
+                    cur.execute(f"create index {_quote(name)} on {target} ({columns})")
+                    built.append(f"index ({', '.join(index_columns)})")
+
+            cur.execute(f"analyze {target}")
+    finally:
+        conn.close()
+    return (', '.join(built) if built else 'indexes up to date') + ', analyzed'
+
+
+def build_all(
+    specs: Dict[str, Dict[str, Dict[str, Any]]] = TABLE_SPECS,
+    schema_map: Optional[Dict[str, str]] = None,
+    tables: Optional[List[str]] = None,
+    workers: int = WORKERS
+) -> bool:
+    """
+    Build the keys and indexes of every table in specs, several tables at once.
+
+    Args:
+        specs: Table specification, by schema and table
+        schema_map: Schema to build in instead of a spec's schema (e.g. {'zoho': 'zoho_new'})
+        tables: Only these tables ('schema.table', spec schema names)
+        workers: Number of tables built at once
+
+    Returns:
+        bool: True if every table was built or skipped without error
+    """
+    schema_map = schema_map or {}
+    jobs: List[Tuple[str, str, Dict[str, Any]]] = [
+        (schema_map.get(schema, schema), table, spec)
+        for schema, schema_tables in specs.items()
+        for table, spec in schema_tables.items()
+        if not tables or f"{schema}.{table}" in tables
+    ]
+    print(f"\n--- Building indexes on {len(jobs)} tables ---")
+
+    def run(job):
+        schema, table, spec = job
+        with span(f"index {schema}.{table}"):
+            return build_table(schema, table, spec)
+
+    ok = True
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(job, pool.submit(run, job)) for job in jobs]
+        for (schema, table, _), future in futures:
+            try:
+                print(f"✓ {schema}.{table}: {future.result()}")
+            except psycopg2.Error as e:
+                # e.g. duplicate or null keys in the loaded data
+                ok = False
+                print(f"✗ {schema}.{table}: {str(e).strip()}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--schema', action='append', default=[],
+                        help='build in another schema, as spec=actual (e.g. zoho=zoho_new)')
+    parser.add_argument('--tables', default='', help='comma-separated schema.table to build (default: all)')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='tables built at once (default: POST_LOAD_WORKERS)')
+    args = parser.parse_args()
+
+    schema_map = dict(mapping.split('=', 1) for mapping in args.schema)
+    tables = [t.strip() for t in args.tables.split(',') if t.strip()]
+    try:
+        ok = build_all(TABLE_SPECS, schema_map, tables, args.workers)
+    finally:
+        report("post_load")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the Zoho export modes against the local mock API.
+
+Starts zoho/mock_server.py in-process, points zohoCRM.py at it and runs
+each export mode on the same synthetic records:
+
+- full: bulk read of every record
+- delta-rest: a delta small enough for paged REST calls
+- delta-bulk: a delta large enough for a filtered bulk read
+
+Each run is timed from the first API call to the extracted CSV, whose rows
+are counted against the records the mock holds for that mode, so that an
+incomplete export is flagged.
+Reports runtime, API calls (and how many were answered 401 or 429), bytes
+downloaded and throughput.
+
+Usage (from the repository root):
+    python -m zoho.bench_export --records 100000 --queue-delay 5
+    python -m zoho.bench_export --records 500000 --rate-limit 10 --token-ttl 20 --output results.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from zoho.mock_server import add_arguments, mock_from_args, start_server
+
+MODES = ['full', 'delta-rest', 'delta-bulk']
+
+
+def since_for(mock, count):
+    """Return a timestamp after which about count records of the mock were modified."""
+    if count >= mock.records:
+        return None
+    times = sorted((mock.modified_time(i) for i in range(mock.records)), reverse=True)
+    return times[count].isoformat()
+
+
+def extract_rows(filename, csv_path):
+    """
+    Extract the CSV of an export file, as the pipeline does, and read its rows.
+
+    Returns:
+        tuple: (rows, distinct ids)
+    """
+    with zipfile.ZipFile(filename) as zf:
+        member = [name for name in zf.namelist() if name.endswith('.csv')][0]
+        with zf.open(member) as src, open(csv_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+    ids = set()
+    rows = 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        id_column = next(reader).index('Id')
+        for row in reader:
+            rows += 1
+            ids.add(row[id_column])
+    return rows, len(ids)
+
+
+def run_mode(zohoCRM, mock, mode, modules, since):
+    """Run one export mode for every module and return its measurements."""
+    mock.reset_stats()
+    # Every mode starts without a token, as a new process would
+    zohoCRM.ACCESS_TOKEN = None
+    expected = len(mock.modified_since(since))
+
+    start = time.perf_counter()
+    exported = all(zohoCRM.export_module(module, since) for module in modules)
+    export_seconds = time.perf_counter() - start
+
+    rows = distinct = 0
+    if exported:
+        for module in modules:
+            module_rows, module_distinct = extract_rows(f"{module}_exportZoho.zip", f"{module}.csv")
+            rows += module_rows
+            distinct += module_distinct
+    seconds = time.perf_counter() - start
+
+    stats = mock.stats()
+    return {
+        'mode': mode,
+        'since': since,
+        'seconds': round(seconds, 2),
+        'export_seconds': round(export_seconds, 2),
+        'records': rows,
+        'expected': expected * len(modules),
+        'complete': exported and rows == distinct == expected * len(modules),
+        'api_calls': stats['api_calls'],
+        'calls': stats['calls'],
+        'status_401': stats['statuses'].get('401', 0),
+        'status_429': stats['statuses'].get('429', 0),
+        'mb': round(stats['bytes_sent'] / 1e6, 2),
+        'records_per_second': round(rows / max(seconds, 1e-9)),
+        'mb_per_second': round(stats['bytes_sent'] / 1e6 / max(seconds, 1e-9), 2)
+    }
+
+
+def format_row(result):
+    flag = '' if result['complete'] else f"  INCOMPLETE ({result['records']} of {result['expected']})"
+    return (
+        f"{result['mode']:<11} {result['seconds']:>8.1f}s {result['records']:>9} "
+        f"{result['api_calls']:>6} {result['status_401']:>5} {result['status_429']:>5} "
+        f"{result['mb']:>9.1f} {result['records_per_second']:>10} {result['mb_per_second']:>7.1f}{flag}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES), help=f"comma-separated modes ({', '.join(MODES)})")
+    parser.add_argument('--modules', default='Accounts', help='comma-separated modules exported in each mode')
+    parser.add_argument('--delta-rest', type=int, default=1000,
+                        help='records modified in the delta-rest mode')
+    parser.add_argument('--delta-bulk', type=int, default=0,
+                        help='records modified in the delta-bulk mode (default: a fifth of the records)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='seconds between two bulk job status calls')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    mock = mock_from_args(args)
+    server, url = start_server(mock)
+    os.environ.update({
+        'ZOHO_API_DOMAIN': url,
+        'ZOHO_ACCOUNTS_DOMAIN': url,
+        'ZOHO_CONTENT_DOMAIN': url,
+        'ZOHO_POLL_INTERVAL': str(args.poll_interval)
+    })
+    # zohoCRM reads its configuration on import
+    from zoho import zohoCRM
+
+    modules = [m.strip() for m in args.modules.split(',') if m.strip()]
+    deltas = {
+        'full': None,
+        'delta-rest': since_for(mock, args.delta_rest),
+        'delta-bulk': since_for(mock, args.delta_bulk or max(mock.records // 5, zohoCRM.REST_MAX_RECORDS + 1))
+    }
+
+    workdir = tempfile.mkdtemp(prefix='zoho_bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = []
+    try:
+        print(f"\n{args.records} records per module, queue delay {args.queue_delay}s, "
+              f"rate limit {args.rate_limit or 'none'}, token TTL {args.token_ttl}s")
+        for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+            results.append(run_mode(zohoCRM, mock, mode, modules, deltas[mode]))
+        print(f"\n{'mode':<11} {'runtime':>9} {'records':>9} {'calls':>6} {'401':>5} {'429':>5} "
+              f"{'MB':>9} {'records/s':>10} {'MB/s':>7}")
+        for result in results:
+            print(format_row(result))
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+        shutil.rmtree(mock.directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
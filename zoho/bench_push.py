@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+End-to-end check and benchmark of push_links.py against the local mock API.
+
+Starts zoho/mock_server.py in-process, points zohoCRM.py at it and pushes
+synthetic firm/account links from a local DuckDB standing in for
+PostgreSQL, in phases:
+
+- initial: every linked account is sent
+- retry: only the rows the mock skipped (--write-error-rate) are sent again
+- unchanged: nothing is sent
+- relinked: after moving some firms to another account and unlinking all
+  firms of some accounts, only the changed accounts are sent (unlinked
+  ones with an empty value)
+- retry, unchanged: as above
+
+After each phase, the accounts sent are checked against the links that
+differ from what Zoho holds, and medisoft.table_zoho_pushed_links (written
+by record_pushed) against the values the mock's write jobs applied.
+Reports runtime, accounts sent, updated and skipped, and API calls.
+
+Usage (from the repository root):
+    python -m zoho.bench_push --records 50000 --queue-delay 2
+    python -m zoho.bench_push --records 200000 --batch-size 25000 --write-error-rate 0.02 --output results.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+
+import duckdb
+
+from zoho.mock_server import FIRST_ID, add_arguments, mock_from_args, start_server
+
+PHASES = ['initial', 'retry', 'unchanged', 'relinked', 'retry', 'unchanged']
+
+
+def create_links(duck, firms, accounts):
+    """Create medisoft.table_firms_zoho with every tenth firm unmatched."""
+    duck.execute(f"""
+        ATTACH ':memory:' AS postgres_db;
+        CREATE SCHEMA postgres_db.medisoft;
+        CREATE TABLE postgres_db.medisoft.table_firms_zoho AS
+        SELECT
+            cast(100000 + f AS VARCHAR) AS rec_id,
+            CASE WHEN f % 10 = 0 THEN NULL
+                 ELSE cast({FIRST_ID} + (f * 7919) % {accounts} AS VARCHAR) END AS id_zoho
+        FROM range({firms}) AS r(f);
+    """)
+
+
+def relink(duck, accounts):
+    """Move every twentieth firm to the next account and unlink all firms of every fiftieth account."""
+    duck.execute(f"""
+        UPDATE postgres_db.medisoft.table_firms_zoho
+        SET id_zoho = cast({FIRST_ID} + (cast(id_zoho AS BIGINT) - {FIRST_ID} + 1) % {accounts} AS VARCHAR)
+        WHERE id_zoho IS NOT NULL AND cast(rec_id AS BIGINT) % 20 = 1;
+
+        UPDATE postgres_db.medisoft.table_firms_zoho
+        SET id_zoho = NULL
+        WHERE (cast(id_zoho AS BIGINT) - {FIRST_ID}) % 50 = 7;
+    """)
+
+
+def expected_changes(duck, zoho_values):
+    """Accounts whose links differ from the values Zoho holds, computed independently of push_links."""
+    current = {}
+    for rec_id, id_zoho in duck.sql(
+        "SELECT rec_id, id_zoho FROM postgres_db.medisoft.table_firms_zoho WHERE id_zoho IS NOT NULL"
+    ).fetchall():
+        current.setdefault(id_zoho, []).append(rec_id)
+    current = {account: ','.join(sorted(rec_ids)) for account, rec_ids in current.items()}
+    changed = {account for account, value in current.items() if zoho_values.get(account) != value}
+    changed |= {account for account, value in zoho_values.items() if account not in current and value != ''}
+    return changed
+
+
+def run_phase(push_links, mock, duck, phase, field):
+    """Run one push and check it; return its measurements."""
+    zoho_values = {account: values.get(field) for account, values in mock.written.get('Accounts', {}).items()}
+    expected = expected_changes(duck, zoho_values)
+    mock.reset_stats()
+    jobs_before = len(mock.write_jobs)
+
+    start = time.perf_counter()
+    changed, pushed = push_links.push_links(duck)
+    seconds = time.perf_counter() - start
+
+    jobs = list(mock.write_jobs.values())[jobs_before:]
+    sent = sum(len(job['rows']) for job in jobs)
+    pushed_links = dict(duck.sql(f"SELECT Id, medisoft_ids FROM {push_links.PUSHED_TABLE}").fetchall())
+    zoho_values = {account: values.get(field) for account, values in mock.written.get('Accounts', {}).items()}
+    stats = mock.stats()
+
+    checks = {
+        'sends the changed accounts': changed == len(expected) == sent,
+        'records what Zoho accepted': pushed_links == zoho_values,
+    }
+    if phase == 'unchanged':
+        checks['sends nothing'] = changed == 0 and stats['calls'].get('upload', 0) == 0
+    return {
+        'phase': phase,
+        'seconds': round(seconds, 2),
+        'sent': sent,
+        'expected': len(expected),
+        'updated': pushed,
+        'skipped': sum(job['counts']['SKIPPED'] for job in jobs),
+        'write_jobs': len(jobs),
+        'api_calls': stats['api_calls'],
+        'calls': stats['calls'],
+        'checks': checks,
+        'ok': all(checks.values())
+    }
+
+
+def format_row(result):
+    failed = [name for name, ok in result['checks'].items() if not ok]
+    flag = '✅' if result['ok'] else f"❌ {', '.join(failed)}"
+    return (
+        f"{result['phase']:<10} {result['seconds']:>8.1f}s {result['sent']:>8} {result['updated']:>8} "
+        f"{result['skipped']:>8} {result['write_jobs']:>5} {result['api_calls']:>6}  {flag}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--firms', type=int, default=0,
+                        help='Medisoft firms linked to the accounts (default: twice the records)')
+    parser.add_argument('--batch-size', type=int, default=5000, help='accounts per bulk write job')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='seconds between two write job status calls')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    add_arguments(parser)
+    parser.set_defaults(write_error_rate=0.01)
+    args = parser.parse_args()
+
+    mock = mock_from_args(args)
+    server, url = start_server(mock)
+    os.environ.update({
+        'ZOHO_API_DOMAIN': url,
+        'ZOHO_ACCOUNTS_DOMAIN': url,
+        'ZOHO_CONTENT_DOMAIN': url,
+        'ZOHO_POLL_INTERVAL': str(args.poll_interval),
+        'ZOHO_BULK_WRITE_BATCH': str(args.batch_size)
+    })
+    # push_links imports its neighbours as top-level modules, as when it is run
+    # from zoho/, and zohoCRM reads its configuration on import
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import push_links
+
+    duck = duckdb.connect()
+    results = []
+    try:
+        create_links(duck, args.firms or 2 * args.records, args.records)
+        print(f"\n{args.records} accounts, {args.firms or 2 * args.records} firms, batches of {args.batch_size}, "
+              f"write error rate {args.write_error_rate}, queue delay {args.queue_delay}s")
+        for phase in PHASES:
+            if phase == 'relinked':
+                relink(duck, args.records)
+            results.append(run_phase(push_links, mock, duck, phase, push_links.LINK_FIELD))
+        print(f"\n{'phase':<10} {'runtime':>9} {'sent':>8} {'updated':>8} {'skipped':>8} {'jobs':>5} {'calls':>6}")
+        for result in results:
+            print(format_row(result))
+    finally:
+        duck.close()
+        server.shutdown()
+        shutil.rmtree(mock.directory, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+    sys.exit(0 if all(result['ok'] for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
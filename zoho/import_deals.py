@@ -15,6 +15,9 @@ from psycopg2.extras import execute_values
 from psycopg2 import Error as Psycopg2Error
 from db_connection import connect_to_db
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import span, add_rows, report
+
 
 def process_dataframe(df):
     """
@@ -125,7 +128,7 @@ def main():
         # Truncate the table first
         print("Truncating table...")
         try:
-            with conn.cursor() as cursor:
+            with span("truncate"), conn.cursor() as cursor:
                 cursor.execute('TRUNCATE TABLE zoho."Deals"')
                 conn.commit()
             print("✓ Table truncated")
@@ -135,15 +138,20 @@ def main():
         
         # Read CSV file directly with pandas
         print(f"Reading CSV file: {csv_path}")
-        df = duck.sql(f"select * from read_csv('{csv_path}')").df()
+        with span("read csv"):
+            df = duck.sql(f"select * from read_csv('{csv_path}')").df()
+            add_rows(rows_out=len(df))
         
         # Process the DataFrame
         print("Processing DataFrame...")
-        df = process_dataframe(df)
+        with span("process"):
+            df = process_dataframe(df)
         
         # Insert data into database
         print("Inserting data into database...")
-        insert_data(conn, df)
+        with span("insert"):
+            insert_data(conn, df)
+            add_rows(rows_in=len(df), rows_out=len(df))
         
         print("\n✓ Import completed successfully!")
         
@@ -171,6 +179,7 @@ def main():
         if conn:
             conn.close()
             print("✓ Database connection closed")
+        report("import_deals")
 
 
 if __name__ == "__main__":
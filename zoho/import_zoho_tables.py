@@ -1,20 +1,63 @@
 import pandas as pd
 import os
+from sqlalchemy import text
 import connection_alchemy
+from instrumentation import span, add_rows, report
+from zoho.sync_state import mark_loaded
 
 DATA_PATH = './zoho/data'
 SCHEMA_NAME = 'zoho_new'
+# Delta exports (ZOHO_SYNC_MODE=delta) are merged into the live schema by Id
+SYNC_MODE = os.getenv('ZOHO_SYNC_MODE', 'full')
+MERGE_SCHEMA_NAME = 'zoho'
+
+
+def merge_table(connection, df, table_name):
+	"""
+	Upsert the rows of a delta export into an existing table, by Id.
+
+	The rows are loaded into a staging table, then replace the rows with the
+	same Id in one transaction. Columns missing from the table are ignored.
+	"""
+	if df.empty:
+		return
+	staging = f'{table_name}_delta'
+	df.to_sql(staging, con=connection, schema=MERGE_SCHEMA_NAME, index=False, if_exists='replace')
+	table_columns = connection.execute(text(
+		"select column_name from information_schema.columns where table_schema = :schema and table_name = :table"
+	), {'schema': MERGE_SCHEMA_NAME, 'table': table_name}).scalars().all()
+	columns = ', '.join(f'"{c}"' for c in df.columns if c in table_columns)
+	target = f'{MERGE_SCHEMA_NAME}."{table_name}"'
+	connection.execute(text(f'delete from {target} where "Id" in (select "Id" from {MERGE_SCHEMA_NAME}."{staging}")'))
+	connection.execute(text(f'insert into {target} ({columns}) select {columns} from {MERGE_SCHEMA_NAME}."{staging}"'))
+	connection.execute(text(f'drop table {MERGE_SCHEMA_NAME}."{staging}"'))
+	connection.commit()
+
 
 if __name__ == "__main__":
 	connection = connection_alchemy.connect_to_db()
+	if SYNC_MODE != 'delta':
+		connection.execute(text(f'create schema if not exists {SCHEMA_NAME}'))
+		connection.commit()
 
 	# iterate over csv files located in the directory data
 	for csv_file in os.listdir(DATA_PATH):
 		# check that it's a csv file
 		if csv_file[-3:] == 'csv':
-			df = pd.read_csv(f'{DATA_PATH}/{csv_file}', dtype=str)
 			table_name = os.path.splitext(csv_file)[0]
-			print(f"Inserting {table_name} into database...")
-			df.to_sql(table_name, con=connection, schema=SCHEMA_NAME, index=False)
-			print(f"✓ Table {table_name} inserted")
+			with span(f"load {table_name}"):
+				df = pd.read_csv(f'{DATA_PATH}/{csv_file}', dtype=str)
+				if SYNC_MODE == 'delta':
+					print(f"Merging {len(df)} rows into {table_name}...")
+					merge_table(connection, df, table_name)
+					print(f"✓ Table {table_name} merged")
+					# The delta is live: the next one starts where this export started
+					mark_loaded([table_name])
+				else:
+					print(f"Inserting {table_name} into database...")
+					# Replaced, so that a rerun does not fail on the table of the last load
+					df.to_sql(table_name, con=connection, schema=SCHEMA_NAME, index=False, if_exists='replace')
+					print(f"✓ Table {table_name} inserted")
+				add_rows(rows_in=len(df), rows_out=len(df))
 	connection.close()
+	report("import_zoho_tables")
@@ -0,0 +1,594 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Zoho CRM APIs used by zohoCRM.py.
+
+Serves the endpoints of the export and bulk write paths with synthetic
+records, so that exports and pushes can be run and measured offline,
+without API credits:
+
+- POST /oauth/v2/token: access tokens, valid for --token-ttl seconds
+  (expired or unknown tokens get 401 INVALID_TOKEN)
+- POST /crm/bulk/v2/read, GET /crm/bulk/v2/read/<job>: bulk read jobs that
+  wait --queue-delay seconds in the queue, then take one second per
+  --export-rate records; --bulk-page-size records per job page
+- GET /crm/bulk/v2/read/<job>/result: the zipped CSV, with Range support
+- POST /crm/v3/coql: COUNT(id) of the records modified after a date
+- GET /crm/v2/settings/fields, GET /crm/v2/<module>: field names and
+  REST pages (If-Modified-Since, page/per_page, more_records, at most
+  --rest-record-limit records without page token)
+- POST /crm/v2/upload: a zipped CSV for a bulk write (multipart, header
+  feature: bulk-write), answered with its file_id
+- POST /crm/bulk/v2/write, GET /crm/bulk/v2/write/<job>: bulk write jobs
+  (update by id), queued and run like bulk reads; the written values are
+  kept in MockZoho.written
+- GET /crm/bulk/v2/write/<job>/result: the zipped CSV of the uploaded rows
+  with a STATUS (UPDATED or SKIPPED) and an ERRORS column. Ids the mock does
+  not hold are skipped (ID_NOT_FOUND), and a share --write-error-rate of the
+  rows is skipped the first time it is written (RECORD_LOCKED), so that
+  retries succeed
+
+Every API call takes a request from a token bucket of --rate-limit calls
+per second (0: unlimited); when it is empty, the call gets 429 with a
+Retry-After header. GET /__stats returns the calls per endpoint, the
+responses per status and the bytes sent; POST /__reset clears them.
+
+Each module has --records records, each with a Modified_Time spread over
+the last 30 days, and a Description of --row-bytes characters to make
+the export files realistically large.
+
+Usage (from the repository root):
+    python -m zoho.mock_server --port 8765 --records 200000 --queue-delay 5
+    ZOHO_API_DOMAIN=http://127.0.0.1:8765 ZOHO_ACCOUNTS_DOMAIN=http://127.0.0.1:8765 \\
+        python -m zoho.zohoCRM
+"""
+
+import argparse
+import csv
+import email.policy
+import hashlib
+import io
+import json
+import os
+import re
+import secrets
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIELDS = ['Id', 'Name', 'Phone', 'Website', 'Billing_Code', 'Description', 'Modified_Time']
+WORDS = ['praxis', 'zahnarzt', 'labor', 'klinik', 'apotheke', 'physio', 'dental', 'service',
+         'zentrum', 'gmbh', 'berlin', 'hamburg', 'muenchen', 'koeln', 'termin', 'vertrag',
+         'rueckruf', 'angebot', 'rechnung', 'kunde', 'neu', 'bestand', 'wartung', 'lizenz',
+         'schulung', 'kontakt', 'notiz', 'telefonat', 'email', 'besuch', 'messe', 'abgesagt']
+MODIFIED_WINDOW = 30 * 86400
+FIRST_ID = 3000000000000000000
+
+
+class MockZoho:
+    """Records, jobs, tokens and counters of one mock server."""
+
+    def __init__(self, records=10000, row_bytes=200, queue_delay=2.0, export_rate=50000,
+                 bulk_page_size=200000, rest_record_limit=2000, token_ttl=3600, rate_limit=0,
+                 ranges=True, write_error_rate=0.0, directory=None):
+        self.records = records
+        self.row_bytes = row_bytes
+        self.queue_delay = queue_delay
+        self.export_rate = export_rate
+        self.bulk_page_size = bulk_page_size
+        self.rest_record_limit = rest_record_limit
+        self.token_ttl = token_ttl
+        self.rate_limit = rate_limit
+        self.ranges = ranges
+        self.write_error_rate = write_error_rate
+        self.directory = directory or tempfile.mkdtemp(prefix='zoho_mock_')
+        self.now = datetime.now(timezone.utc).replace(microsecond=0)
+        self.lock = threading.Lock()
+        self.tokens = {}
+        self.jobs = {}
+        self.uploads = {}
+        self.write_jobs = {}
+        # Values written by bulk write jobs, per module and record id
+        self.written = {}
+        self.locked_once = set()
+        self.bucket = (float(rate_limit), time.monotonic())
+        self.reset_stats()
+
+    # --- records ---
+
+    def modified_time(self, i):
+        # Deterministic spread over the window, independent of the record order
+        return self.now - timedelta(seconds=(i * 2654435761) % MODIFIED_WINDOW)
+
+    def record(self, module, i):
+        # Words drawn from a hash of the index, so that the CSV compresses like real text
+        digest = hashlib.blake2b(str(i).encode(), digest_size=64).digest()
+        words = ' '.join(WORDS[digest[k % 64] % len(WORDS)] for k in range(self.row_bytes // 6 + 1))
+        return {
+            'id': str(FIRST_ID + i),
+            'Name': f"{module} {i}",
+            'Phone': f"+49 {30 + i % 900} {1000000 + i}",
+            'Website': f"https://www.{module.lower()}-{i}.de",
+            'Billing_Code': f"{10000 + i % 90000:05d}",
+            'Description': words[:self.row_bytes],
+            'Modified_Time': self.modified_time(i).isoformat()
+        }
+
+    def modified_since(self, since):
+        """Indices of the records modified after since (all records without since)."""
+        if not since:
+            return range(self.records)
+        since = datetime.fromisoformat(since.replace('Z', '+00:00'))
+        return [i for i in range(self.records) if self.modified_time(i) > since]
+
+    # --- auth and limits ---
+
+    def issue_token(self):
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.tokens[token] = time.monotonic() + self.token_ttl
+        return token
+
+    def authorized(self, header):
+        token = (header or '').replace('Zoho-oauthtoken ', '')
+        with self.lock:
+            return self.tokens.get(token, 0) > time.monotonic()
+
+    def take_request(self):
+        """Take one call from the token bucket; False when the limit is reached."""
+        if not self.rate_limit:
+            return True
+        with self.lock:
+            tokens, last = self.bucket
+            now = time.monotonic()
+            tokens = min(float(self.rate_limit), tokens + (now - last) * self.rate_limit)
+            if tokens < 1:
+                self.bucket = (tokens, now)
+                return False
+            self.bucket = (tokens - 1, now)
+            return True
+
+    # --- bulk read jobs ---
+
+    def create_job(self, query):
+        job_id = str(4000000000000000000 + len(self.jobs))
+        criteria = query.get('criteria') or {}
+        indices = self.modified_since(criteria.get('value'))
+        page = int(query.get('page', 1))
+        start = (page - 1) * self.bulk_page_size
+        job = {
+            'id': job_id,
+            'module': query['module'],
+            'indices': indices[start:start + self.bulk_page_size],
+            'page': page,
+            'more_records': start + self.bulk_page_size < len(indices),
+            'created': time.monotonic(),
+            'path': None
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+        # The export file is written while the job waits and runs
+        threading.Thread(target=self.write_export, args=(job,), daemon=True).start()
+        return job
+
+    def write_export(self, job):
+        path = os.path.join(self.directory, f"{job['id']}.zip")
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open(f"{job['id']}.csv", 'w') as f:
+                text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+                writer = csv.writer(text)
+                writer.writerow(FIELDS)
+                for i in job['indices']:
+                    record = self.record(job['module'], i)
+                    writer.writerow([record['id']] + [record[field] for field in FIELDS[1:]])
+                text.flush()
+                text.detach()
+        job['path'] = path
+
+    def job_state(self, job):
+        elapsed = time.monotonic() - job['created']
+        if elapsed < self.queue_delay:
+            return 'ADDED'
+        if elapsed < self.queue_delay + len(job['indices']) / self.export_rate or job['path'] is None:
+            return 'IN PROGRESS'
+        return 'COMPLETED'
+
+    # --- bulk write jobs ---
+
+    def upload(self, data):
+        with self.lock:
+            file_id = str(5000000000000000000 + len(self.uploads))
+            self.uploads[file_id] = data
+        return file_id
+
+    def create_write_job(self, body):
+        resource = body['resource'][0]
+        with zipfile.ZipFile(io.BytesIO(self.uploads[resource['file_id']])) as zf:
+            with zf.open(zf.namelist()[0]) as f:
+                rows = list(csv.reader(io.TextIOWrapper(f, encoding='utf-8', newline='')))
+        job = {
+            'id': str(6000000000000000000 + len(self.write_jobs)),
+            'module': resource['module'],
+            'find_by': resource.get('find_by', 'id'),
+            'mappings': {m['index']: m['api_name'] for m in resource['field_mappings']},
+            'header': rows[0],
+            'rows': rows[1:],
+            # Timed like a bulk read of as many records (see job_state)
+            'indices': rows[1:],
+            'created': time.monotonic(),
+            'counts': None,
+            'path': None
+        }
+        with self.lock:
+            self.write_jobs[job['id']] = job
+        threading.Thread(target=self.write_records, args=(job,), daemon=True).start()
+        return job
+
+    def locked(self, record_id):
+        """Whether a write of record_id fails this time (each record fails at most once)."""
+        digest = hashlib.blake2b(record_id.encode(), digest_size=8).digest()
+        if int.from_bytes(digest, 'big') / 2**64 >= self.write_error_rate:
+            return False
+        with self.lock:
+            if record_id in self.locked_once:
+                return False
+            self.locked_once.add(record_id)
+            return True
+
+    def write_records(self, job):
+        """Apply the rows of a write job and write its result file."""
+        key_index = next(i for i, name in job['mappings'].items() if name == job['find_by'])
+        written = self.written.setdefault(job['module'], {})
+        counts = Counter()
+        path = os.path.join(self.directory, f"{job['id']}.zip")
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            with zf.open(f"{job['id']}.csv", 'w') as f:
+                text = io.TextIOWrapper(f, encoding='utf-8', newline='')
+                writer = csv.writer(text)
+                writer.writerow(job['header'] + ['STATUS', 'ERRORS'])
+                for row in job['rows']:
+                    record_id = row[key_index]
+                    if not record_id.isdigit() or not 0 <= int(record_id) - FIRST_ID < self.records:
+                        status, errors = 'SKIPPED', 'ID_NOT_FOUND'
+                    elif self.locked(record_id):
+                        status, errors = 'SKIPPED', 'RECORD_LOCKED'
+                    else:
+                        status, errors = 'UPDATED', ''
+                        values = {name: row[i] for i, name in job['mappings'].items() if i != key_index}
+                        with self.lock:
+                            written.setdefault(record_id, {}).update(values)
+                    counts[status] += 1
+                    writer.writerow(row + [status, errors])
+                text.flush()
+                text.detach()
+        job['counts'] = counts
+        job['path'] = path
+
+    # --- stats ---
+
+    def reset_stats(self):
+        with self.lock:
+            self.calls = Counter()
+            self.statuses = Counter()
+            self.bytes_sent = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'calls': dict(self.calls),
+                'api_calls': sum(n for endpoint, n in self.calls.items() if endpoint != 'token'),
+                'statuses': {str(code): n for code, n in self.statuses.items()},
+                'bytes_sent': self.bytes_sent
+            }
+
+
+def make_handler(mock):
+    """Return the request handler class serving one MockZoho."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, code, body=None, headers=None):
+            data = b'' if body is None else json.dumps(body).encode()
+            self.send_response(code)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if body is not None:
+                self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            with mock.lock:
+                mock.statuses[code] += 1
+                mock.bytes_sent += len(data)
+
+        def body(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def api_call(self, endpoint):
+            """Count the call, then check its token and the rate limit."""
+            with mock.lock:
+                mock.calls[endpoint] += 1
+            if not mock.authorized(self.headers.get('Authorization')):
+                self.send(401, {'code': 'INVALID_TOKEN', 'message': 'invalid oauth token', 'status': 'error'})
+                return False
+            if not mock.take_request():
+                self.send(429, {'code': 'TOO_MANY_REQUESTS', 'status': 'error'}, {'Retry-After': '1'})
+                return False
+            return True
+
+        def uploaded_file(self):
+            """Return the bytes of the 'file' part of a multipart request."""
+            length = int(self.headers.get('Content-Length', 0))
+            head = f"Content-Type: {self.headers.get('Content-Type', '')}\r\n\r\n".encode()
+            message = BytesParser(policy=email.policy.HTTP).parsebytes(head + self.rfile.read(length))
+            if not message.is_multipart():
+                return None
+            for part in message.iter_parts():
+                if part.get_param('name', header='content-disposition') == 'file':
+                    return part.get_payload(decode=True)
+            return None
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path == '/oauth/v2/token':
+                with mock.lock:
+                    mock.calls['token'] += 1
+                return self.send(200, {
+                    'access_token': mock.issue_token(),
+                    'expires_in': mock.token_ttl,
+                    'token_type': 'Bearer'
+                })
+            if path == '/__reset':
+                mock.reset_stats()
+                return self.send(200, {'status': 'reset'})
+            if path == '/crm/bulk/v2/read':
+                if not self.api_call('bulk_create'):
+                    return
+                job = mock.create_job(self.body()['query'])
+                return self.send(201, {'data': [{
+                    'status': 'success',
+                    'code': 'ADDED_SUCCESSFULLY',
+                    'details': {'id': job['id'], 'operation': 'read', 'state': 'ADDED'},
+                    'message': 'Added successfully.'
+                }]})
+            if path == '/crm/v2/upload':
+                if not self.api_call('upload'):
+                    return
+                data = self.uploaded_file()
+                if self.headers.get('feature') != 'bulk-write' or not data:
+                    return self.send(400, {'code': 'INVALID_DATA', 'status': 'error'})
+                return self.send(200, {
+                    'status': 'success',
+                    'code': 'FILE_UPLOAD_SUCCESS',
+                    'message': 'file uploaded.',
+                    'details': {'file_id': mock.upload(data)}
+                })
+            if path == '/crm/bulk/v2/write':
+                if not self.api_call('write_create'):
+                    return
+                body = self.body()
+                if body.get('resource', [{}])[0].get('file_id') not in mock.uploads:
+                    return self.send(400, {'code': 'INVALID_DATA', 'status': 'error',
+                                           'message': 'unknown file_id'})
+                job = mock.create_write_job(body)
+                return self.send(201, {
+                    'status': 'success',
+                    'code': 'SUCCESS',
+                    'message': 'success',
+                    'details': {'id': job['id']}
+                })
+            if path == '/crm/v3/coql':
+                if not self.api_call('coql'):
+                    return
+                query = self.body().get('select_query', '')
+                since = re.search(r"Modified_Time > '([^']+)'", query)
+                count = len(mock.modified_since(since.group(1) if since else None))
+                if count == 0:
+                    return self.send(204)
+                return self.send(200, {'data': [{'COUNT(id)': count}], 'info': {'count': 1, 'more_records': False}})
+            self.send(404, {'code': 'INVALID_URL_PATTERN'})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path == '/__stats':
+                return self.send(200, mock.stats())
+
+            match = re.fullmatch(r'/crm/bulk/v2/read/(\d+)', url.path)
+            if match:
+                if not self.api_call('bulk_status'):
+                    return
+                job = mock.jobs.get(match.group(1))
+                if job is None:
+                    return self.send(404, {'code': 'RESOURCE_NOT_FOUND'})
+                data = {'id': job['id'], 'operation': 'read', 'state': mock.job_state(job)}
+                if data['state'] == 'COMPLETED':
+                    data['result'] = {
+                        'page': job['page'],
+                        'count': len(job['indices']),
+                        'download_url': f"/crm/bulk/v2/read/{job['id']}/result",
+                        'per_page': mock.bulk_page_size,
+                        'more_records': job['more_records']
+                    }
+                return self.send(200, {'data': [data]})
+
+            match = re.fullmatch(r'/crm/bulk/v2/read/(\d+)/result', url.path)
+            if match:
+                if not self.api_call('bulk_download'):
+                    return
+                job = mock.jobs.get(match.group(1))
+                if job is None or mock.job_state(job) != 'COMPLETED':
+                    return self.send(404, {'code': 'RESOURCE_NOT_FOUND'})
+                return self.send_file(job)
+
+            match = re.fullmatch(r'/crm/bulk/v2/write/(\d+)', url.path)
+            if match:
+                if not self.api_call('write_status'):
+                    return
+                job = mock.write_jobs.get(match.group(1))
+                if job is None:
+                    return self.send(404, {'code': 'RESOURCE_NOT_FOUND'})
+                state = mock.job_state(job).replace('IN PROGRESS', 'INPROGRESS')
+                data = {'id': job['id'], 'operation': 'update', 'status': state,
+                        'resource': [{'type': 'data', 'module': job['module'], 'status': state}]}
+                if state == 'COMPLETED':
+                    data['resource'][0]['file'] = {
+                        'added_count': 0,
+                        'updated_count': job['counts']['UPDATED'],
+                        'skipped_count': job['counts']['SKIPPED'],
+                        'total_count': len(job['rows'])
+                    }
+                    data['result'] = {'download_url': f"/crm/bulk/v2/write/{job['id']}/result"}
+                return self.send(200, data)
+
+            match = re.fullmatch(r'/crm/bulk/v2/write/(\d+)/result', url.path)
+            if match:
+                if not self.api_call('write_download'):
+                    return
+                job = mock.write_jobs.get(match.group(1))
+                if job is None or mock.job_state(job) != 'COMPLETED':
+                    return self.send(404, {'code': 'RESOURCE_NOT_FOUND'})
+                return self.send_file(job)
+
+            if url.path == '/crm/v2/settings/fields':
+                if not self.api_call('fields'):
+                    return
+                return self.send(200, {'fields': [{'api_name': field} for field in FIELDS if field != 'Id']})
+
+            match = re.fullmatch(r'/crm/v2/(\w+)', url.path)
+            if match:
+                if not self.api_call('records'):
+                    return
+                page = int(params.get('page', ['1'])[0])
+                per_page = min(int(params.get('per_page', ['200'])[0]), 200)
+                if page * per_page > mock.rest_record_limit:
+                    return self.send(400, {'code': 'LIMIT_REACHED', 'status': 'error',
+                                           'message': 'Use page_token to fetch more records'})
+                indices = mock.modified_since(self.headers.get('If-Modified-Since'))
+                chunk = indices[(page - 1) * per_page:page * per_page]
+                if not chunk:
+                    return self.send(304 if page == 1 else 204)
+                return self.send(200, {
+                    'data': [mock.record(match.group(1), i) for i in chunk],
+                    'info': {'page': page, 'per_page': per_page, 'count': len(chunk),
+                             'more_records': page * per_page < len(indices)}
+                })
+            self.send(404, {'code': 'INVALID_URL_PATTERN'})
+
+        def send_file(self, job):
+            size = os.path.getsize(job['path'])
+            etag = f'"{job["id"]}"'
+            start, end, code = 0, size - 1, 200
+            match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+            if_range = self.headers.get('If-Range')
+            if mock.ranges and match and (if_range is None or if_range == etag):
+                start = int(match.group(1))
+                end = min(int(match.group(2)) if match.group(2) else size - 1, size - 1)
+                code = 206
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/zip')
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('ETag', etag)
+            if mock.ranges:
+                self.send_header('Accept-Ranges', 'bytes')
+            if code == 206:
+                self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+            self.end_headers()
+            with open(job['path'], 'rb') as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    block = f.read(min(1 << 20, remaining))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+            with mock.lock:
+                mock.statuses[code] += 1
+                mock.bytes_sent += end - start + 1
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing a kept-alive or ranged connection early are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(mock, host='127.0.0.1', port=0):
+    """
+    Serve a MockZoho in a background thread.
+
+    Returns:
+        tuple: (server, base URL)
+    """
+    server = QuietServer((host, port), make_handler(mock))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_arguments(parser):
+    """Add the mock's settings to an argument parser (shared with the benchmark)."""
+    parser.add_argument('--records', type=int, default=10000, help='records per module')
+    parser.add_argument('--row-bytes', type=int, default=200, help='length of each Description')
+    parser.add_argument('--queue-delay', type=float, default=2.0, help='seconds a bulk job waits in the queue')
+    parser.add_argument('--export-rate', type=int, default=50000, help='records a bulk job exports per second')
+    parser.add_argument('--bulk-page-size', type=int, default=200000, help='records per bulk read page')
+    parser.add_argument('--rest-record-limit', type=int, default=2000,
+                        help='records reachable with page/per_page')
+    parser.add_argument('--token-ttl', type=float, default=3600, help='seconds an access token is valid')
+    parser.add_argument('--rate-limit', type=float, default=0, help='API calls per second (0: unlimited)')
+    parser.add_argument('--no-ranges', action='store_true', help='ignore Range headers on downloads')
+    parser.add_argument('--write-error-rate', type=float, default=0.0,
+                        help='share of the records whose first bulk write is skipped')
+
+
+def mock_from_args(args):
+    return MockZoho(
+        records=args.records,
+        row_bytes=args.row_bytes,
+        queue_delay=args.queue_delay,
+        export_rate=args.export_rate,
+        bulk_page_size=args.bulk_page_size,
+        rest_record_limit=args.rest_record_limit,
+        token_ttl=args.token_ttl,
+        rate_limit=args.rate_limit,
+        ranges=not args.no_ranges,
+        write_error_rate=args.write_error_rate
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    mock = mock_from_args(args)
+    server, url = start_server(mock, args.host, args.port)
+    print(f"✅ Mock Zoho serving {args.records} records per module on {url} (files in {mock.directory})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Push the Medisoft ids of matched firms to Zoho Accounts with the Bulk Write API.
+
+This script reads the links resolved in medisoft.table_firms_zoho, compares
+them with the links pushed last time (medisoft.table_zoho_pushed_links) and
+sends only the accounts whose Medisoft ids changed: each batch is written
+as a CSV, zipped, uploaded and updated by one bulk write job. Per-row
+errors are read from the job's result file; only the rows Zoho accepted
+are recorded as pushed, so failed rows are retried on the next run.
+"""
+
+import sys
+import os
+import tempfile
+import zipfile
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import span, add_rows, report
+from update_tasks import connect_to_postgres_via_duckdb
+import zohoCRM
+
+load_dotenv()
+
+FIRMS_ZOHO_TABLE = 'postgres_db.medisoft.table_firms_zoho'
+PUSHED_TABLE = 'postgres_db.medisoft.table_zoho_pushed_links'
+# Accounts field receiving the comma-separated Medisoft rec_ids
+LINK_FIELD = os.getenv('ZOHO_LINK_FIELD', 'Medisoft_Id')
+# Records per bulk write job
+BATCH_SIZE = int(os.getenv('ZOHO_BULK_WRITE_BATCH', '25000'))
+SUCCESS_STATUSES = {'UPDATED', 'ADDED'}
+
+
+def find_changed_links(duck):
+    """
+    Collect the accounts whose links changed since the last push into link_changes.
+
+    An account that lost all its links gets an empty value, so that the
+    field is cleared in Zoho.
+
+    Returns:
+        int: Number of accounts to push
+    """
+    duck.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PUSHED_TABLE} (
+            Id VARCHAR PRIMARY KEY,
+            medisoft_ids VARCHAR,
+            pushed_at TIMESTAMP
+        )
+    """)
+    duck.execute(f"""
+        CREATE OR REPLACE TABLE link_changes AS
+        WITH current_links AS (
+            SELECT id_zoho AS Id, string_agg(rec_id, ',' ORDER BY rec_id) AS medisoft_ids
+            FROM {FIRMS_ZOHO_TABLE}
+            WHERE id_zoho IS NOT NULL
+            GROUP BY id_zoho
+        )
+        SELECT
+            coalesce(c.Id, p.Id) AS Id,
+            coalesce(c.medisoft_ids, '') AS medisoft_ids,
+            row_number() OVER (ORDER BY coalesce(c.Id, p.Id)) - 1 AS row_index
+        FROM current_links AS c
+            FULL OUTER JOIN {PUSHED_TABLE} AS p ON c.Id = p.Id
+        WHERE c.medisoft_ids IS DISTINCT FROM p.medisoft_ids
+            AND NOT (c.Id IS NULL AND p.medisoft_ids = '')
+    """)
+    return duck.sql("SELECT count(*) FROM link_changes").fetchone()[0]
+
+
+def write_batch_file(duck, directory, batch_number):
+    """
+    Write one batch of link_changes as a zipped CSV (columns: id, LINK_FIELD).
+
+    Returns:
+        tuple: (zip path, list of account Ids in file order)
+    """
+    csv_path = os.path.join(directory, f"links_{batch_number}.csv")
+    zip_path = os.path.join(directory, f"links_{batch_number}.zip")
+    start = batch_number * BATCH_SIZE
+    batch_filter = f"row_index >= {start} AND row_index < {start + BATCH_SIZE}"
+    duck.execute(f"""
+        COPY (
+            SELECT Id AS id, medisoft_ids AS "{LINK_FIELD}"
+            FROM link_changes
+            WHERE {batch_filter}
+            ORDER BY row_index
+        ) TO '{csv_path}' (HEADER, DELIMITER ',')
+    """)
+    with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.write(csv_path, arcname=os.path.basename(csv_path))
+    ids = [row[0] for row in duck.sql(
+        f"SELECT Id FROM link_changes WHERE {batch_filter} ORDER BY row_index"
+    ).fetchall()]
+    return zip_path, ids
+
+
+def read_write_result(result_zip, ids):
+    """
+    Split the rows of a bulk write result file into accepted and failed ones.
+
+    The result file repeats the uploaded rows in order, with a STATUS and
+    an ERRORS column.
+
+    Returns:
+        tuple: (accepted account Ids, DataFrame of the failed rows)
+    """
+    with zipfile.ZipFile(result_zip) as zf:
+        with zf.open(zf.namelist()[0]) as f:
+            result = pd.read_csv(f, dtype=str, keep_default_na=False)
+    result.columns = [c.upper() for c in result.columns]
+    if len(result) != len(ids):
+        raise ValueError(f"Result file has {len(result)} rows for {len(ids)} uploaded rows")
+    result['ACCOUNT_ID'] = ids
+    accepted = result['STATUS'].isin(SUCCESS_STATUSES)
+    return result.loc[accepted, 'ACCOUNT_ID'].tolist(), result[~accepted]
+
+
+def push_batch(zip_path, ids, directory, batch_number):
+    """
+    Upload one batch, run its bulk write job and read the per-row results.
+
+    Returns:
+        list: Account Ids that were updated in Zoho
+    """
+    with span("upload"):
+        file_id = zohoCRM.upload_bulk_file(zip_path)
+    with span("create job"):
+        job_id = zohoCRM.create_bulk_write(
+            "Accounts",
+            file_id,
+            field_mappings=[
+                {"api_name": "id", "index": 0},
+                {"api_name": LINK_FIELD, "index": 1}
+            ]
+        )
+    print(f"Created write job {job_id} for {len(ids)} accounts")
+    with span("poll"):
+        job_status = zohoCRM.poll_bulk_write_status(job_id)
+    if job_status["status"] != "COMPLETED":
+        print(f"✗ Write job {job_id} failed: {job_status}")
+        return []
+
+    result_zip = os.path.join(directory, f"links_{batch_number}_result.zip")
+    with span("download result"):
+        zohoCRM.download_bulk_write_result(job_status["result"]["download_url"], result_zip)
+    accepted, failed = read_write_result(result_zip, ids)
+    if len(failed):
+        print(f"⚠ {len(failed)} of {len(ids)} accounts were not updated, e.g.:")
+        for _, row in failed.head(5).iterrows():
+            print(f"  {row['ACCOUNT_ID']}: {row['STATUS']} {row.get('ERRORS', '')}")
+    return accepted
+
+
+def record_pushed(duck, accepted_ids):
+    """Remember the pushed links of the accepted accounts."""
+    if not accepted_ids:
+        return
+    duck.execute("CREATE OR REPLACE TABLE pushed_ok (Id VARCHAR)")
+    duck.executemany("INSERT INTO pushed_ok VALUES (?)", [[i] for i in accepted_ids])
+    duck.execute(f"""
+        BEGIN TRANSACTION;
+
+        DELETE FROM {PUSHED_TABLE}
+        WHERE Id IN (SELECT Id FROM pushed_ok);
+
+        INSERT INTO {PUSHED_TABLE} (Id, medisoft_ids, pushed_at)
+        SELECT Id, medisoft_ids, now()
+        FROM link_changes
+        WHERE Id IN (SELECT Id FROM pushed_ok);
+
+        COMMIT;
+    """)
+
+
+def push_links(duck):
+    """
+    Push the changed links to Zoho in batches of BATCH_SIZE accounts.
+
+    Returns:
+        tuple: (accounts to push, accounts updated)
+    """
+    with span("find changes"):
+        changed = find_changed_links(duck)
+    print(f"{changed} accounts with changed links since the last push")
+    if changed == 0:
+        return 0, 0
+
+    pushed = 0
+    with tempfile.TemporaryDirectory(prefix="zoho_push_") as directory:
+        for batch_number in range((changed + BATCH_SIZE - 1) // BATCH_SIZE):
+            with span(f"batch {batch_number}"):
+                zip_path, ids = write_batch_file(duck, directory, batch_number)
+                accepted = push_batch(zip_path, ids, directory, batch_number)
+                # Recorded per batch, so an interrupted push keeps the batches done
+                record_pushed(duck, accepted)
+                add_rows(rows_in=len(ids), rows_out=len(accepted))
+                pushed += len(accepted)
+    return changed, pushed
+
+
+def main():
+    """Main function to push the changed links to Zoho."""
+    duck = None
+    try:
+        duck = connect_to_postgres_via_duckdb()
+        with span("push links"):
+            changed, pushed = push_links(duck)
+        if pushed < changed:
+            print(f"\n⚠ Pushed {pushed} of {changed} accounts; the others are retried on the next run")
+            sys.exit(1)
+        print(f"\n✓ Pushed {pushed} accounts to Zoho")
+    except Exception as e:
+        print(f"\n✗ Error pushing links: {e}")
+        raise
+    finally:
+        if duck is not None:
+            duck.close()
+        report("push_links")
+
+
+if __name__ == "__main__":
+    main()
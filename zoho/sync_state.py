@@ -0,0 +1,61 @@
+"""
+Sync state of the delta exports (ZOHO_SYNC_MODE=delta), per module.
+
+zohoCRM.py records when the export of a module started as pending; the time
+only becomes the module's sync point once the export is in the live tables
+(merged by import_zoho_tables.py, or promoted by the pipeline after a full
+import). A failed import or promotion thus exports the same records again.
+
+Usage (from the repository root), after promoting a full import by hand:
+    python -m zoho.sync_state
+"""
+
+import json
+import os
+
+SYNC_STATE_PATH = os.getenv('ZOHO_SYNC_STATE', 'zoho/data/sync_state.json')
+PENDING = 'pending'
+
+
+def load_sync_state(path: str = SYNC_STATE_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def save_sync_state(state: dict, path: str = SYNC_STATE_PATH):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def mark_exported(module: str, started: str, path: str = SYNC_STATE_PATH):
+    """Record that an export of module, started at started, is waiting to be loaded."""
+    state = load_sync_state(path)
+    state.setdefault(PENDING, {})[module] = started
+    save_sync_state(state, path)
+
+def mark_loaded(modules: list = None, path: str = SYNC_STATE_PATH):
+    """
+    Advance the sync point of modules to the start of their pending export.
+
+    Args:
+        modules: Modules whose export is now in the live tables (default: all pending)
+        path: Sync state file
+
+    Returns:
+        list: Modules whose sync point was advanced
+    """
+    state = load_sync_state(path)
+    pending = state.get(PENDING, {})
+    advanced = [module for module in (pending if modules is None else modules) if module in pending]
+    for module in advanced:
+        state[module] = pending.pop(module)
+    if advanced:
+        save_sync_state(state, path)
+    return advanced
+
+
+if __name__ == "__main__":
+    for module in mark_loaded():
+        print(f"✅ {module} synced up to {load_sync_state()[module]}")
@@ -11,6 +11,9 @@ import os
 import duckdb
 from dotenv import load_dotenv
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentation import span, add_rows, report
+
 
 def connect_to_postgres_via_duckdb():
     """
@@ -64,22 +67,24 @@ def update_tasks(duck, csv_path):
     
     # Update Tasks table
     print(f"Updating Tasks from CSV file: {csv_path}")
-    result = duck.sql(f"""
-        UPDATE postgres_db.zoho.Tasks t1
-        SET What_Id = t2.What_Id,
-            Who_id = t2.Who_id
-        FROM (
-            SELECT 
-                try_cast(Id as int64) as Id, 
-                try_cast(What_Id as int64) as What_Id, 
-                try_cast(Who_id as int64) as Who_id 
-            FROM read_csv('{csv_path}')
-        ) t2
-        WHERE t1.Id = t2.Id
-    """)
-    
-    # Get count of updated rows
-    updated_count = result.fetchone()[0] if hasattr(result, 'fetchone') else None
+    with span("update Tasks"):
+        result = duck.sql(f"""
+            UPDATE postgres_db.zoho.Tasks t1
+            SET What_Id = t2.What_Id,
+                Who_id = t2.Who_id
+            FROM (
+                SELECT 
+                    try_cast(Id as int64) as Id, 
+                    try_cast(What_Id as int64) as What_Id, 
+                    try_cast(Who_id as int64) as Who_id 
+                FROM read_csv('{csv_path}')
+            ) t2
+            WHERE t1.Id = t2.Id
+        """)
+    
+        # Get count of updated rows
+        updated_count = result.fetchone()[0] if hasattr(result, 'fetchone') else None
+        add_rows(rows_in=original_count, rows_out=updated_count or 0)
     
     print("✓ Update completed")
     if updated_count is not None:
@@ -131,6 +136,7 @@ def main():
         if duck:
             duck.close()
             print("✓ DuckDB connection closed")
+        report("update_tasks")
 
 
 if __name__ == "__main__":
@@ -1,16 +1,46 @@
 
+import os
+import csv
+import io
+import math
 import time
+import zipfile
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from instrumentation import span, current_span, report
+from zoho.ranged_download import download_file
+from zoho.sync_state import load_sync_state, mark_exported
+
+load_dotenv()
 
 # ==============
 # CONFIG
 # ==============
-ZOHO_DOMAIN = "https://www.zohoapis.eu"  # change to .eu, .in, .com.au if needed
-CLIENT_ID = '1000.UM9NBC0TBJ49IQXT7M6YLDP3OOL5AB'
+# Domains can be overridden, e.g. for other data centres (.in, .com.au) or a local mock
+ZOHO_DOMAIN = os.getenv('ZOHO_API_DOMAIN', "https://www.zohoapis.eu")
+ZOHO_ACCOUNTS_DOMAIN = os.getenv('ZOHO_ACCOUNTS_DOMAIN', "https://accounts.zoho.eu")
+ZOHO_CONTENT_DOMAIN = os.getenv('ZOHO_CONTENT_DOMAIN', "https://content.zohoapis.eu")
+ZOHO_ORG_ID = os.getenv('ZOHO_ORG_ID', '')
+CLIENT_ID = os.getenv('ZOHO_CLIENT_ID', '1000.UM9NBC0TBJ49IQXT7M6YLDP3OOL5AB')
 # For these two parameters, refer to 1Password (Padoa-integration-Bas)
-CLIENT_SECRET =  ''
-REFRESH_TOKEN = ""
+CLIENT_SECRET = os.getenv('ZOHO_CLIENT_SECRET', '')
+REFRESH_TOKEN = os.getenv('ZOHO_REFRESH_TOKEN', '')
+
+# full: bulk read of every record; delta: only records modified since the last sync
+SYNC_MODE = os.getenv('ZOHO_SYNC_MODE', 'full')
+# Deltas up to this many records are fetched with paged REST calls instead of a bulk job
+# (REST paging without page tokens stops at 2000 records)
+REST_MAX_RECORDS = int(os.getenv('ZOHO_REST_MAX_RECORDS', '2000'))
+REST_PAGE_SIZE = 200
+REST_MAX_PAGES = 2000 // REST_PAGE_SIZE
+REST_WORKERS = int(os.getenv('ZOHO_REST_WORKERS', '4'))
+# Seconds between two status calls of a bulk job
+POLL_INTERVAL = float(os.getenv('ZOHO_POLL_INTERVAL', '5'))
+# Calls answered 429 (API limit reached) are retried this many times
+RATE_LIMIT_RETRIES = int(os.getenv('ZOHO_RATE_LIMIT_RETRIES', '5'))
 
 ACCESS_TOKEN = None  # will be filled dynamically
 LIST_MODULES = [
@@ -35,7 +65,7 @@ def refresh_access_token():
     Refresh Zoho OAuth access token using the refresh token.
     """
     global ACCESS_TOKEN
-    url = f"https://accounts.zoho.eu/oauth/v2/token"
+    url = f"{ZOHO_ACCOUNTS_DOMAIN}/oauth/v2/token"
     params = {
         "refresh_token": REFRESH_TOKEN,
         "client_id": CLIENT_ID,
@@ -58,33 +88,57 @@ def zoho_headers():
         "Content-Type": "application/json"
     }
 
-def request_with_refresh(method, url, **kwargs):
+def request_with_refresh(method, url, headers=None, **kwargs):
     """
     Wrapper around requests to auto-refresh token on 401 errors.
+
+    Extra headers are added to the authorization headers; for file uploads
+    the JSON content type is left out so that requests sets the multipart one.
     """
-    res = requests.request(method, url, headers=zoho_headers(), **kwargs)
-    if res.status_code == 401:  # token expired
-        print("⚠️ Access token expired, refreshing...")
-        refresh_access_token()
-        res = requests.request(method, url, headers=zoho_headers(), **kwargs)
+    def build_headers():
+        merged = {**zoho_headers(), **(headers or {})}
+        if 'files' in kwargs:
+            merged.pop("Content-Type", None)
+        return merged
+
+    res = requests.request(method, url, headers=build_headers(), **kwargs)
+    previous_status = None
+    rate_limited = 0
+    while True:
+        # The token can also expire while waiting for the API limit
+        if res.status_code == 401 and previous_status != 401:  # token expired
+            print("⚠️ Access token expired, refreshing...")
+            refresh_access_token()
+        elif res.status_code == 429 and rate_limited < RATE_LIMIT_RETRIES:
+            wait = float(res.headers.get("Retry-After") or 2 ** rate_limited)
+            rate_limited += 1
+            print(f"⚠️ API limit reached, retrying in {wait:g}s...")
+            time.sleep(wait)
+        else:
+            break
+        previous_status = res.status_code
+        res = requests.request(method, url, headers=build_headers(), **kwargs)
     res.raise_for_status()
     return res
 
 # ==============
 # BULK HELPERS
 # ==============
-def create_bulk_export(module: str, fields: list = None):
+def create_bulk_export(module: str, fields: list = None, criteria: dict = None, page: int = 1):
     url = f"{ZOHO_DOMAIN}/crm/bulk/v2/read"
     body = {
         "query": {
-            "module": module
+            "module": module,
+            "page": page
         }
     }
+    if criteria:
+        body["query"]["criteria"] = criteria
     res = request_with_refresh("POST", url, json=body)
     print(res.json()["data"][0])
     return res.json()["data"][0]["details"]["id"]
 
-def poll_bulk_status(job_id: str, interval: int = 5):
+def poll_bulk_status(job_id: str, interval: float = POLL_INTERVAL):
     url = f"{ZOHO_DOMAIN}/crm/bulk/v2/read/{job_id}"
     while True:
         res = request_with_refresh("GET", url)
@@ -95,34 +149,329 @@ def poll_bulk_status(job_id: str, interval: int = 5):
         time.sleep(interval)
 
 def download_bulk_result(download_url: str, filename: str = "exportZoho.zip"):
+    """Download an export file in parallel, resumable segments (see ranged_download)."""
     print(f"{ZOHO_DOMAIN}"+download_url+" is the correct download url")
-    res = request_with_refresh("GET", f"{ZOHO_DOMAIN}"+download_url)
-    with open(filename, "wb") as f:
-        for chunk in res.iter_content(chunk_size=8192):
-            f.write(chunk)
+    size = download_file(f"{ZOHO_DOMAIN}"+download_url, filename, request=request_with_refresh)
+    if current_span() is not None:
+        current_span().attrs['bytes'] = size
+    print(f"✅ Result saved to {filename}")
+
+def merge_export_pages(module: str, page_files: list, filename: str):
+    """
+    Concatenate the CSVs of the pages of a bulk read into one zipped CSV.
+
+    A record moved to another page between two page jobs is kept once.
+    """
+    tmp_path = f"{filename}.tmp"
+    header = None
+    seen = set()
+    with zipfile.ZipFile(tmp_path, "w", compression=zipfile.ZIP_DEFLATED) as out:
+        with out.open(f"{module}.csv", "w") as f:
+            text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+            writer = csv.writer(text)
+            for page_file in page_files:
+                with zipfile.ZipFile(page_file) as zf:
+                    member = [name for name in zf.namelist() if name.endswith(".csv")][0]
+                    with zf.open(member) as src:
+                        reader = csv.reader(io.TextIOWrapper(src, encoding="utf-8", newline=""))
+                        page_header = next(reader, None)
+                        if page_header is None:
+                            continue
+                        if header is None:
+                            header = page_header
+                            id_column = header.index("Id")
+                            writer.writerow(header)
+                        elif page_header != header:
+                            raise ValueError(f"{page_file} has other columns than the first page")
+                        for row in reader:
+                            if row[id_column] not in seen:
+                                seen.add(row[id_column])
+                                writer.writerow(row)
+            text.flush()
+            text.detach()
+    os.replace(tmp_path, filename)
+    print(f"✅ Merged {len(page_files)} pages ({len(seen)} records) into {filename}")
+
+def bulk_export(module: str, since: str = None):
+    """
+    Export a module with bulk read jobs into <MODULE>_exportZoho.zip.
+
+    A bulk read job returns one page (200000 records); while the result has
+    more records, a job is created for the next page. The pages are merged
+    into one CSV, which only replaces the export file once every page is in.
+
+    Args:
+        module: API name of the module
+        since: Only export records modified after this ISO timestamp
+
+    Returns:
+        bool: True if every page was downloaded
+    """
+    criteria = None
+    if since:
+        criteria = {"api_name": "Modified_Time", "comparator": "greater_than", "value": since}
+    filename = f"{module}_exportZoho.zip"
+    page_files = []
+    page = 1
+    try:
+        while True:
+            # Step 1: Create export job
+            with span("create job", page=page):
+                job_id = create_bulk_export(module, criteria=criteria, page=page)
+            print(f"Created job {job_id} (page {page})")
+
+            # Step 2: Poll until complete
+            with span("poll", page=page):
+                job_status = poll_bulk_status(job_id)
+
+            if job_status["state"] != "COMPLETED":
+                print(f"❌ Job failed: {json.dumps(job_status, indent=2)}")
+                return False
+            file_url = job_status["result"]["download_url"]
+            # Step 3: Download result
+            print(file_url + " : download available")
+            page_file = f"{filename}.page{page}"
+            with span("download", page=page):
+                download_bulk_result(file_url, page_file)
+            page_files.append(page_file)
+
+            if not job_status["result"].get("more_records"):
+                break
+            page += 1
+            print(f"{module} has more records, exporting page {page}")
+
+        if len(page_files) == 1:
+            os.replace(page_files[0], filename)
+            page_files = []
+        else:
+            with span("merge pages"):
+                merge_export_pages(module, page_files, filename)
+        return True
+    finally:
+        for page_file in page_files:
+            if os.path.exists(page_file):
+                os.remove(page_file)
+
+# ==============
+# REST / COQL HELPERS
+# ==============
+def count_modified_records(module: str, since: str):
+    """Count the records of a module modified after since, with one COQL query."""
+    url = f"{ZOHO_DOMAIN}/crm/v3/coql"
+    query = f"select COUNT(id) from {module} where Modified_Time > '{since}'"
+    res = request_with_refresh("POST", url, json={"select_query": query})
+    if res.status_code == 204:
+        return 0
+    return int(res.json()["data"][0]["COUNT(id)"])
+
+def get_module_fields(module: str):
+    """Return the API names of a module's fields, as columns of a bulk read CSV."""
+    url = f"{ZOHO_DOMAIN}/crm/v2/settings/fields"
+    res = request_with_refresh("GET", url, params={"module": module})
+    names = [field["api_name"] for field in res.json()["fields"]]
+    return ["Id"] + [name for name in names if name.lower() != "id"]
+
+def fetch_records_page(module: str, since: str, page: int):
+    """
+    Fetch one page of records modified after since.
+
+    Returns:
+        tuple: (records, more_records)
+    """
+    url = f"{ZOHO_DOMAIN}/crm/v2/{module}"
+    params = {"page": page, "per_page": REST_PAGE_SIZE, "sort_by": "id", "sort_order": "asc"}
+    res = request_with_refresh("GET", url, params=params, headers={"If-Modified-Since": since})
+    if res.status_code in (204, 304):
+        return [], False
+    data = res.json()
+    return data.get("data", []), data.get("info", {}).get("more_records", False)
+
+def fetch_modified_records(module: str, since: str, count: int):
+    """
+    Fetch the records modified after since with paged REST calls.
+
+    The pages announced by the count are fetched concurrently; pages added
+    by records modified in the meantime are fetched afterwards, up to the
+    2000 records REST paging can reach.
+
+    Returns:
+        list: The records, or None if there are more than REST paging can reach
+    """
+    pages = min(max(1, math.ceil(count / REST_PAGE_SIZE)), REST_MAX_PAGES)
+    with ThreadPoolExecutor(max_workers=max(1, REST_WORKERS)) as pool:
+        results = list(pool.map(lambda page: fetch_records_page(module, since, page), range(1, pages + 1)))
+    more = results[-1][1]
+    while more:
+        if pages == REST_MAX_PAGES:
+            return None
+        pages += 1
+        page_records, more = fetch_records_page(module, since, pages)
+        results.append((page_records, more))
+
+    # A record moved to another page between two calls is kept once
+    records = {}
+    for page_records, _ in results:
+        for record in page_records:
+            records[record["id"]] = record
+    return list(records.values())
+
+def flatten_value(value):
+    """Render a REST value the way bulk read CSVs do (lookups as ids, lists joined by ';')."""
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return str(value.get("id", ""))
+    if isinstance(value, list):
+        return ";".join(flatten_value(v) for v in value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+def write_export_zip(module: str, records: list, columns: list, filename: str):
+    """Write records as a zipped CSV with the same layout as a bulk read export."""
+    with zipfile.ZipFile(filename, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open(f"{module}.csv", "w") as f:
+            text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+            writer = csv.writer(text)
+            writer.writerow(columns)
+            for record in records:
+                row = dict(record, Id=record.get("id"))
+                writer.writerow([flatten_value(row.get(column)) for column in columns])
+            text.flush()
+            text.detach()
+    if current_span() is not None:
+        current_span().attrs['bytes'] = os.path.getsize(filename)
     print(f"✅ Result saved to {filename}")
 
+def rest_export(module: str, since: str, count: int):
+    """
+    Export the records modified after since with REST calls into <MODULE>_exportZoho.zip.
+
+    Falls back to a bulk read when more records were modified since the
+    count than REST paging can reach.
+    """
+    with span("fields"):
+        columns = get_module_fields(module)
+    with span("fetch pages"):
+        records = fetch_modified_records(module, since, count) if count else []
+    if records is None:
+        print(f"⚠️ More than {REST_MAX_PAGES * REST_PAGE_SIZE} {module} records modified since {since}: bulk read")
+        return bulk_export(module, since)
+    with span("write"):
+        write_export_zip(module, records, columns, f"{module}_exportZoho.zip")
+    return True
+
+# ==============
+# SYNC STRATEGY
+# ==============
+def export_module(module: str, since: str = None):
+    """
+    Export a module with the cheapest strategy for the size of its delta.
+
+    Without since, the whole module is exported with a bulk read. Otherwise
+    the records modified since then are counted first: small deltas (up to
+    ZOHO_REST_MAX_RECORDS) are fetched with concurrent REST pages, which
+    do not wait in the bulk job queue, larger ones with a bulk read
+    filtered on Modified_Time. Both write the same CSV layout.
+
+    Returns:
+        bool: True if the export file was written
+    """
+    if not since:
+        return bulk_export(module)
+    with span("count"):
+        count = count_modified_records(module, since)
+    if count <= min(REST_MAX_RECORDS, REST_MAX_PAGES * REST_PAGE_SIZE):
+        print(f"{count} {module} records modified since {since}: paged REST")
+        return rest_export(module, since, count)
+    print(f"{count} {module} records modified since {since}: bulk read")
+    return bulk_export(module, since)
+
+# ==============
+# BULK WRITE
+# ==============
+def upload_bulk_file(zip_path: str):
+    """
+    Upload a zipped CSV for a bulk write job.
+
+    Returns:
+        str: file_id to reference in create_bulk_write
+    """
+    url = f"{ZOHO_CONTENT_DOMAIN}/crm/v2/upload"
+    headers = {"feature": "bulk-write", "X-CRM-ORG": ZOHO_ORG_ID}
+    # Bytes rather than the open file: a retry after a 401 or 429 re-sends the same
+    # files, and a file object would already be read to the end
+    with open(zip_path, "rb") as f:
+        data = f.read()
+    res = request_with_refresh(
+        "POST", url, headers=headers,
+        files={"file": (os.path.basename(zip_path), data, "application/zip")}
+    )
+    details = res.json()["details"]
+    print(f"✅ Uploaded {zip_path} (file id {details['file_id']})")
+    return details["file_id"]
+
+def create_bulk_write(module: str, file_id: str, field_mappings: list,
+                      operation: str = "update", find_by: str = "id"):
+    """
+    Create a bulk write job on an uploaded file.
+
+    Args:
+        module: API name of the module (e.g. "Accounts")
+        file_id: Id returned by upload_bulk_file
+        field_mappings: [{"api_name": ..., "index": <CSV column>}, ...]
+        operation: "insert", "update" or "upsert"
+        find_by: Field identifying the records to update
+
+    Returns:
+        str: Id of the job
+    """
+    url = f"{ZOHO_DOMAIN}/crm/bulk/v2/write"
+    body = {
+        "operation": operation,
+        "resource": [{
+            "type": "data",
+            "module": module,
+            "file_id": file_id,
+            "find_by": find_by,
+            "field_mappings": field_mappings
+        }]
+    }
+    res = request_with_refresh("POST", url, json=body)
+    return res.json()["details"]["id"]
+
+def poll_bulk_write_status(job_id: str, interval: float = POLL_INTERVAL):
+    url = f"{ZOHO_DOMAIN}/crm/bulk/v2/write/{job_id}"
+    while True:
+        res = request_with_refresh("GET", url)
+        data = res.json()
+        print(f"Write job {job_id} status: {data['status']}")
+        if data["status"] in ("COMPLETED", "FAILED"):
+            return data
+        time.sleep(interval)
+
+def download_bulk_write_result(download_url: str, filename: str):
+    """Download the result file of a bulk write job (one STATUS/ERRORS line per row)."""
+    url = download_url if download_url.startswith("http") else f"{ZOHO_DOMAIN}{download_url}"
+    download_file(url, filename, request=request_with_refresh)
+    print(f"✅ Write result saved to {filename}")
+
 # ==============
 # MAIN FLOW
 # ==============
 if __name__ == "__main__":
+    state = load_sync_state()
     for MODULE in LIST_MODULES:
      # MODULE = "Leads"  # Example module
         print("Starting to work on module " + MODULE)
-        # Step 1: Create export job
-        job_id = create_bulk_export(MODULE)
-        print(f"Created job {job_id}")
-
-        # Step 2: Poll until complete
-        job_status = poll_bulk_status(job_id)
-
-        if job_status["state"] == "COMPLETED":
-            file_url = job_status["result"]["download_url"]
-            # Step 3: Download result
-            print(file_url + " : download available")
-            download_bulk_result(file_url, f"{MODULE}_exportZoho.zip")
-        else:
-            print(f"❌ Job failed: {json.dumps(job_status, indent=2)}")
+        # Records modified while exporting are exported again next time
+        started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        since = state.get(MODULE) if SYNC_MODE == "delta" else None
+        with span(f"export {MODULE}", mode="delta" if since else "full"):
+            if export_module(MODULE, since):
+                # The sync point only advances once the export is loaded (see zoho/sync_state.py)
+                mark_exported(MODULE, started)
+    report("zohoCRM")
 
 # ==============
 # Fichier de sarah